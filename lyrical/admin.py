@@ -1,5 +1,11 @@
-from django.contrib import admin
+import os
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from .models import *
+from .services.llm_generation_registry import get_generation_registry
+from .services.llm_prompt_cache import get_prompt_cache_stats
 
 
 class UserAdmin(admin.ModelAdmin):
@@ -14,7 +20,7 @@ class UserAdmin(admin.ModelAdmin):
             'fields': ('username', 'first_name', 'last_name', 'email', 'is_staff', 'is_active', 'date_joined', 'last_login')
         }),
         ('LLM Settings', {
-            'fields': ('llm_model', 'llm_temperature', 'llm_max_tokens')
+            'fields': ('llm_model', 'llm_temperature', 'llm_max_tokens', 'llm_fallback_models', 'llm_auto_routing')
         }),
         ('Song Name Defaults', {
             'fields': (
@@ -29,7 +35,8 @@ class UserAdmin(admin.ModelAdmin):
 
 
 class LLMProviderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'display_name', 'internal_name', 'llm_count')
+    list_display = ('id', 'display_name', 'internal_name', 'engine', 'llm_count')
+    list_filter = ('engine',)
     search_fields = ('id', 'display_name', 'internal_name')
     ordering = ('display_name',)
     
@@ -39,9 +46,9 @@ class LLMProviderAdmin(admin.ModelAdmin):
 
 
 class LLMAdmin(admin.ModelAdmin):
-    list_display = ('id', 'display_name', 'internal_name', 'provider', 'cost_per_1m_tokens')
+    list_display = ('id', 'display_name', 'internal_name', 'provider', 'cost_per_1m_tokens', 'tier', 'first_token_timeout', 'stall_timeout')
     search_fields = ('id', 'display_name', 'internal_name')
-    list_filter = ('provider',)
+    list_filter = ('provider', 'tier')
     ordering = ('provider', 'display_name')
 
 
@@ -167,6 +174,56 @@ class MessageAdmin(admin.ModelAdmin):
     content_preview.short_description = 'Content'
 
 
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'stream_id', 'user', 'song', 'prompt_name', 'status', 'line_count', 'created_at', 'updated_at')
+    search_fields = ('id', 'stream_id', 'user__username', 'song__name', 'prompt_name')
+    list_filter = ('status', 'prompt_name', 'created_at')
+    ordering = ('-created_at',)
+    readonly_fields = ('stream_id', 'created_at', 'updated_at')
+    change_list_template = 'admin/lyrical/generationjob/change_list.html'
+    
+    def get_urls(self):
+        urls = [
+            path('active/', self.admin_site.admin_view(self.active_generations_view), name='lyrical_generationjob_active'),
+        ]
+        return urls + super().get_urls()
+    
+    def active_generations_view(self, request):
+        """
+        List and cancel the generations running in the worker process serving
+        this request. The generation registry is per worker: generations
+        running in other workers are not listed and cannot be cancelled here.
+        """
+        registry = get_generation_registry()
+        
+        if request.method == 'POST':
+            generation_id = request.POST.get('generation_id', '')
+            if generation_id.isdigit() and registry.cancel(int(generation_id)):
+                messages.success(request, f"Generation {generation_id} cancelled")
+            else:
+                messages.error(request, f"Generation {generation_id} is not running in this worker")
+            return redirect('admin:lyrical_generationjob_active')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Active generations',
+            'opts': self.model._meta,
+            'generations': [generation.to_dict() for generation in registry.get_active()],
+            'stats': registry.get_stats(),
+            'prompt_cache_stats': get_prompt_cache_stats().get_stats(),
+            'worker_pid': os.getpid(),
+        }
+        return TemplateResponse(request, 'admin/lyrical/active_generations.html', context)
+
+
+class LLMStatsRollupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'llm', 'prompt_name', 'count', 'error_count', 'ttft_p50', 'ttft_p95', 'chars_per_second_p50', 'duration_p50', 'duration_p95', 'created_at')
+    search_fields = ('id', 'llm__display_name', 'prompt_name')
+    list_filter = ('llm', 'prompt_name', 'created_at')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at',)
+
+
 # Register all models
 admin.site.register(User, UserAdmin)
 admin.site.register(LLMProvider, LLMProviderAdmin)
@@ -177,4 +234,6 @@ admin.site.register(SongStructureTemplate, SongStructureTemplateAdmin)
 admin.site.register(SongMetadata, SongMetadataAdmin)
 admin.site.register(Lyrics, LyricsAdmin)
 admin.site.register(Section, SectionAdmin)
-admin.site.register(Message, MessageAdmin)
\ No newline at end of file
+admin.site.register(Message, MessageAdmin)
+admin.site.register(GenerationJob, GenerationJobAdmin)
+admin.site.register(LLMStatsRollup, LLMStatsRollupAdmin)
@@ -14,3 +14,10 @@ class LyricalConfig(AppConfig):
         
         # Logging is automatically configured when the module is imported
         # The setup_logging() function is called during module import
+
+        # Optionally open provider connections in the background at worker start
+        from django.conf import settings
+        if getattr(settings, 'LLM_CLIENT_POOL', {}).get('WARM_UP'):
+            import threading
+            from .services.llm_client_pool import get_client_pool
+            threading.Thread(target=get_client_pool().warm_up, daemon=True).start()
@@ -0,0 +1,79 @@
+"""
+Django management command to benchmark the JSON backends used for NDJSON lines.
+
+Measures the per-line encode and decode cost of realistic lyrics, style,
+name and word payloads with the stdlib json module and, when installed, orjson.
+
+Usage:
+  python manage.py bench_json
+  python manage.py bench_json --iterations 50000
+"""
+
+import json
+import time
+from django.core.management.base import BaseCommand
+from ...services.utils import jsoncodec
+
+
+# Realistic NDJSON lines as produced by the generators
+SAMPLE_PAYLOADS = {
+    'lyrics': {
+        "verse1": [
+            "Dancing in the daylight, we never say goodbye",
+            "Every step a heartbeat underneath the open sky",
+            "Shadows on the pavement, chasing echoes of the night",
+            "Holding on to summer like it's ours to hold so tight",
+        ],
+    },
+    'style': {
+        "theme": "Freedom found in small moments, a celebration of letting go and living in the present",
+        "id": 1234,
+    },
+    'name': {"name": "Seashells In The Sand", "id": 42},
+    'word': {"word": "daylight", "line": 3, "index": 5},
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-line JSON encode/decode cost for each available backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20000,
+            help='Number of lines to encode and decode per payload (default: 20000)',
+        )
+
+    def handle(self, *args, **options):
+        """Run the benchmark for each backend and payload."""
+        iterations = options['iterations']
+
+        backends = {'json': (json.dumps, json.loads)}
+        if jsoncodec.orjson is not None:
+            backends['orjson'] = (jsoncodec.dumps, jsoncodec.loads)
+
+        self.stdout.write(self.style.SUCCESS('NDJSON Line JSON Benchmark'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(f"Active backend: {jsoncodec.JSON_BACKEND}")
+        if jsoncodec.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, only the stdlib is measured.'))
+
+        for payload_name, payload in SAMPLE_PAYLOADS.items():
+            self.stdout.write(f"\n{payload_name} ({len(json.dumps(payload))} chars):")
+            for backend_name, (dumps, loads) in backends.items():
+                line = dumps(payload)
+
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    dumps(payload)
+                encode_us = (time.perf_counter() - start) / iterations * 1_000_000
+
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    loads(line)
+                decode_us = (time.perf_counter() - start) / iterations * 1_000_000
+
+                self.stdout.write(
+                    f"  {backend_name:>7}: encode {encode_us:6.2f} us/line | decode {decode_us:6.2f} us/line"
+                )
@@ -0,0 +1,111 @@
+"""
+Django management command to benchmark NDJSON stream framing.
+
+Compares the NDJSONFramer against the previous concatenate-and-split loop
+for a streamed response delivered in 1-char, 16-char and whole-line chunks.
+
+Usage:
+  python manage.py bench_ndjson
+  python manage.py bench_ndjson --lines 200 --line-length 2000 --repeat 3
+"""
+
+import json
+import time
+from django.core.management.base import BaseCommand
+from ...services.utils.ndjson import NDJSONFramer, normalize_chunk
+from ...services.utils.text import normalize_to_ascii
+
+
+class Command(BaseCommand):
+    help = 'Benchmark NDJSON framing of streamed LLM responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            default=50,
+            help='Number of NDJSON lines in the simulated response (default: 50)',
+        )
+
+        parser.add_argument(
+            '--line-length',
+            type=int,
+            default=1000,
+            help='Approximate length of each NDJSON line in characters (default: 1000)',
+        )
+
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of timed runs per case, best is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        """Run the benchmark for each chunking strategy."""
+        lines = self.build_lines(options['lines'], options['line_length'])
+        text = ''.join(line + '\n' for line in lines)
+
+        self.stdout.write(self.style.SUCCESS('NDJSON Framing Benchmark'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(f"{len(lines)} lines, {len(text)} chars\n")
+
+        cases = {
+            '1-char': [text[i:i + 1] for i in range(len(text))],
+            '16-char': [text[i:i + 16] for i in range(0, len(text), 16)],
+            'whole-line': [line + '\n' for line in lines],
+        }
+
+        for name, chunks in cases.items():
+            legacy = self.best_of(options['repeat'], self.run_legacy, chunks)
+            framer = self.best_of(options['repeat'], self.run_framer, chunks)
+            speedup = legacy / framer if framer > 0 else 0
+            self.stdout.write(
+                f"{name:>10}: {len(chunks):>8} chunks | "
+                f"legacy {legacy * 1000:9.2f} ms | framer {framer * 1000:9.2f} ms | "
+                f"{speedup:6.1f}x"
+            )
+
+    def build_lines(self, count: int, line_length: int):
+        """Build realistic lyrics NDJSON lines of roughly the requested length."""
+        lyric = "Dancing in the daylight, we never say goodbye"
+        lines_per_section = max(line_length // (len(lyric) + 4), 1)
+        return [
+            json.dumps({f"verse{i % 4 + 1}": [lyric] * lines_per_section})
+            for i in range(count)
+        ]
+
+    def best_of(self, repeat: int, func, chunks) -> float:
+        """Return the best wall time of several runs."""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(chunks)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def run_legacy(self, chunks):
+        """The previous streaming loop: concatenate, normalize and split per chunk."""
+        current_line = ""
+        line_count = 0
+        for chunk in chunks:
+            content = normalize_to_ascii(chunk)
+            if '`' in content and len([c for c in content if c == '`']) > 10:
+                pass
+            current_line += content
+            while '\n' in current_line:
+                line, current_line = current_line.split('\n', 1)
+                line_count += 1
+        return line_count
+
+    def run_framer(self, chunks):
+        """The streaming loop using NDJSONFramer."""
+        framer = NDJSONFramer()
+        line_count = 0
+        for chunk in chunks:
+            content = normalize_chunk(chunk)
+            if content.count('`') > 10:
+                pass
+            line_count += len(framer.feed(content))
+        return line_count
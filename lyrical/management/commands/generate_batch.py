@@ -0,0 +1,269 @@
+"""
+Django management command to run a JSONL file of generation jobs offline.
+
+Each line of the jobs file is a JSON object:
+  {"id": "words-1", "prompt": "song_words", "song_id": 12, "params": {"rhyme_with": "fire", "count": 10}}
+
+"prompt" is the prompt name and selects the generator (override with "generator",
+one of the api_gen_* names without the prefix, for custom prompt names), "user"
+is the username (default: --user), "params" are the request parameters of the
+generator. Results are appended to the output file as each job completes, with
+the response lines and timings; the output file is the checkpoint, --resume
+skips the jobs it already has as completed.
+
+The command runs in its own process, whose admission state (LLM_ADMISSION) is
+not shared with the web workers: its jobs do not count towards the users'
+limits there and do not wait behind their interactive generations. Limit the
+load it puts on each provider with --workers and --provider-limit.
+
+Usage:
+  python manage.py generate_batch jobs.jsonl results.jsonl --user mpetrou
+  python manage.py generate_batch jobs.jsonl results.jsonl --user mpetrou --workers 8 --provider-limit openai=4 --resume
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpRequest, QueryDict
+from ...services.utils import jsoncodec
+from ...views.api_gen_song_lyrics import SongLyricsGenerator
+from ...views.api_gen_song_lyrics_section import SongLyricsSectionGenerator
+from ...views.api_gen_song_names import SongNamesGenerator
+from ...views.api_gen_song_styles import SongStylesGenerator
+from ...views.api_gen_song_styles_batch import SongStylesBatchGenerator
+from ...views.api_gen_song_words import SongWordsGenerator
+from ...models import User
+
+
+# Generator of each api_gen_* endpoint, by the prompt name it is called with
+GENERATORS = {
+    'song_lyrics': SongLyricsGenerator,
+    'song_lyrics_section': SongLyricsSectionGenerator,
+    'song_names': SongNamesGenerator,
+    'song_styles': SongStylesGenerator,
+    'song_styles_batch': SongStylesBatchGenerator,
+    'song_words': SongWordsGenerator,
+}
+
+
+class Command(BaseCommand):
+    help = 'Run a JSONL file of generation jobs through the generators and write the results as JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'jobs_file',
+            help='JSONL file of generation jobs',
+        )
+
+        parser.add_argument(
+            'output_file',
+            help='JSONL file the results are appended to, also used as the checkpoint',
+        )
+
+        parser.add_argument(
+            '--user',
+            metavar='username',
+            help='User running jobs that do not name a user',
+        )
+
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of jobs run concurrently (default: 4)',
+        )
+
+        parser.add_argument(
+            '--provider-limit',
+            action='append',
+            default=[],
+            metavar='provider=N',
+            help='Maximum concurrent jobs for a provider, can be repeated',
+        )
+
+        parser.add_argument(
+            '--default-provider-limit',
+            type=int,
+            default=2,
+            help='Maximum concurrent jobs for providers without a --provider-limit (default: 2)',
+        )
+
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the jobs already completed in the output file instead of overwriting it',
+        )
+
+    def handle(self, *args, **options):
+        """Handle the management command."""
+        jobs = self.read_jobs(options['jobs_file'])
+
+        completed = self.read_completed(options['output_file']) if options['resume'] else set()
+        pending = [job for job in jobs if job['id'] not in completed]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Running {len(pending)} of {len(jobs)} jobs ({len(jobs) - len(pending)} already completed) with {options['workers']} workers"
+        ))
+        if not pending:
+            return
+
+        self.provider_limits = {}
+        for limit in options['provider_limit']:
+            provider_name, _, count = limit.partition('=')
+            if not count.isdigit() or int(count) < 1:
+                raise CommandError(f"Invalid --provider-limit '{limit}', expected provider=N")
+            self.provider_limits[provider_name] = int(count)
+        self.default_provider_limit = options['default_provider_limit']
+        self.provider_semaphores = {}
+        self.semaphores_lock = threading.Lock()
+        self.users = {}
+        self.default_username = options['user']
+
+        started_at = time.monotonic()
+        counts = {'completed': 0, 'failed': 0}
+        with open(options['output_file'], 'a' if options['resume'] else 'w') as output:
+            with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='generate-batch') as executor:
+                futures = [executor.submit(self.run_job, job) for job in pending]
+                for future in as_completed(futures):
+                    result = future.result()
+                    counts[result['status']] += 1
+                    # one line per finished job, flushed so an interrupted run can resume
+                    output.write(jsoncodec.dumps(result) + '\n')
+                    output.flush()
+
+                    style = self.style.SUCCESS if result['status'] == 'completed' else self.style.ERROR
+                    self.stdout.write(style(
+                        f"[{counts['completed'] + counts['failed']}/{len(pending)}] {result['id']} {result['status']}: "
+                        f"{result['line_count']} lines in {result['duration_seconds']:.1f}s"
+                        + (f" ({result['error']})" if result.get('error') else '')
+                    ))
+
+        self.stdout.write('=' * 60)
+        self.stdout.write(
+            f"{counts['completed']} completed, {counts['failed']} failed in {time.monotonic() - started_at:.1f}s"
+        )
+
+    def read_jobs(self, jobs_file: str) -> list:
+        """Read and validate the jobs, each gets an ID (its line number if not given)."""
+        if not os.path.exists(jobs_file):
+            raise CommandError(f"Jobs file '{jobs_file}' not found")
+
+        jobs = []
+        with open(jobs_file) as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    job = jsoncodec.loads(line)
+                except (jsoncodec.JSONDecodeError, ValueError) as e:
+                    raise CommandError(f"Line {line_number} of '{jobs_file}' is not valid JSON: {e}")
+
+                generator_name = job.get('generator') or job.get('prompt')
+                if generator_name not in GENERATORS:
+                    raise CommandError(f"Line {line_number} of '{jobs_file}': unknown generator '{generator_name}', expected one of {sorted(GENERATORS)}")
+                job['id'] = str(job.get('id', line_number))
+                jobs.append(job)
+        return jobs
+
+    def read_completed(self, output_file: str) -> set:
+        """Get the IDs of the jobs completed in an earlier run."""
+        completed = set()
+        if not os.path.exists(output_file):
+            return completed
+        with open(output_file) as f:
+            for line in f:
+                try:
+                    result = jsoncodec.loads(line)
+                except (jsoncodec.JSONDecodeError, ValueError):
+                    # the last line of an interrupted run may be incomplete
+                    continue
+                if result.get('status') == 'completed':
+                    completed.add(str(result['id']))
+        return completed
+
+    def get_user(self, username: str) -> User:
+        """Get a job's user, loaded once per username."""
+        if not username:
+            raise ValueError('the job has no user and --user was not given')
+        if username not in self.users:
+            self.users[username] = User.objects.select_related('llm_model__provider').get(username=username)
+        return self.users[username]
+
+    def get_provider_semaphore(self, provider_name: str) -> threading.Semaphore:
+        """Get the semaphore limiting the concurrent jobs of a provider."""
+        with self.semaphores_lock:
+            semaphore = self.provider_semaphores.get(provider_name)
+            if semaphore is None:
+                semaphore = threading.Semaphore(self.provider_limits.get(provider_name, self.default_provider_limit))
+                self.provider_semaphores[provider_name] = semaphore
+            return semaphore
+
+    def run_job(self, job: dict) -> dict:
+        """Run a single job and return its result."""
+        started_at = time.monotonic()
+        result = {
+            'id': job['id'],
+            'prompt': job.get('prompt'),
+            'song_id': job.get('song_id'),
+            'status': 'failed',
+            'model': None,
+            'wait_seconds': 0.0,
+            'first_line_seconds': None,
+            'duration_seconds': 0.0,
+            'line_count': 0,
+            'error_count': 0,
+            'lines': [],
+        }
+
+        try:
+            request = HttpRequest()
+            request.method = 'GET'
+            request.user = self.get_user(job.get('user') or self.default_username)
+            request.GET = QueryDict(mutable=True)
+            for name, value in (job.get('params') or {}).items():
+                request.GET[name] = str(value)
+            if job.get('prompt'):
+                request.GET['prompt'] = job['prompt']
+            if job.get('song_id') is not None:
+                request.GET['song_id'] = str(job['song_id'])
+
+            generator = GENERATORS[job.get('generator') or job['prompt']](request)
+            lines = generator.generate_lines()
+            result['model'] = generator.get_llm_model_name()
+
+            # the LLM is called when the lines are read, within the provider's limit
+            wait_started_at = time.monotonic()
+            with self.get_provider_semaphore(generator.llm_model.provider.internal_name):
+                stream_started_at = time.monotonic()
+                result['wait_seconds'] = round(stream_started_at - wait_started_at, 3)
+
+                for line in lines:
+                    if result['first_line_seconds'] is None:
+                        result['first_line_seconds'] = round(time.monotonic() - stream_started_at, 3)
+                    try:
+                        data = jsoncodec.loads(line)
+                    except (jsoncodec.JSONDecodeError, ValueError):
+                        data = {'error': 'Malformed line from generator', 'raw_content': line}
+                    if isinstance(data, dict) and data.get('error'):
+                        result['error_count'] += 1
+                        # the generation itself failed, e.g. the provider returned an error
+                        if data.get('status') == 'error':
+                            result['error'] = data['error']
+                    result['lines'].append(data)
+
+            if not result.get('error'):
+                result['status'] = 'completed'
+
+        except Exception as e:
+            result['error'] = str(e)
+
+        finally:
+            result['line_count'] = len(result['lines'])
+            result['duration_seconds'] = round(time.monotonic() - started_at, 3)
+            # the thread's database connection is not managed by a request
+            connection.close()
+
+        return result
@@ -0,0 +1,102 @@
+"""
+Django management command to inspect and verify the LLM client pool.
+
+Usage:
+  python manage.py llm_client_pool --config
+  python manage.py llm_client_pool --warm-up
+  python manage.py llm_client_pool --probe http://localhost:8001/ --count 10
+"""
+
+from django.core.management.base import BaseCommand
+from ...services.llm_client_pool import get_client_pool
+
+
+class Command(BaseCommand):
+    help = 'Inspect the LLM provider client pool and verify connection reuse'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--config',
+            action='store_true',
+            help='Show the client pool configuration',
+        )
+
+        parser.add_argument(
+            '--warm-up',
+            action='store_true',
+            help='Warm up connections to all known providers and show the stats',
+        )
+
+        parser.add_argument(
+            '--probe',
+            metavar='url',
+            help='Send requests to a (stub) server through the pool and show the reuse stats',
+        )
+
+        parser.add_argument(
+            '--provider',
+            default='ollama',
+            help='Provider pool to use for --probe (default: ollama)',
+        )
+
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=5,
+            help='Number of requests to send for --probe (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        """Handle the management command."""
+        pool = get_client_pool()
+
+        if options['config']:
+            self.show_config(pool)
+        elif options['warm_up']:
+            pool.warm_up()
+            self.show_stats(pool)
+        elif options['probe']:
+            self.probe(pool, options['probe'], options['provider'], options['count'])
+        else:
+            self.stdout.write(
+                self.style.ERROR('Please specify an action: --config, --warm-up, or --probe')
+            )
+            self.stdout.write('Use --help for more information.')
+
+    def show_config(self, pool):
+        """Show the pool configuration."""
+        self.stdout.write(self.style.SUCCESS('LLM Client Pool Configuration'))
+        self.stdout.write('=' * 50)
+        for key, value in pool.config.items():
+            self.stdout.write(f"{key}: {value}")
+
+    def show_stats(self, pool):
+        """Show the connection reuse stats."""
+        self.stdout.write(self.style.SUCCESS('LLM Client Pool Stats'))
+        self.stdout.write('=' * 50)
+
+        stats = pool.get_stats()
+        if not stats:
+            self.stdout.write(self.style.WARNING('No provider clients have been created.'))
+            return
+
+        for provider_name, counters in stats.items():
+            self.stdout.write(
+                f"{provider_name}: {counters['requests']} requests, "
+                f"{counters['connections_opened']} connections opened, "
+                f"{counters['connections_reused']} reused"
+            )
+
+    def probe(self, pool, url: str, provider_name: str, count: int):
+        """Send requests through a provider's pooled client."""
+        client = pool.get_http_client(provider_name)
+
+        for i in range(count):
+            try:
+                response = client.get(url)
+                self.stdout.write(f"  request {i + 1}: HTTP {response.status_code}")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  request {i + 1}: {e}"))
+
+        self.show_stats(pool)
+        pool.close()
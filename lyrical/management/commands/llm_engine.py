@@ -0,0 +1,96 @@
+"""
+Django management command to stream a prompt through an LLM engine.
+
+Usage:
+  python manage.py llm_engine --provider openai --model gpt-4o-mini --prompt "Say hello"
+  python manage.py llm_engine --provider anthropic --engine anthropic --base-url http://localhost:8089 --model stub
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from ...services.llm_client_pool import get_client_pool
+from ...services.llm_engines import get_engine, ENGINE_CLASSES
+from ...models import LLMProvider
+
+
+class Command(BaseCommand):
+    help = 'Stream a prompt through the engine of an LLM provider and show the chunks and timings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--provider',
+            required=True,
+            metavar='internal_name',
+            help='Internal name of the LLM provider',
+        )
+
+        parser.add_argument(
+            '--model',
+            required=True,
+            help='Internal name of the model to call',
+        )
+
+        parser.add_argument(
+            '--engine',
+            choices=sorted(ENGINE_CLASSES.keys()),
+            help="Engine to use instead of the provider's engine",
+        )
+
+        parser.add_argument(
+            '--base-url',
+            help='Base URL to call instead of the provider default, e.g. a local stub server',
+        )
+
+        parser.add_argument(
+            '--prompt',
+            default='Write three short lines about the sea.',
+            help='User prompt to send',
+        )
+
+        parser.add_argument(
+            '--max-tokens',
+            type=int,
+            default=256,
+            help='Maximum tokens to generate (default: 256)',
+        )
+
+    def handle(self, *args, **options):
+        """Handle the management command."""
+        provider = LLMProvider.objects.filter(internal_name=options['provider']).first()
+        if provider is None:
+            raise CommandError(f"LLM provider '{options['provider']}' not found")
+
+        if options['base_url']:
+            pool = get_client_pool()
+            pool.config['BASE_URLS'] = {**(pool.config.get('BASE_URLS') or {}), provider.internal_name: options['base_url']}
+
+        engine = get_engine(options['engine'] or provider.engine)
+        self.stdout.write(self.style.SUCCESS(f"Streaming {provider.internal_name}/{options['model']} with the {engine.name} engine"))
+
+        started_at = time.monotonic()
+        first_token_at = None
+        chunks, chars, usage = 0, 0, None
+        response_stream = engine.completion(
+            model=f"{provider.internal_name}/{options['model']}",
+            messages=[{"role": "user", "content": options['prompt']}],
+            max_tokens=options['max_tokens'],
+            stream=True,
+        )
+        for chunk in response_stream:
+            usage = getattr(chunk, 'usage', None) or usage
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                content = chunk.choices[0].delta.content
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                chunks += 1
+                chars += len(content)
+                self.stdout.write(content, ending='')
+                self.stdout.flush()
+
+        duration = time.monotonic() - started_at
+        self.stdout.write('')
+        self.stdout.write('=' * 60)
+        ttft = f"{first_token_at - started_at:.3f}s" if first_token_at is not None else '-'
+        self.stdout.write(f"chunks: {chunks}, chars: {chars}, ttft: {ttft}, duration: {duration:.3f}s")
+        if usage:
+            self.stdout.write(f"usage: {dict(usage) if not isinstance(usage, dict) else usage}")
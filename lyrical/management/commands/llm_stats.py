@@ -0,0 +1,78 @@
+"""
+Django management command to show the performance stats of each LLM.
+
+Usage:
+  python manage.py llm_stats
+  python manage.py llm_stats --days 1 --prompt song_words
+  python manage.py llm_stats --by-prompt
+"""
+
+from django.core.management.base import BaseCommand
+from ...services.llm_stats import get_llm_stats
+from ...models import LLM, LLMStatsRollup
+
+
+class Command(BaseCommand):
+    help = 'Show p50/p95 latency and throughput of each LLM from the rolled up stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Number of days to summarise (default: LLM_STATS SUMMARY_DAYS)',
+        )
+
+        parser.add_argument(
+            '--prompt',
+            metavar='prompt_name',
+            help='Only summarise calls for this prompt name',
+        )
+
+        parser.add_argument(
+            '--by-prompt',
+            action='store_true',
+            help='Show a separate summary for each prompt name',
+        )
+
+    def handle(self, *args, **options):
+        """Handle the management command."""
+        stats = get_llm_stats()
+
+        if options['by_prompt']:
+            prompt_names = LLMStatsRollup.objects.values_list('prompt_name', flat=True).distinct().order_by('prompt_name')
+            for prompt_name in prompt_names:
+                self.show_summary(stats, options['days'], prompt_name)
+        else:
+            self.show_summary(stats, options['days'], options['prompt'])
+
+    def show_summary(self, stats, days, prompt_name):
+        """Show the summary of every LLM with recorded calls."""
+        title = f"LLM Stats ({prompt_name})" if prompt_name else 'LLM Stats (all prompts)'
+        self.stdout.write(self.style.SUCCESS(title))
+        self.stdout.write('=' * 100)
+
+        summaries = stats.get_summary(days, prompt_name)
+        if not summaries:
+            self.stdout.write(self.style.WARNING('No stats have been rolled up.'))
+            self.stdout.write('')
+            return
+
+        self.stdout.write(
+            f"{'model':<30} {'calls':>6} {'errors':>7} {'ttft p50':>9} {'ttft p95':>9} "
+            f"{'chars/s p50':>12} {'dur p50':>8} {'dur p95':>8} {'lines':>6}"
+        )
+        llms = LLM.objects.in_bulk(list(summaries.keys()))
+        for llm_id, summary in sorted(summaries.items(), key=lambda item: item[1]['ttft_p50'] or float('inf')):
+            llm = llms.get(llm_id)
+            self.stdout.write(
+                f"{str(llm)[:30]:<30} {summary['count']:>6} {summary['error_rate']:>7.0%} "
+                f"{self.format_value(summary['ttft_p50'], 's'):>9} {self.format_value(summary['ttft_p95'], 's'):>9} "
+                f"{self.format_value(summary['chars_per_second_p50'], ''):>12} "
+                f"{self.format_value(summary['duration_p50'], 's'):>8} {self.format_value(summary['duration_p95'], 's'):>8} "
+                f"{summary['lines_mean']:>6.1f}"
+            )
+        self.stdout.write('')
+
+    def format_value(self, value, unit: str) -> str:
+        """Format a measure, '-' when there were no samples."""
+        return '-' if value is None else f"{value:.1f}{unit}"
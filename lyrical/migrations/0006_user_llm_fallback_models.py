@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 05:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lyrical', '0005_add_songs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='llm_fallback_models',
+            field=models.CharField(blank=True, default='', max_length=1024),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-19 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lyrical', '0007_generationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llm',
+            name='first_token_timeout',
+            field=models.FloatField(default=60.0),
+        ),
+        migrations.AddField(
+            model_name='llm',
+            name='stall_timeout',
+            field=models.FloatField(default=30.0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:05
+
+from django.db import migrations, models
+
+
+LLM_TIERS = {
+    "fast": ["gemini-1.5-flash", "gemini-2.0-flash", "claude-3-haiku-20240307", "claude-3-5-haiku-latest"],
+    "large": ["gpt-4.1", "gpt-4o", "gemini-2.5-pro-preview-06-05", "claude-3-7-sonnet-latest", "claude-4-sonnet-20250514"],
+}
+
+
+def set_tiers(apps, schema_editor):
+    llm = apps.get_model("lyrical", "LLM")
+    for tier, internal_names in LLM_TIERS.items():
+        llm.objects.filter(internal_name__in=internal_names).update(tier=tier)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lyrical', '0008_llm_stream_deadlines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llm',
+            name='tier',
+            field=models.CharField(choices=[('fast', 'Fast'), ('standard', 'Standard'), ('large', 'Large')], default='standard', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='llm_auto_routing',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(set_tiers, reverse_code=migrations.RunPython.noop),
+    ]
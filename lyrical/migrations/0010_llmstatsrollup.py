@@ -0,0 +1,32 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lyrical', '0009_llm_routing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMStatsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prompt_name', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+                ('error_count', models.IntegerField(default=0)),
+                ('lines_mean', models.FloatField(default=0.0)),
+                ('ttft_p50', models.FloatField(blank=True, null=True)),
+                ('ttft_p95', models.FloatField(blank=True, null=True)),
+                ('chars_per_second_p50', models.FloatField(blank=True, null=True)),
+                ('chars_per_second_p95', models.FloatField(blank=True, null=True)),
+                ('duration_p50', models.FloatField(blank=True, null=True)),
+                ('duration_p95', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('llm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats_rollups', to='lyrical.llm')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lyrical', '0010_llmstatsrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmprovider',
+            name='engine',
+            field=models.CharField(choices=[('litellm', 'LiteLLM'), ('openai', 'OpenAI-compatible'), ('anthropic', 'Anthropic'), ('ollama', 'Ollama')], default='litellm', max_length=16),
+        ),
+    ]
@@ -1,22 +1,40 @@
+import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
 
     
 class LLMProvider(models.Model):
+    ENGINE_CHOICES = [
+        ('litellm', 'LiteLLM'),
+        ('openai', 'OpenAI-compatible'),
+        ('anthropic', 'Anthropic'),
+        ('ollama', 'Ollama'),
+    ]
+
     display_name = models.CharField(max_length=255, unique=True)
     internal_name = models.CharField(max_length=255, unique=True)
+    engine = models.CharField(max_length=16, choices=ENGINE_CHOICES, default='litellm')  # client used for LLM calls, see services/llm_engines.py
 
     def __str__(self):
         return self.display_name
 
 
 class LLM(models.Model):
+    TIER_CHOICES = [
+        ('fast', 'Fast'),
+        ('standard', 'Standard'),
+        ('large', 'Large'),
+    ]
+
     display_name = models.CharField(max_length=255, unique=True)
     internal_name = models.CharField(max_length=255, unique=True)
     cost_per_1m_tokens = models.FloatField(default=0.0)
     max_tokens = models.IntegerField(default=1024)
     use_temperature = models.BooleanField(default=True)
+    first_token_timeout = models.FloatField(default=60.0)  # seconds to wait for the first token, 0 to wait indefinitely
+    stall_timeout = models.FloatField(default=30.0)  # seconds to wait between chunks, 0 to wait indefinitely
+    tier = models.CharField(max_length=16, choices=TIER_CHOICES, default='standard')  # used to route prompts to a model of the right size
     provider = models.ForeignKey(LLMProvider, on_delete=models.CASCADE, related_name='llms')
     
     def __str__(self):
@@ -43,6 +61,8 @@ class User(AbstractUser):
     llm_model_summarise = models.ForeignKey(LLM, on_delete=models.PROTECT, null=False, blank=False, related_name='users_summarise')
     llm_temperature = models.FloatField(default=0.2)
     llm_max_tokens = models.IntegerField(default=100)
+    llm_fallback_models = models.CharField(max_length=1024, blank=True, default='')  # comma separated LLM internal names, tried in order
+    llm_auto_routing = models.BooleanField(default=False)  # route prompts to a model of their tier, see services/llm_routing.py
 
     # song name default params
     song_name_theme_inc = models.CharField(max_length=255, default='')
@@ -58,6 +78,11 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.first_name} {self.last_name})"
     
+    @property
+    def llm_fallback_model_names(self):
+        """Returns the ordered internal names of the user's fallback LLMs."""
+        return [name.strip() for name in self.llm_fallback_models.split(',') if name.strip()]
+
     @property
     def max_tokens_for_selected_llm(self):
         """Returns the maximum tokens for the user's LLM model."""
@@ -270,4 +295,37 @@ class Message(models.Model):
 
     def __str__(self):
         return f"{self.role}: {self.content[:50]}... ({self.song.name})"
-    
\ No newline at end of file
+    
+
+
+class GenerationJob(models.Model):
+    stream_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generation_jobs')
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, null=True, blank=True, related_name='generation_jobs')
+    prompt_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=50, default='running', choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')])
+    line_count = models.IntegerField(default=0)
+    output = models.TextField(default='')  # NDJSON lines emitted so far
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.prompt_name} ({self.status}, {self.line_count} lines)"
+
+
+class LLMStatsRollup(models.Model):
+    llm = models.ForeignKey(LLM, on_delete=models.CASCADE, related_name='stats_rollups')
+    prompt_name = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    lines_mean = models.FloatField(default=0.0)
+    ttft_p50 = models.FloatField(null=True, blank=True)  # seconds to the first token
+    ttft_p95 = models.FloatField(null=True, blank=True)
+    chars_per_second_p50 = models.FloatField(null=True, blank=True)
+    chars_per_second_p95 = models.FloatField(null=True, blank=True)
+    duration_p50 = models.FloatField(null=True, blank=True)  # seconds for a complete response
+    duration_p95 = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.llm} {self.prompt_name} ({self.count} calls)"
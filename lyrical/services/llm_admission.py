@@ -0,0 +1,319 @@
+"""
+LLM Admission Control Service
+
+This service bounds the number of concurrent LLM calls in a worker so that a
+single user with many tabs, or a burst of summarisations, cannot exhaust the
+worker threads and provider rate limits for everyone else.
+
+Every call must be admitted before the engine completion() is called and holds
+its slot until the response has been consumed. A call is admitted when the
+global, per-provider and per-user concurrency limits all have a free slot and
+the provider's token bucket has a request token. Calls that cannot be admitted
+wait for at most MAX_WAIT_SECONDS before AdmissionTimeout is raised.
+
+Every call also has a priority class. Interactive generations go ahead of
+summarisation, which goes ahead of batch jobs: a waiting lower priority call
+is passed over while a higher priority call waits for the same capacity, and
+the lower priority classes can be capped to a share of the slots so that
+interactive streams always find room.
+
+Configuration is read from settings.LLM_ADMISSION (see root/settings.py).
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+from django.conf import settings
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Priority classes, highest priority first
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_SUMMARISE = 'summarise'
+PRIORITY_BATCH = 'batch'
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_SUMMARISE, PRIORITY_BATCH)
+
+# Default admission configuration, overridden by settings.LLM_ADMISSION
+DEFAULT_ADMISSION_CONFIG = {
+    'ENABLED': True,
+    'MAX_WAIT_SECONDS': 30.0,
+    'PRIORITY_MAX_WAIT_SECONDS': {PRIORITY_SUMMARISE: 120.0, PRIORITY_BATCH: 600.0},
+    'GLOBAL_CONCURRENCY': 32,
+    'PROVIDER_CONCURRENCY': {'*': 16},
+    'USER_CONCURRENCY': 4,
+    'PRIORITY_CONCURRENCY': {PRIORITY_SUMMARISE: 8, PRIORITY_BATCH: 8},
+    'PROVIDER_REQUESTS_PER_MINUTE': {},
+}
+
+# Queue wait time samples kept per priority class
+WAIT_SAMPLE_WINDOW = 500
+
+
+class AdmissionTimeout(Exception):
+    """
+    Raised when an LLM call could not be admitted within the maximum wait.
+    """
+
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Request rate limit, refilled continuously up to one minute of requests.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.capacity = float(requests_per_minute)
+        self.tokens = self.capacity
+        self.refill_rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def seconds_until_available(self) -> float:
+        """
+        Seconds until a token is available, 0 if one is available now (caller holds the lock).
+        """
+        self.refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_rate
+
+
+class _Waiter:
+    """
+    A call waiting for admission.
+    """
+
+    def __init__(self, rank: int, provider_name: str):
+        self.rank = rank
+        self.provider_name = provider_name
+        # the shared limit the call is waiting for: 'global', 'provider' or None
+        self.blocked_on = None
+
+
+class AdmissionController:
+    """
+    Priority-aware admission layer that every LLM call goes through.
+
+    Features:
+    - Global, per-provider, per-user and per-priority concurrency limits
+    - Per-provider request rate limits (token bucket)
+    - Queueing with a bounded wait, a waiting call is admitted as soon as its limits allow
+    - Lower priority waiters are passed over while a higher priority call waits for the same capacity
+    - Counters for admitted, queued and rejected calls and queue wait times per priority class
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the controller.
+
+        Args:
+            config: Admission configuration, merged over DEFAULT_ADMISSION_CONFIG
+        """
+        self.config = {**DEFAULT_ADMISSION_CONFIG, **(config or {})}
+        self._condition = threading.Condition()
+        self._active_global = 0
+        self._active_providers: Dict[str, int] = {}
+        self._active_users: Dict[Any, int] = {}
+        self._active_priorities: Dict[str, int] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waiters: List[_Waiter] = []
+        self._wait_times = {priority: deque(maxlen=WAIT_SAMPLE_WINDOW) for priority in PRIORITY_CLASSES}
+        self.counters = {
+            priority: {'admitted': 0, 'queued': 0, 'rejected': 0}
+            for priority in PRIORITY_CLASSES
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def _get_provider_limit(self, provider_name: str) -> Optional[int]:
+        limits = self.config.get('PROVIDER_CONCURRENCY') or {}
+        return limits.get(provider_name, limits.get('*'))
+
+    def _get_bucket(self, provider_name: str) -> Optional[TokenBucket]:
+        rates = self.config.get('PROVIDER_REQUESTS_PER_MINUTE') or {}
+        rate = rates.get(provider_name, rates.get('*'))
+        if not rate:
+            return None
+        bucket = self._buckets.get(provider_name)
+        if bucket is None:
+            bucket = TokenBucket(rate)
+            self._buckets[provider_name] = bucket
+        return bucket
+
+    def _check_admissible(self, waiter: _Waiter, user_id: Any, priority: str) -> Tuple[Optional[str], float]:
+        """
+        Check if a call could be admitted now.
+
+        Returns:
+            Tuple of (the limit blocking the call or None, seconds until the rate limit allows it)
+        """
+        global_limit = self.config.get('GLOBAL_CONCURRENCY')
+        if global_limit and self._active_global >= global_limit:
+            return 'global', 0.0
+
+        provider_name = waiter.provider_name
+        provider_limit = self._get_provider_limit(provider_name)
+        if provider_limit and self._active_providers.get(provider_name, 0) >= provider_limit:
+            return 'provider', 0.0
+
+        # pass over this call while a higher priority call waits for the same capacity
+        for other in self._waiters:
+            if other.rank < waiter.rank and (
+                other.blocked_on == 'global' or
+                (other.blocked_on == 'provider' and other.provider_name == provider_name)
+            ):
+                return 'priority', 0.0
+
+        priority_limit = (self.config.get('PRIORITY_CONCURRENCY') or {}).get(priority)
+        if priority_limit and self._active_priorities.get(priority, 0) >= priority_limit:
+            return 'priority', 0.0
+
+        user_limit = self.config.get('USER_CONCURRENCY')
+        if user_limit and user_id is not None and self._active_users.get(user_id, 0) >= user_limit:
+            return 'user', 0.0
+
+        bucket = self._get_bucket(provider_name)
+        wait_for = bucket.seconds_until_available() if bucket else 0.0
+        return ('rate' if wait_for else None), wait_for
+
+    def get_max_wait(self, priority: str) -> float:
+        """
+        Get the longest a call of a priority class waits for admission.
+        """
+        return (self.config.get('PRIORITY_MAX_WAIT_SECONDS') or {}).get(priority, self.config['MAX_WAIT_SECONDS'])
+
+    @contextmanager
+    def admit(self, user_id: Any, provider_name: str, priority: str = PRIORITY_INTERACTIVE):
+        """
+        Hold an admission slot for an LLM call for the duration of the block.
+
+        Args:
+            user_id: ID of the user making the call
+            provider_name: Internal name of the LLM provider
+            priority: Priority class of the call, one of PRIORITY_CLASSES
+
+        Raises:
+            AdmissionTimeout: If the call could not be admitted within its maximum wait
+        """
+        if not self.enabled:
+            yield
+            return
+
+        max_wait = self.get_max_wait(priority)
+        started_at = time.monotonic()
+        deadline = started_at + max_wait
+        waiter = _Waiter(PRIORITY_CLASSES.index(priority), provider_name)
+        counters = self.counters[priority]
+
+        with self._condition:
+            queued = False
+            try:
+                while True:
+                    blocked_on, wait_for = self._check_admissible(waiter, user_id, priority)
+                    if blocked_on is None:
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        counters['rejected'] += 1
+                        logger.warning(f"LLM_ADMISSION: Rejected {priority} call for user {user_id} to '{provider_name}' after waiting {max_wait:.0f}s")
+                        raise AdmissionTimeout(
+                            "Too many LLM requests in progress, please try again shortly",
+                            retry_after=max_wait,
+                        )
+
+                    if not queued:
+                        queued = True
+                        self._waiters.append(waiter)
+                        counters['queued'] += 1
+                    if waiter.blocked_on != blocked_on:
+                        waiter.blocked_on = blocked_on
+                        # lower priority waiters re-check whether they are passed over
+                        self._condition.notify_all()
+                    self._condition.wait(min(remaining, wait_for) if wait_for else remaining)
+            finally:
+                if queued:
+                    self._waiters.remove(waiter)
+                    self._condition.notify_all()
+
+            # admitted: take a slot from every limit
+            self._active_global += 1
+            self._active_providers[provider_name] = self._active_providers.get(provider_name, 0) + 1
+            self._active_priorities[priority] = self._active_priorities.get(priority, 0) + 1
+            if user_id is not None:
+                self._active_users[user_id] = self._active_users.get(user_id, 0) + 1
+            bucket = self._get_bucket(provider_name)
+            if bucket:
+                bucket.tokens -= 1
+            counters['admitted'] += 1
+            self._wait_times[priority].append(time.monotonic() - started_at)
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active_global -= 1
+                self._active_providers[provider_name] -= 1
+                self._active_priorities[priority] -= 1
+                if user_id is not None:
+                    self._active_users[user_id] -= 1
+                    if not self._active_users[user_id]:
+                        del self._active_users[user_id]
+                self._condition.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the admission counters, queue wait times per priority class and
+        current number of active and waiting calls.
+        """
+        with self._condition:
+            priorities = {}
+            for priority in PRIORITY_CLASSES:
+                wait_times = sorted(self._wait_times[priority])
+                priorities[priority] = {
+                    **self.counters[priority],
+                    'active': self._active_priorities.get(priority, 0),
+                    'waiting': sum(1 for waiter in self._waiters if waiter.rank == PRIORITY_CLASSES.index(priority)),
+                    'wait_mean': round(sum(wait_times) / len(wait_times), 3) if wait_times else 0.0,
+                    'wait_p95': round(wait_times[min(int(len(wait_times) * 0.95), len(wait_times) - 1)], 3) if wait_times else 0.0,
+                    'wait_max': round(wait_times[-1], 3) if wait_times else 0.0,
+                }
+            return {
+                'active': self._active_global,
+                'waiting': len(self._waiters),
+                'active_per_provider': {name: count for name, count in self._active_providers.items() if count},
+                'priorities': priorities,
+            }
+
+
+# Module-level controller shared by all LLM calls in this worker
+_admission_controller = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Get the worker-wide admission controller, creating it from settings on first use.
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController(getattr(settings, 'LLM_ADMISSION', None))
+    return _admission_controller
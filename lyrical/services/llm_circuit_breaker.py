@@ -0,0 +1,283 @@
+"""
+LLM Circuit Breaker Service
+
+This service tracks the health of every LLM and LLM provider with a circuit
+breaker, so that generations skip a degraded upstream immediately and fail
+over to the next model in the fallback list instead of waiting for timeouts.
+
+A breaker opens when the error rate (failed or slow calls) over its recent
+window exceeds the threshold, rejects calls while open, and lets a limited
+number of probe calls through once OPEN_SECONDS have passed (half-open). A
+successful probe closes the breaker, a failed probe opens it again.
+
+Errors caused by the request rather than the upstream (IGNORED_STATUS_CODES,
+e.g. a 401 from a user's invalid API key or a 400 for a bad request) are not
+counted, so a single user cannot open the breaker of a provider for everyone.
+
+Configuration is read from settings.LLM_FAILOVER (see root/settings.py).
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+from django.conf import settings
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default failover configuration, overridden by settings.LLM_FAILOVER
+DEFAULT_FAILOVER_CONFIG = {
+    'ENABLED': True,
+    'FALLBACK_LLMS': {},
+    'WINDOW_SIZE': 20,
+    'MIN_CALLS': 5,
+    'ERROR_RATE_THRESHOLD': 0.5,
+    'SLOW_CALL_SECONDS': 30.0,
+    'OPEN_SECONDS': 60.0,
+    'HALF_OPEN_MAX_CALLS': 1,
+    'IGNORED_STATUS_CODES': [400, 401, 403, 413, 422],
+}
+
+# Circuit breaker states
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when every candidate LLM for a generation is unavailable.
+    """
+
+    status_code = 503
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single LLM or LLM provider.
+    """
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.config = config
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self._outcomes = deque(maxlen=config['WINDOW_SIZE'])
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Check if a call may be made, moving an open breaker to half-open once it has cooled down.
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+
+            if self.state == STATE_OPEN:
+                if time.monotonic() - self.opened_at < self.config['OPEN_SECONDS']:
+                    return False
+                self.state = STATE_HALF_OPEN
+                self.half_open_calls = 0
+                logger.info(f"LLM_CIRCUIT_BREAKER: '{self.name}' is half-open, probing")
+
+            if self.half_open_calls >= self.config['HALF_OPEN_MAX_CALLS']:
+                # a probe that never reported back (e.g. abandoned stream) must not block the breaker forever
+                if time.monotonic() - self.opened_at < 2 * self.config['OPEN_SECONDS']:
+                    return False
+                self.opened_at = time.monotonic() - self.config['OPEN_SECONDS']
+                self.half_open_calls = 0
+            self.half_open_calls += 1
+            return True
+
+    def can_request(self) -> bool:
+        """
+        Check if allow_request() would allow a call, without changing the breaker state.
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN:
+                return time.monotonic() - self.opened_at >= self.config['OPEN_SECONDS']
+            return self.half_open_calls < self.config['HALF_OPEN_MAX_CALLS'] or \
+                time.monotonic() - self.opened_at >= 2 * self.config['OPEN_SECONDS']
+
+    def is_open(self) -> bool:
+        """
+        Check if the breaker is rejecting calls, without taking a half-open probe slot.
+        """
+        with self._lock:
+            return self.state == STATE_OPEN and time.monotonic() - self.opened_at < self.config['OPEN_SECONDS']
+
+    def record_success(self, latency: float) -> None:
+        """
+        Record a completed call, a call slower than SLOW_CALL_SECONDS counts as an error.
+        """
+        if latency > self.config['SLOW_CALL_SECONDS']:
+            self._record(False)
+        else:
+            self._record(True)
+
+    def record_failure(self) -> None:
+        """
+        Record a failed call.
+        """
+        self._record(False)
+
+    def _record(self, success: bool) -> None:
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                if success:
+                    self.state = STATE_CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"LLM_CIRCUIT_BREAKER: '{self.name}' closed after a successful probe")
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            if self.state == STATE_CLOSED and len(self._outcomes) >= self.config['MIN_CALLS']:
+                if self._error_rate() >= self.config['ERROR_RATE_THRESHOLD']:
+                    self._open()
+
+    def _open(self) -> None:
+        self.state = STATE_OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(f"LLM_CIRCUIT_BREAKER: '{self.name}' opened (error rate {self._error_rate():.0%})")
+
+    def _error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the breaker state and error rate.
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': len(self._outcomes),
+                'error_rate': round(self._error_rate(), 3),
+            }
+
+
+class CircuitBreakerRegistry:
+    """
+    Circuit breakers for every LLM and LLM provider, created on first use.
+
+    Features:
+    - One breaker per model (provider/model) and one per provider
+    - A call is only allowed when both the model and its provider allow it
+    - Ordered fallback LLMs per prompt name
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            config: Failover configuration, merged over DEFAULT_FAILOVER_CONFIG
+        """
+        self.config = {**DEFAULT_FAILOVER_CONFIG, **(config or {})}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._allow_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def get_breaker(self, name: str) -> CircuitBreaker:
+        """
+        Get the breaker for a model or provider, creating it on first use.
+        """
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self.config)
+                self._breakers[name] = breaker
+            return breaker
+
+    def allow_request(self, model_name: str) -> bool:
+        """
+        Check if a call to a model (provider/model) may be made.
+        """
+        if not self.enabled:
+            return True
+        provider_name = model_name.split('/', 1)[0]
+        breakers = (self.get_breaker(f"provider:{provider_name}"), self.get_breaker(f"llm:{model_name}"))
+        with self._allow_lock:
+            # a probe slot of one breaker must not be used up by a call the other breaker rejects
+            if not all(breaker.can_request() for breaker in breakers):
+                return False
+            return all([breaker.allow_request() for breaker in breakers])
+
+    def is_open(self, model_name: str) -> bool:
+        """
+        Check if calls to a model (provider/model) are currently rejected.
+        """
+        if not self.enabled:
+            return False
+        provider_name = model_name.split('/', 1)[0]
+        return self.get_breaker(f"provider:{provider_name}").is_open() or \
+            self.get_breaker(f"llm:{model_name}").is_open()
+
+    def record_success(self, model_name: str, latency: float) -> None:
+        """
+        Record a successful call to a model, latency is the time to the first token.
+        """
+        if not self.enabled:
+            return
+        provider_name = model_name.split('/', 1)[0]
+        self.get_breaker(f"provider:{provider_name}").record_success(latency)
+        self.get_breaker(f"llm:{model_name}").record_success(latency)
+
+    def record_failure(self, model_name: str, error: Optional[Exception] = None) -> None:
+        """
+        Record a failed call to a model, unless the error was caused by the request.
+        """
+        if not self.enabled:
+            return
+        status_code = getattr(error, 'status_code', None)
+        if status_code in self.config['IGNORED_STATUS_CODES']:
+            logger.debug(f"LLM_CIRCUIT_BREAKER: Not counting HTTP {status_code} from '{model_name}' as a failure")
+            return
+        provider_name = model_name.split('/', 1)[0]
+        self.get_breaker(f"provider:{provider_name}").record_failure()
+        self.get_breaker(f"llm:{model_name}").record_failure()
+
+    def get_fallback_llm_names(self, prompt_name: str) -> List[str]:
+        """
+        Get the ordered fallback LLM internal names configured for a prompt name.
+        """
+        fallback_llms = self.config.get('FALLBACK_LLMS') or {}
+        return list(fallback_llms.get(prompt_name) or fallback_llms.get('*') or [])
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the state of every breaker.
+        """
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.get_stats() for breaker in breakers}
+
+
+# Module-level registry shared by all generators in this worker
+_breaker_registry = None
+_breaker_registry_lock = threading.Lock()
+
+
+def get_breaker_registry() -> CircuitBreakerRegistry:
+    """
+    Get the worker-wide circuit breaker registry, creating it from settings on first use.
+    """
+    global _breaker_registry
+    if _breaker_registry is None:
+        with _breaker_registry_lock:
+            if _breaker_registry is None:
+                _breaker_registry = CircuitBreakerRegistry(getattr(settings, 'LLM_FAILOVER', None))
+    return _breaker_registry
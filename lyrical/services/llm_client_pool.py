@@ -0,0 +1,237 @@
+"""
+LLM Client Pool Service
+
+This service keeps one persistent, keep-alive HTTP client per LLM provider for
+the lifetime of the worker process, so that every LLM call made by the
+generators and the summariser reuses already-open TLS connections instead of
+paying for a new handshake on each request.
+
+Configuration is read from settings.LLM_CLIENT_POOL (see root/settings.py).
+"""
+
+import os
+import threading
+from typing import Dict, Any, Optional
+import httpx
+from django.conf import settings
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default base URLs used when warming up provider connections and by the native engines
+DEFAULT_PROVIDER_BASE_URLS = {
+    'openai': 'https://api.openai.com',
+    'anthropic': 'https://api.anthropic.com',
+    'gemini': 'https://generativelanguage.googleapis.com',
+    'ollama': 'http://localhost:11434',
+    'xai': 'https://api.x.ai',
+}
+
+# Default pool configuration, overridden by settings.LLM_CLIENT_POOL
+DEFAULT_POOL_CONFIG = {
+    'ENABLED': True,
+    'MAX_CONNECTIONS': 10,
+    'MAX_KEEPALIVE_CONNECTIONS': 5,
+    'KEEPALIVE_EXPIRY': 120.0,
+    'TIMEOUT': 600.0,
+    'PROVIDER_MAX_CONNECTIONS': {},
+    'BASE_URLS': {},
+    'WARM_UP': False,
+}
+
+
+class LLMClientPool:
+    """
+    Per-worker pool of persistent HTTP clients, one per LLM provider.
+
+    Features:
+    - Keep-alive connections shared by all LLM calls in the worker
+    - Configurable maximum connections per provider
+    - Optional warm-up of provider connections at worker start
+    - Connection reuse statistics (requests vs. new connections opened)
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            config: Pool configuration, merged over DEFAULT_POOL_CONFIG
+        """
+        self.config = {**DEFAULT_POOL_CONFIG, **(config or {})}
+        self._clients: Dict[str, httpx.Client] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED', True))
+
+    def get_base_url(self, provider_name: str) -> Optional[str]:
+        """
+        Get the base URL for a provider, honouring configured overrides.
+        """
+        base_urls = self.config.get('BASE_URLS') or {}
+        if provider_name in base_urls:
+            return base_urls[provider_name]
+        if provider_name == 'ollama' and os.environ.get('OLLAMA_API_BASE'):
+            return os.environ['OLLAMA_API_BASE']
+        return DEFAULT_PROVIDER_BASE_URLS.get(provider_name)
+
+    def get_http_client(self, provider_name: str) -> httpx.Client:
+        """
+        Get (creating on first use) the shared HTTP client for a provider.
+
+        Args:
+            provider_name: LLMProvider.internal_name
+
+        Returns:
+            Persistent httpx.Client for the provider
+        """
+        client = self._clients.get(provider_name)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(provider_name)
+            if client is None:
+                client = self._create_client(provider_name)
+                self._clients[provider_name] = client
+                self._stats[provider_name] = {'requests': 0, 'connections_opened': 0}
+                logger.info(f"Created pooled HTTP client for provider '{provider_name}'")
+            return client
+
+    def completion_kwargs(self, provider_name: str, api_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the extra keyword arguments that make litellm.completion() use
+        the pooled client for a provider.
+
+        Args:
+            provider_name: LLMProvider.internal_name
+            api_key: API key for the call (required for OpenAI clients)
+
+        Returns:
+            Dict to merge into the completion() parameters (empty if pooling is disabled)
+        """
+        if not self.enabled:
+            return {}
+
+        try:
+            http_client = self.get_http_client(provider_name)
+
+            if provider_name == 'openai':
+                # litellm expects an OpenAI SDK client for the openai provider
+                import openai
+                api_key = api_key or os.environ.get('OPENAI_API_KEY')
+                if not api_key:
+                    return {}
+                return {"client": openai.OpenAI(api_key=api_key, http_client=http_client)}
+
+            # all other providers go through litellm's HTTP handler
+            from litellm.llms.custom_httpx.http_handler import HTTPHandler
+            return {"client": HTTPHandler(client=http_client)}
+
+        except Exception as e:
+            logger.warning(f"Failed to get pooled client for provider '{provider_name}', using litellm default: {e}")
+            return {}
+
+    def warm_up(self, provider_names=None) -> None:
+        """
+        Open a connection to each provider so the first real request can reuse it.
+
+        Args:
+            provider_names: Providers to warm up (default: all known providers)
+        """
+        for provider_name in provider_names or DEFAULT_PROVIDER_BASE_URLS.keys():
+            base_url = self.get_base_url(provider_name)
+            if not base_url:
+                continue
+            try:
+                self.get_http_client(provider_name).head(base_url, timeout=5.0)
+                logger.debug(f"Warmed up connection to provider '{provider_name}' at {base_url}")
+            except Exception as e:
+                logger.debug(f"Warm-up failed for provider '{provider_name}' at {base_url}: {e}")
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get connection reuse statistics per provider.
+
+        Returns:
+            Dict of provider name to requests, connections_opened and connections_reused
+        """
+        stats = {}
+        with self._lock:
+            for provider_name, counters in self._stats.items():
+                requests = counters['requests']
+                opened = counters['connections_opened']
+                stats[provider_name] = {
+                    'requests': requests,
+                    'connections_opened': opened,
+                    'connections_reused': max(requests - opened, 0),
+                }
+        return stats
+
+    def close(self) -> None:
+        """
+        Close all pooled clients.
+        """
+        with self._lock:
+            for client in self._clients.values():
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            self._clients.clear()
+
+    def _create_client(self, provider_name: str) -> httpx.Client:
+        """
+        Create a keep-alive HTTP client for a provider with connection tracing.
+        """
+        max_connections = (self.config.get('PROVIDER_MAX_CONNECTIONS') or {}).get(
+            provider_name, self.config['MAX_CONNECTIONS']
+        )
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(self.config['MAX_KEEPALIVE_CONNECTIONS'], max_connections),
+            keepalive_expiry=self.config['KEEPALIVE_EXPIRY'],
+        )
+
+        # the hooks run on every thread sharing the client
+        def on_request(request):
+            stats = self._stats[provider_name]
+            with self._lock:
+                stats['requests'] += 1
+
+            # httpcore reports a connect_tcp event only when a new connection is opened
+            def trace(event_name, info):
+                if event_name == 'connection.connect_tcp.complete':
+                    with self._lock:
+                        stats['connections_opened'] += 1
+
+            request.extensions['trace'] = trace
+
+        return httpx.Client(
+            limits=limits,
+            timeout=self.config['TIMEOUT'],
+            follow_redirects=True,
+            event_hooks={'request': [on_request]},
+        )
+
+
+# Module-level pool shared by all LLM calls in this worker
+_client_pool = None
+_client_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> LLMClientPool:
+    """
+    Get the worker-wide LLM client pool, creating it from settings on first use.
+    """
+    global _client_pool
+    if _client_pool is None:
+        with _client_pool_lock:
+            if _client_pool is None:
+                _client_pool = LLMClientPool(getattr(settings, 'LLM_CLIENT_POOL', None))
+    return _client_pool
@@ -0,0 +1,202 @@
+"""
+LLM Continuation Service
+
+This service recovers streams that fail after content has already reached the
+client. A failover to another model is only possible before the first token,
+so when the provider fails mid-stream with a retryable error (429, 5xx, a
+dropped connection or a stalled stream) the same model is asked to continue
+instead: the request is re-issued with the text already emitted appended as an
+assistant message, after an exponential backoff.
+
+Providers that support assistant prefill (PREFILL_PROVIDERS) continue the
+prefix directly; other providers are also sent a user message asking them to
+continue where the response stopped. The continued response is framed into
+lines that follow on from the emitted text: the line left incomplete by the
+failure is completed, and lines that were already emitted are skipped.
+
+Configuration is read from settings.LLM_CONTINUATION (see root/settings.py).
+"""
+
+import random
+import threading
+from typing import Dict, Any, List, Optional
+import httpx
+from django.conf import settings
+from .utils import jsoncodec
+from .utils.ndjson import NDJSONFramer
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default continuation configuration, overridden by settings.LLM_CONTINUATION
+DEFAULT_CONTINUATION_CONFIG = {
+    'ENABLED': True,
+    'MAX_RETRIES': 2,
+    'BACKOFF_SECONDS': 0.5,
+    'MAX_BACKOFF_SECONDS': 8.0,
+    'RETRYABLE_STATUS_CODES': [429, 500, 502, 503, 504, 529],
+    'PREFILL_PROVIDERS': ['anthropic'],
+    'CONTINUE_PROMPT': 'Your previous response was cut off. Continue it exactly where it stopped, without repeating any lines already written.',
+}
+
+
+def _is_json(text: str) -> bool:
+    try:
+        jsoncodec.loads(text)
+        return True
+    except (jsoncodec.JSONDecodeError, ValueError):
+        return False
+
+
+class ContinuationFramer:
+    """
+    Frames a continued response into the lines that follow on from the text
+    already emitted.
+    """
+
+    def __init__(self, emitted_text: str):
+        """
+        Initialize the framer.
+
+        Args:
+            emitted_text: Response text already emitted before the failure
+        """
+        emitted_lines = emitted_text.split('\n')
+        self.tail: Optional[str] = emitted_lines[-1]
+        self.seen_lines = {line.strip() for line in emitted_lines[:-1] if line.strip()}
+        self._framer = NDJSONFramer()
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Add a chunk of the continued response.
+
+        Returns:
+            Text to emit for the lines completed by this chunk
+        """
+        return self._frame(self._framer.feed(chunk))
+
+    def flush(self) -> List[str]:
+        """
+        Return the text to emit for the last line of the continued response.
+        """
+        remaining = self._framer.flush()
+        return self._frame([remaining]) if remaining.strip() else []
+
+    def _frame(self, lines: List[str]) -> List[str]:
+        texts = []
+        for line in lines:
+            stripped_line = line.strip()
+            if not stripped_line or stripped_line in self.seen_lines:
+                # the response may be regenerated from its start, repeated lines are skipped
+                continue
+
+            if self.tail is not None:
+                tail, self.tail = self.tail, None
+                if tail.strip():
+                    completed = self._complete_tail(tail, line)
+                    if completed is not None:
+                        texts.append(completed)
+                        continue
+                    # the incomplete line was abandoned, terminate it
+                    texts.append('\n')
+
+            self.seen_lines.add(stripped_line)
+            texts.append(line + '\n')
+        return texts
+
+    def _complete_tail(self, tail: str, line: str) -> Optional[str]:
+        """
+        Get the text that completes the incomplete line from the first line of
+        the continued response, None if the line does not continue it.
+        """
+        # the incomplete line was regenerated from its start
+        if line.startswith(tail):
+            self.seen_lines.add(line.strip())
+            return line[len(tail):] + '\n'
+
+        # the incomplete line was continued
+        if _is_json(tail + line):
+            self.seen_lines.add((tail + line).strip())
+            return line + '\n'
+
+        return None
+
+
+class ContinuationPolicy:
+    """
+    When and how a stream that failed mid-response is continued.
+
+    Features:
+    - Retryable errors by status code (429, 5xx), dropped connection or stalled stream
+    - Exponential backoff with jitter between continuation attempts
+    - Continuation messages with the emitted text as an assistant prefix
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            config: Continuation configuration, merged over DEFAULT_CONTINUATION_CONFIG
+        """
+        self.config = {**DEFAULT_CONTINUATION_CONFIG, **(config or {})}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Check whether a mid-stream failure is worth continuing.
+        """
+        if not self.enabled:
+            return False
+        if getattr(error, 'status_code', None) in self.config['RETRYABLE_STATUS_CODES']:
+            return True
+        # a dropped connection or a stream that stalled (StreamStallError)
+        return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+
+    def get_backoff(self, attempt: int) -> float:
+        """
+        Get the seconds to wait before a continuation attempt (numbered from 0).
+        """
+        delay = min(self.config['BACKOFF_SECONDS'] * (2 ** attempt), self.config['MAX_BACKOFF_SECONDS'])
+        # jitter keeps the retries of concurrent streams from arriving together
+        return delay * random.uniform(0.5, 1.0)
+
+    def build_messages(self, messages: List[Dict[str, Any]], emitted_text: str, provider_name: str) -> List[Dict[str, Any]]:
+        """
+        Build the messages of a continuation request.
+
+        Args:
+            messages: Messages of the failed request
+            emitted_text: Response text already emitted
+            provider_name: LLMProvider.internal_name of the model
+
+        Returns:
+            The messages followed by the emitted text as an assistant message
+        """
+        # prefill must not end with whitespace
+        messages = list(messages) + [{"role": "assistant", "content": emitted_text.rstrip()}]
+        if provider_name not in self.config['PREFILL_PROVIDERS']:
+            messages.append({"role": "user", "content": self.config['CONTINUE_PROMPT']})
+        return messages
+
+
+# Module-level policy shared by all generators in this worker
+_continuation_policy = None
+_continuation_policy_lock = threading.Lock()
+
+
+def get_continuation_policy() -> ContinuationPolicy:
+    """
+    Get the worker-wide continuation policy, creating it from settings on first use.
+    """
+    global _continuation_policy
+    if _continuation_policy is None:
+        with _continuation_policy_lock:
+            if _continuation_policy is None:
+                _continuation_policy = ContinuationPolicy(getattr(settings, 'LLM_CONTINUATION', None))
+    return _continuation_policy
@@ -0,0 +1,439 @@
+"""
+LLM Engines Service
+
+This service abstracts the client library that makes LLM calls. Each
+LLMProvider selects an engine (LLMProvider.engine):
+
+- 'litellm': litellm.completion(), the default, supports every provider
+- 'openai': native client for OpenAI-compatible chat completion APIs
+- 'anthropic': native client for the Anthropic messages API
+- 'ollama': native client for the Ollama chat API
+
+The native engines post the request with the worker's pooled httpx client
+for the provider (see llm_client_pool) and parse the streamed response
+incrementally (server-sent events, or NDJSON for Ollama), without importing
+litellm. All engines take the litellm completion() parameters and return
+objects of the same shape: a stream of chunks with choices[i].delta.content
+and usage, or for stream=False a response with choices[i].message.content.
+
+Base URLs come from the client pool (LLM_CLIENT_POOL['BASE_URLS'] overrides
+them, e.g. to test against a local stub server); engine options are read from
+settings.LLM_ENGINES (see root/settings.py).
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from django.conf import settings
+from .llm_client_pool import get_client_pool
+from .utils import jsoncodec
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Engine names, as stored in LLMProvider.engine
+ENGINE_LITELLM = 'litellm'
+ENGINE_OPENAI = 'openai'
+ENGINE_ANTHROPIC = 'anthropic'
+ENGINE_OLLAMA = 'ollama'
+
+# Default engine configuration, overridden by settings.LLM_ENGINES
+DEFAULT_ENGINE_CONFIG = {
+    'ANTHROPIC_VERSION': '2023-06-01',
+    'ANTHROPIC_MAX_TOKENS': 8192,
+}
+
+
+class LLMEngineError(Exception):
+    """
+    Raised when a provider rejects a request or fails mid-stream.
+    """
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Delta:
+    __slots__ = ('content',)
+
+    def __init__(self, content: Optional[str]):
+        self.content = content
+
+
+class Message:
+    __slots__ = ('role', 'content')
+
+    def __init__(self, content: str):
+        self.role = 'assistant'
+        self.content = content
+
+
+class Choice:
+    __slots__ = ('index', 'delta', 'message')
+
+    def __init__(self, index: int, delta: Optional[Delta] = None, message: Optional[Message] = None):
+        self.index = index
+        self.delta = delta
+        self.message = message
+
+
+class StreamChunk:
+    """
+    A chunk of a streamed response, shaped like a litellm streaming chunk.
+    """
+
+    __slots__ = ('choices', 'usage')
+
+    def __init__(self, choices: List[Choice], usage: Optional[Dict[str, Any]] = None):
+        self.choices = choices
+        self.usage = usage
+
+
+class CompletionResponse:
+    """
+    A complete response, shaped like a litellm completion response.
+    """
+
+    __slots__ = ('choices', 'usage')
+
+    def __init__(self, choices: List[Choice], usage: Optional[Dict[str, Any]] = None):
+        self.choices = choices
+        self.usage = usage
+
+
+def iter_sse_events(lines: Iterator[str]) -> Iterator[Tuple[Optional[str], str]]:
+    """
+    Parse server-sent events from the lines of a streamed response.
+
+    Yields:
+        Tuples of (event name or None, data) for each complete event
+    """
+    event, data = None, []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, '\n'.join(data)
+            event, data = None, []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'event':
+            event = value
+        elif field == 'data':
+            data.append(value)
+    if data:
+        yield event, '\n'.join(data)
+
+
+class StreamResponse:
+    """
+    A streamed HTTP response from a native engine, iterated as StreamChunks.
+
+    The request is sent when the response is created, so HTTP errors are
+    raised by completion() before any content, like litellm does.
+    """
+
+    def __init__(self, engine: 'HTTPEngine', provider_name: str, url: str, headers: Dict[str, str], body: Dict[str, Any]):
+        self._engine = engine
+        client = get_client_pool().get_http_client(provider_name)
+        self._response = client.send(client.build_request('POST', url, headers=headers, json=body), stream=True)
+        if self._response.status_code >= 400:
+            try:
+                detail = self._response.read().decode('utf-8', 'replace')[:500]
+            finally:
+                self._response.close()
+            raise LLMEngineError(f"{provider_name} returned HTTP {self._response.status_code}: {detail}", self._response.status_code)
+
+    def __iter__(self) -> Iterator[StreamChunk]:
+        lines = self._response.iter_lines()
+        try:
+            yield from self._engine.parse_stream(lines)
+            # read to the end of the body so the connection goes back to the pool
+            for _ in lines:
+                pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._response.close()
+
+    def collect(self) -> CompletionResponse:
+        """
+        Read the whole stream into a complete response.
+        """
+        contents: Dict[int, List[str]] = {}
+        usage = None
+        for chunk in self:
+            for choice in chunk.choices:
+                if choice.delta and choice.delta.content:
+                    contents.setdefault(choice.index, []).append(choice.delta.content)
+            usage = chunk.usage or usage
+        choices = [Choice(index, message=Message(''.join(parts))) for index, parts in sorted(contents.items())]
+        return CompletionResponse(choices or [Choice(0, message=Message(''))], usage)
+
+
+class LLMEngine(ABC):
+    """
+    Makes LLM calls with the litellm completion() parameters.
+    """
+
+    name = None
+
+    # litellm accepts the pooled client in completion(), native engines use the pool themselves
+    uses_client_kwargs = False
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = {**DEFAULT_ENGINE_CONFIG, **(config or {})}
+
+    @abstractmethod
+    def completion(self, **params):
+        """
+        Call the LLM.
+
+        Returns:
+            An iterable of chunks when params['stream'] is set, else a complete response
+        """
+        pass
+
+
+class LiteLLMEngine(LLMEngine):
+    """
+    Engine backed by litellm, imported on first use.
+    """
+
+    name = ENGINE_LITELLM
+    uses_client_kwargs = True
+
+    def completion(self, **params):
+        import litellm
+        return litellm.completion(**params)
+
+
+class HTTPEngine(LLMEngine):
+    """
+    Base class of the native streaming engines.
+    """
+
+    # path of the chat endpoint below the provider base URL
+    path = None
+
+    def completion(self, **params):
+        provider_name, model = params["model"].split('/', 1)
+        base_url = get_client_pool().get_base_url(provider_name)
+        if not base_url:
+            raise LLMEngineError(f"No base URL configured for provider '{provider_name}'", 500)
+
+        headers, body = self.build_request(provider_name, model, params)
+        response = StreamResponse(self, provider_name, base_url.rstrip('/') + self.get_path(provider_name), headers, body)
+        return response if params.get("stream") else response.collect()
+
+    def get_path(self, provider_name: str) -> str:
+        """
+        Get the path of the chat endpoint below a provider's base URL.
+        """
+        return self.path
+
+    @abstractmethod
+    def build_request(self, provider_name: str, model: str, params: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """
+        Build the request headers and JSON body from the completion() parameters.
+        """
+        pass
+
+    @abstractmethod
+    def parse_stream(self, lines: Iterator[str]) -> Iterator[StreamChunk]:
+        """
+        Parse the lines of the streamed response into chunks.
+        """
+        pass
+
+
+class OpenAIEngine(HTTPEngine):
+    """
+    Native engine for OpenAI-compatible chat completion APIs.
+    """
+
+    name = ENGINE_OPENAI
+    path = '/v1/chat/completions'
+    # providers serving their OpenAI-compatible API below another path
+    provider_paths = {
+        'gemini': '/v1beta/openai/chat/completions',
+    }
+
+    def get_path(self, provider_name):
+        return self.provider_paths.get(provider_name, self.path)
+
+    def build_request(self, provider_name, model, params):
+        api_key = params.get("api_key") or os.environ.get(f"{provider_name.upper()}_API_KEY")
+        headers = {'Authorization': f"Bearer {api_key}"} if api_key else {}
+
+        body = {"model": model, "messages": params["messages"], "stream": True}
+        if params.get("max_tokens"):
+            # OpenAI reasoning models only accept max_completion_tokens
+            body["max_completion_tokens" if provider_name == 'openai' else "max_tokens"] = params["max_tokens"]
+        for name in ("temperature", "n", "stream_options"):
+            if params.get(name) is not None:
+                body[name] = params[name]
+        return headers, body
+
+    def parse_stream(self, lines):
+        for event, data in iter_sse_events(lines):
+            if data == '[DONE]':
+                return
+            payload = jsoncodec.loads(data)
+            if payload.get("error"):
+                raise LLMEngineError(f"Stream error: {payload['error']}", 500)
+            choices = [
+                Choice(choice.get("index", 0), Delta((choice.get("delta") or {}).get("content")))
+                for choice in payload.get("choices") or []
+            ]
+            yield StreamChunk(choices, payload.get("usage"))
+
+
+class AnthropicEngine(HTTPEngine):
+    """
+    Native engine for the Anthropic messages API.
+    """
+
+    name = ENGINE_ANTHROPIC
+    path = '/v1/messages'
+
+    def build_request(self, provider_name, model, params):
+        headers = {
+            'x-api-key': params.get("api_key") or os.environ.get('ANTHROPIC_API_KEY', ''),
+            'anthropic-version': self.config['ANTHROPIC_VERSION'],
+        }
+
+        # the system prompt is a separate field, cache-control blocks are kept as they are
+        system, messages = [], []
+        for message in params["messages"]:
+            if message["role"] == "system":
+                content = message["content"]
+                system.extend([{"type": "text", "text": content}] if isinstance(content, str) else content)
+            else:
+                messages.append(message)
+
+        body = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": min(params.get("max_tokens") or self.config['ANTHROPIC_MAX_TOKENS'], self.config['ANTHROPIC_MAX_TOKENS']),
+            "stream": True,
+        }
+        if system:
+            body["system"] = system
+        if params.get("temperature") is not None:
+            body["temperature"] = params["temperature"]
+        return headers, body
+
+    def parse_stream(self, lines):
+        usage = {}
+        for event, data in iter_sse_events(lines):
+            payload = jsoncodec.loads(data)
+            event_type = payload.get("type", event)
+
+            if event_type == "content_block_delta":
+                text = (payload.get("delta") or {}).get("text")
+                if text:
+                    yield StreamChunk([Choice(0, Delta(text))])
+            elif event_type == "message_start":
+                usage.update((payload.get("message") or {}).get("usage") or {})
+            elif event_type == "message_delta":
+                usage.update(payload.get("usage") or {})
+            elif event_type == "message_stop":
+                break
+            elif event_type == "error":
+                error = payload.get("error") or {}
+                # overloaded_error is Anthropic's 529
+                raise LLMEngineError(f"Stream error: {error.get('message', error)}", 529 if error.get("type") == "overloaded_error" else 500)
+
+        if usage:
+            cache_read_tokens = usage.get("cache_read_input_tokens") or 0
+            cache_write_tokens = usage.get("cache_creation_input_tokens") or 0
+            yield StreamChunk([], {
+                "prompt_tokens": (usage.get("input_tokens") or 0) + cache_read_tokens + cache_write_tokens,
+                "completion_tokens": usage.get("output_tokens") or 0,
+                "cache_read_input_tokens": cache_read_tokens,
+                "cache_creation_input_tokens": cache_write_tokens,
+            })
+
+
+class OllamaEngine(HTTPEngine):
+    """
+    Native engine for the Ollama chat API, which streams NDJSON.
+    """
+
+    name = ENGINE_OLLAMA
+    path = '/api/chat'
+
+    def build_request(self, provider_name, model, params):
+        # Ollama only takes plain text content
+        messages = [
+            {
+                "role": message["role"],
+                "content": message["content"] if isinstance(message["content"], str) else
+                ''.join(block.get("text", '') for block in message["content"]),
+            }
+            for message in params["messages"]
+        ]
+        options = {}
+        if params.get("temperature") is not None:
+            options["temperature"] = params["temperature"]
+        if params.get("max_tokens"):
+            options["num_predict"] = params["max_tokens"]
+        return {}, {"model": model, "messages": messages, "stream": True, "options": options}
+
+    def parse_stream(self, lines):
+        for line in lines:
+            if not line.strip():
+                continue
+            payload = jsoncodec.loads(line)
+            if payload.get("error"):
+                raise LLMEngineError(f"Stream error: {payload['error']}", 500)
+            content = (payload.get("message") or {}).get("content")
+            if content:
+                yield StreamChunk([Choice(0, Delta(content))])
+            if payload.get("done"):
+                yield StreamChunk([], {
+                    "prompt_tokens": payload.get("prompt_eval_count") or 0,
+                    "completion_tokens": payload.get("eval_count") or 0,
+                })
+                return
+
+
+ENGINE_CLASSES = {
+    engine_class.name: engine_class
+    for engine_class in (LiteLLMEngine, OpenAIEngine, AnthropicEngine, OllamaEngine)
+}
+
+# Module-level engines shared by all LLM calls in this worker
+_engines: Dict[str, LLMEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name: Optional[str] = None) -> LLMEngine:
+    """
+    Get the worker-wide engine by name, creating it from settings on first use.
+
+    Args:
+        name: Engine name (LLMProvider.engine), litellm if empty or unknown
+    """
+    if name not in ENGINE_CLASSES:
+        if name:
+            logger.warning(f"LLM_ENGINES: Unknown engine '{name}', using litellm")
+        name = ENGINE_LITELLM
+
+    engine = _engines.get(name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                engine = ENGINE_CLASSES[name](getattr(settings, 'LLM_ENGINES', None))
+                _engines[name] = engine
+    return engine
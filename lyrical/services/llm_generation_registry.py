@@ -0,0 +1,169 @@
+"""
+LLM Generation Registry Service
+
+This service keeps a registry of the generation streams running in a worker
+(user, song, prompt, model, start time and characters streamed) so they can be
+listed and cancelled. Cancelling a generation closes its upstream LLM streams
+right away (see llm_stream_abort), including those of running fan-out jobs and
+both streams of a hedged request, so a stream that is waiting for its first
+token or has stalled releases its connection and admission slot at once.
+
+The registry is per worker process: api_gen_active, api_gen_cancel and the
+admin page (Generation jobs > Active generations) only see the generations
+running in the worker that serves the request.
+
+Generations whose client disconnects are closed by the response and are
+unregistered as 'disconnected'; resumable generations (see llm_stream_jobs)
+intentionally keep running until they finish or are cancelled.
+"""
+
+import itertools
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from .llm_stream_abort import StreamAbortScope
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+class ActiveGeneration:
+    """
+    A generation stream running in this worker.
+    """
+
+    def __init__(self, generation_id: int, user_id: int, username: str, song_id: Optional[int],
+                 prompt_name: str, model_name: str):
+        self.generation_id = generation_id
+        self.user_id = user_id
+        self.username = username
+        self.song_id = song_id
+        self.prompt_name = prompt_name
+        self.model_name = model_name
+        self.started_at = time.time()
+        self.chars_streamed = 0
+        self._cancelled = threading.Event()
+        # the provider streams opened for this generation, on any thread
+        self.abort_scope = StreamAbortScope()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        # a read blocked on the upstream stream fails immediately instead of waiting for the next chunk
+        self.abort_scope.abort()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.generation_id,
+            'user': self.username,
+            'song_id': self.song_id,
+            'prompt_name': self.prompt_name,
+            'model': self.model_name,
+            'started_at': self.started_at,
+            'elapsed_seconds': round(time.time() - self.started_at, 1),
+            'chars_streamed': self.chars_streamed,
+            'cancelled': self.cancelled,
+        }
+
+
+class GenerationRegistry:
+    """
+    Registry of the active generation streams in a worker.
+
+    Features:
+    - Register and unregister generations with their user, song, prompt and model
+    - Progress tracking by characters streamed
+    - Cancellation by generation ID, scoped to the owning user unless staff
+    - Counters for completed, cancelled and disconnected generations
+    """
+
+    def __init__(self):
+        self._generations: Dict[int, ActiveGeneration] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.counters = {
+            'completed': 0,
+            'cancelled': 0,
+            'disconnected': 0,
+        }
+
+    def register(self, user, song_id: Optional[int], prompt_name: str, model_name: str) -> ActiveGeneration:
+        """
+        Register a generation that is about to start streaming.
+        """
+        with self._lock:
+            generation = ActiveGeneration(next(self._ids), user.id, user.username, song_id, prompt_name, model_name)
+            self._generations[generation.generation_id] = generation
+        return generation
+
+    def unregister(self, generation: ActiveGeneration, outcome: str) -> None:
+        """
+        Remove a generation from the registry.
+
+        Args:
+            generation: The generation to remove
+            outcome: How the generation ended: 'completed', 'cancelled' or 'disconnected'
+        """
+        with self._lock:
+            self._generations.pop(generation.generation_id, None)
+            self.counters[outcome] += 1
+        if outcome != 'completed':
+            logger.info(f"LLM_GENERATIONS: Generation {generation.generation_id} '{generation.prompt_name}' for user '{generation.username}' {outcome} after {generation.chars_streamed} chars")
+
+    def get_active(self, user=None) -> List[ActiveGeneration]:
+        """
+        Get the active generations, of a single user if given.
+        """
+        with self._lock:
+            generations = list(self._generations.values())
+        if user is not None:
+            generations = [generation for generation in generations if generation.user_id == user.id]
+        return sorted(generations, key=lambda generation: generation.started_at)
+
+    def cancel(self, generation_id: int, user=None) -> bool:
+        """
+        Cancel an active generation.
+
+        Args:
+            generation_id: ID of the generation
+            user: Only cancel the generation if it belongs to this user (None for any user)
+
+        Returns:
+            True if the generation was found and cancelled
+        """
+        with self._lock:
+            generation = self._generations.get(generation_id)
+        if generation is None or (user is not None and generation.user_id != user.id):
+            return False
+
+        generation.cancel()
+        logger.info(f"LLM_GENERATIONS: Cancelling generation {generation_id} '{generation.prompt_name}' for user '{generation.username}'")
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get the number of active generations and the outcome counters.
+        """
+        with self._lock:
+            return {'active': len(self._generations), **self.counters}
+
+
+# Module-level registry shared by all generators in this worker
+_generation_registry = None
+_generation_registry_lock = threading.Lock()
+
+
+def get_generation_registry() -> GenerationRegistry:
+    """
+    Get the worker-wide generation registry, creating it on first use.
+    """
+    global _generation_registry
+    if _generation_registry is None:
+        with _generation_registry_lock:
+            if _generation_registry is None:
+                _generation_registry = GenerationRegistry()
+    return _generation_registry
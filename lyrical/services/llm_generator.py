@@ -1,13 +1,37 @@
+import math
 import os
-import json
+import threading
+import time
 import unicodedata
-import litellm
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-from django.http import JsonResponse, StreamingHttpResponse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Callable, List, Optional
+from django.conf import settings
+from django.db import connection
+from django.http import StreamingHttpResponse
 from .utils.prompts import get_system_prompt, get_user_prompt
-from .utils.messages import MessageBuilder
+from .utils.messages import MessageBuilder, add_cache_control
+from .utils.ndjson import NDJSONFramer, normalize_chunk
+from .utils import jsoncodec
+from .utils.jsoncodec import JsonResponse
 from .utils.apikey import get_user_api_key
+from .llm_client_pool import get_client_pool
+from .llm_engines import get_engine
+from .llm_response_cache import get_response_cache, make_cache_key
+from .llm_singleflight import get_single_flight
+from .llm_hedging import get_hedging_policy
+from .llm_circuit_breaker import get_breaker_registry, CircuitOpenError
+from .llm_stream_jobs import get_stream_job_runner
+from .llm_generation_registry import get_generation_registry
+from .llm_prompt_cache import get_prompt_cache_stats
+from .llm_routing import get_routing_policy
+from .llm_stats import get_llm_stats, OUTCOME_SUCCESS, OUTCOME_ERROR, OUTCOME_CLOSED
+from .llm_runaway_detector import get_runaway_detector
+from .llm_stream_deadlines import iter_with_deadlines, StreamStallError
+from .llm_stream_abort import current_abort_scope, abort_response_stream
+from .llm_continuation import get_continuation_policy, ContinuationFramer
+from .llm_admission import get_admission_controller, AdmissionTimeout, PRIORITY_INTERACTIVE
+from ..models import LLM
 from ..logging_config import get_logger
 
 
@@ -36,6 +60,15 @@ class LLMGenerator(ABC):
         self.user = None
         self.llm_model = None
         self.extracted_params = {}
+        self.backup_llm_params = None
+        self.fallback_llm_params = []
+        self.generation = None
+        self.llm_engines = {}
+        self.llm_deadlines = {}
+        self.expected_items_reached = False
+        self.prefer_follow_up = False
+        # the number of candidates the user prompt is rendered for, None for the user's model's
+        self.prompt_candidates = None
         
 
     def generate(self) -> StreamingHttpResponse:
@@ -82,6 +115,25 @@ class LLMGenerator(ABC):
             }, status=500)
     
 
+    def generate_lines(self):
+        """
+        Run the generation without an HTTP response, e.g. in a background job.
+        
+        Returns:
+            Iterator of the NDJSON lines of the response
+        
+        Raises:
+            ValueError: if a step before the LLM call failed
+        """
+        steps = (self._extract_parameters, self._authenticate_user, self._get_llm_model, self._query_database, self._build_prompts)
+        for step in steps:
+            error_response = step()
+            if error_response is not None:
+                raise ValueError(f"{self.__class__.__name__} failed: {error_response.content.decode()}")
+        
+        return self._stream_tracked_response()
+    
+
     def _extract_parameters(self) -> Optional[JsonResponse]:
         """
         Extract and validate request parameters.
@@ -137,6 +189,11 @@ class LLMGenerator(ABC):
         """
         try:
             self.llm_model = self.user.llm_model
+            
+            # route the prompt to a model of its tier when the user opted in
+            routed_llm = get_routing_policy().choose_llm(self.user, self.get_prompt_name())
+            if routed_llm:
+                self.llm_model = routed_llm
             logger.debug(f"using llm model: {self.get_llm_model_name()}")
             return None
             
@@ -201,16 +258,10 @@ class LLMGenerator(ABC):
                 logger.debug(f"Conversation history disabled for this generator - starting fresh conversation")
             
             # determine if we prefer a follow up prompt
-            prefer_follow_up = (self.uses_conversation_history() and self.prompt_messages.get_user_message_count() > 0)
+            self.prefer_follow_up = (self.uses_conversation_history() and self.prompt_messages.get_user_message_count() > 0)
 
             # get user prompt with custom parameters
-            user_prompt_params = self.build_user_prompt_params()
-            user_message = get_user_prompt(
-                prompt_name=prompt_name,
-                llm=self.llm_model,
-                prefer_follow_up=prefer_follow_up,
-                **user_prompt_params
-            )
+            user_message = self._render_user_prompt()
             
             if user_message is None:
                 logger.error(f"prompt '{prompt_name}' not found in configuration")
@@ -251,7 +302,20 @@ class LLMGenerator(ABC):
             StreamingHttpResponse: Streaming LLM response
         """
         try:
-            response_stream_generator = self._stream_llm_response()
+            # resumable generations keep running in the background if the client goes away
+            stream_runner = get_stream_job_runner()
+            if stream_runner.is_enabled_for(self.get_prompt_name()):
+                stream_id = stream_runner.start(self.user, self.get_song_id(), self.get_prompt_name(), self._stream_coalesced_response)
+                
+                logger.info(f"resumable generation stream {stream_id} started for user '{self.user.username}'")
+                response = StreamingHttpResponse(
+                    stream_runner.replay(stream_id, self.user),
+                    content_type="application/x-ndjson"
+                )
+                response["X-Stream-ID"] = stream_id
+                return response
+            
+            response_stream_generator = self._stream_coalesced_response()
             
             logger.info(f"generation stream started for user '{self.user.username}'")
             return StreamingHttpResponse(
@@ -330,6 +394,15 @@ class LLMGenerator(ABC):
         """
         return "gemini-2.0-flash"
     
+    def get_priority(self) -> str:
+        """
+        Get the admission priority class of the LLM calls of this generator.
+        
+        Returns:
+            One of the priority classes in llm_admission.PRIORITY_CLASSES
+        """
+        return PRIORITY_INTERACTIVE
+    
     def get_fallback_username(self) -> Optional[str]:
         """
         Get fallback username for development authentication.
@@ -348,6 +421,65 @@ class LLMGenerator(ABC):
         """
         return {}
     
+    def get_expected_item_count(self) -> Optional[int]:
+        """
+        Get the number of NDJSON items the response is expected to contain.
+        
+        When set, the upstream stream is closed as soon as this many valid
+        items have been emitted, and max_tokens is limited to a budget for
+        this many items (see get_tokens_per_item).
+        
+        Returns:
+            Expected number of items, or None to read the whole response (default)
+        """
+        return None
+    
+    def get_tokens_per_item(self) -> int:
+        """
+        Get the output token budget of a single expected NDJSON item.
+        
+        Returns:
+            Number of tokens (default: settings.LLM_ITEM_COUNT['TOKENS_PER_ITEM'])
+        """
+        return getattr(settings, 'LLM_ITEM_COUNT', {}).get('TOKENS_PER_ITEM', 100)
+    
+    def get_candidate_count(self) -> int:
+        """
+        Get the number of parallel candidates to request from the provider.
+        
+        Candidates are requested with the provider's n parameter in a single
+        completion and their lines are interleaved into the NDJSON output, so
+        each candidate only has to generate its share of the items (see
+        get_items_per_candidate). Only used for providers listed in
+        settings.LLM_CANDIDATES['PROVIDERS'].
+        
+        Returns:
+            Number of candidates (default: settings.LLM_CANDIDATES['PROMPT_CANDIDATES'] for the prompt name, or 1)
+        """
+        config = getattr(settings, 'LLM_CANDIDATES', {})
+        return (config.get('PROMPT_CANDIDATES') or {}).get(self.get_prompt_name(), 1)
+    
+    def get_candidate_oversample(self) -> float:
+        """
+        Get how many more items than requested the candidates are asked for together.
+        
+        Independent candidates repeat some of each other's items, which are
+        skipped, so the candidates of a generator with an expected item count
+        are asked for more items than it needs; the stream is closed as soon as
+        the expected number of unique items has been emitted.
+        
+        Returns:
+            Factor applied to the requested count (default: settings.LLM_CANDIDATES['OVERSAMPLE'])
+        """
+        return getattr(settings, 'LLM_CANDIDATES', {}).get('OVERSAMPLE', 1.5)
+    
+    def get_items_per_candidate(self, count: int) -> int:
+        """
+        Get the number of items each candidate of the call being prompted is
+        asked for, to generate count items in total.
+        """
+        return self._get_items_per_candidate(count, self.prompt_candidates)
+    
     def uses_conversation_history(self) -> bool:
         """
         Override this method to disable conversation history for specific generators.
@@ -371,6 +503,9 @@ class LLMGenerator(ABC):
         before it's sent to the client. This is useful for adding metadata,
         transforming data, or filtering content.
         
+        Kept for compatibility: new generators should override
+        preprocess_ndjson_data instead, which avoids re-parsing each line.
+        
         Args:
             ndjson_line: A single line of NDJSON (already validated as valid JSON)
             
@@ -379,6 +514,44 @@ class LLMGenerator(ABC):
         """
         return ndjson_line
     
+    def preprocess_ndjson_data(self, data: Any) -> Any:
+        """
+        Preprocess the decoded data of an NDJSON line before streaming to client.
+        
+        Subclasses can override this method to modify the decoded object
+        in place or return a new one. Each line is decoded once before this
+        hook and encoded once after it.
+        
+        Args:
+            data: The decoded JSON value of a single NDJSON line
+            
+        Returns:
+            JSON serializable value to send to the client
+        """
+        return data
+    
+    def _uses_string_preprocess(self) -> bool:
+        """
+        Check if a subclass still overrides the string based preprocess_ndjson hook.
+        """
+        return type(self).preprocess_ndjson is not LLMGenerator.preprocess_ndjson
+    
+    def get_fan_out_jobs(self) -> Optional[List[List[Dict[str, Any]]]]:
+        """
+        Split the generation into independent jobs that run concurrently.
+        
+        Subclasses can override this method to return a list of phases, where
+        each phase is a list of jobs that run concurrently against the provider
+        once the previous phase has completed. Each job is a dict with a 'name'
+        and either its 'messages', or a 'build_messages' callable that takes the
+        results of the previous phases (job name to response text) and returns
+        the messages. Job responses are streamed as each job completes.
+        
+        Returns:
+            List of phases, or None to generate with a single completion (default)
+        """
+        return None
+    
     def on_response_complete(self) -> None:
         """
         Called after the full LLM response has been received and processed.
@@ -446,6 +619,9 @@ class LLMGenerator(ABC):
         """
         Process a single line of LLM response text and yield valid JSON.
         Handles markdown fences and validates JSON format.
+        
+        Returns:
+            True if the line was valid JSON, False if it was not, None for a blank line
         """
         stripped_line = line.strip()
         
@@ -455,28 +631,32 @@ class LLMGenerator(ABC):
             stripped_line.startswith("```") or
             all(c == '`' for c in stripped_line)):
             logger.debug(f"Skipping markdown fence or backtick line: {stripped_line[:50]}{'...' if len(stripped_line) > 50 else ''}")
-            return
+            return False if stripped_line else None
         
         try:
-            # Validate JSON format
-            json.loads(stripped_line)
-            
-            # Apply preprocessing if available
-            processed_line = self.preprocess_ndjson(stripped_line)
+            # Decode the line once
+            data = jsoncodec.loads(stripped_line)
             
-            # Validate processed line is still valid JSON
-            json.loads(processed_line)
+            if self._uses_string_preprocess():
+                # Legacy string hook, validate processed line is still valid JSON
+                processed_line = self.preprocess_ndjson(stripped_line)
+                jsoncodec.loads(processed_line)
+            else:
+                # Apply preprocessing to the decoded data and encode it once
+                processed_line = jsoncodec.dumps(self.preprocess_ndjson_data(data))
             
             yield processed_line + '\n'
+            return True
             
-        except json.JSONDecodeError as e:
+        except jsoncodec.JSONDecodeError as e:
             logger.warning(f"LLM_SERVICE_NDJSON_PARSE_ERROR: Malformed JSON line: {stripped_line}, Error: {e}")
             error_data = {
                 "error": "Malformed JSON line from LLM",
                 "raw_content": stripped_line,
                 "details": str(e)
             }
-            yield json.dumps(error_data) + '\n'
+            yield jsoncodec.dumps(error_data) + '\n'
+            return False
             
         except Exception as e:
             logger.error(f"LLM_SERVICE_NDJSON_PROCESS_ERROR: Error processing line: {stripped_line}, Error: {e}")
@@ -485,26 +665,620 @@ class LLMGenerator(ABC):
                 "raw_content": stripped_line,
                 "details": str(e)
             }
-            yield json.dumps(error_data) + '\n'
+            yield jsoncodec.dumps(error_data) + '\n'
+            return False
+    
+    def _get_model_params(self, llm=None) -> Dict[str, Any]:
+        """
+        Get the parameters that determine the LLM response: model, messages,
+        max_tokens and temperature.
+        
+        Args:
+            llm: LLM to call, defaults to the user's selected model
+        
+        Returns:
+            Dict of model parameters
+        """
+        llm = llm or self.llm_model
+        model_params = {
+            "model": f"{llm.provider.internal_name}/{llm.internal_name}",
+            "messages": self._get_prompt_messages(llm),
+            "max_tokens": min(llm.max_tokens, self.user.llm_max_tokens) * 1000,
+        }
+        
+        # Parallel candidates share the items, max_tokens applies to each candidate
+        candidates = self._get_candidate_count(llm)
+        if candidates > 1:
+            model_params["n"] = candidates
+        
+        # A response of a known number of items needs far fewer tokens than the generic limit
+        expected_items = self.get_expected_item_count()
+        item_count_config = getattr(settings, 'LLM_ITEM_COUNT', {})
+        if expected_items and item_count_config.get('ENABLED', True):
+            candidate_items = self._get_items_per_candidate(expected_items, candidates)
+            item_budget = item_count_config.get('OVERHEAD_TOKENS', 1024) + candidate_items * self.get_tokens_per_item()
+            model_params["max_tokens"] = min(model_params["max_tokens"], item_budget)
+        
+        if llm.use_temperature:
+            model_params["temperature"] = self.user.llm_temperature
+        
+        return model_params
+    
+    def _get_candidate_count(self, llm=None) -> int:
+        """
+        Get the number of parallel candidates to request from a model, 1 when
+        candidates are disabled or its provider does not support them.
+        """
+        llm = llm or self.llm_model
+        config = getattr(settings, 'LLM_CANDIDATES', {})
+        if not config.get('ENABLED', True) or llm.provider.internal_name not in (config.get('PROVIDERS') or []):
+            return 1
+        return max(1, min(self.get_candidate_count(), config.get('MAX_CANDIDATES', 4)))
+    
+    def _get_items_per_candidate(self, count: int, candidates: Optional[int] = None) -> int:
+        """
+        Get the number of items each of a number of candidates (default: the
+        user's model's) is asked for, to generate count items in total.
+        """
+        candidates = candidates or self._get_candidate_count()
+        if candidates == 1:
+            return count
+        return min(count, math.ceil(count * self.get_candidate_oversample() / candidates))
+    
+    def _render_user_prompt(self, candidates: Optional[int] = None) -> Optional[str]:
+        """
+        Render the user prompt of this generation from the user's model's
+        prompt, with the item counts for a call with a number of candidates
+        (default: the user's model's).
+        """
+        self.prompt_candidates = candidates
+        try:
+            return get_user_prompt(
+                prompt_name=self.get_prompt_name(),
+                llm=self.llm_model,
+                prefer_follow_up=self.prefer_follow_up,
+                **self.build_user_prompt_params()
+            )
+        finally:
+            self.prompt_candidates = None
+    
+    def _get_prompt_messages(self, llm) -> List[Dict[str, Any]]:
+        """
+        Get the prompt messages for a model. The user message asks each
+        candidate of the user's model for its share of the items, so it is
+        rendered again for a model with a different number of candidates,
+        e.g. a fallback whose provider does not support n.
+        """
+        messages = self.prompt_messages.get()
+        candidates = self._get_candidate_count(llm)
+        if llm is self.llm_model or candidates == self._get_candidate_count():
+            return messages
+        
+        user_message = self._render_user_prompt(candidates)
+        if user_message is None:
+            return messages
+        return messages[:-1] + [{"role": "user", "content": user_message}]
+    
+    def _get_single_candidate_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Get the messages of a call made with parallel candidates for the same
+        call without them, e.g. the continuation of their merged response: the
+        user message asks for every item instead of a candidate's share. The
+        messages of a call with other messages than the generator's prompt are
+        returned as they are.
+        """
+        if messages[:-1] != self.prompt_messages.get()[:-1]:
+            return messages
+        
+        user_message = self._render_user_prompt(1)
+        if user_message is None:
+            return messages
+        return messages[:-1] + [{"role": "user", "content": user_message}]
+    
+    def _get_call_params(self, params: Dict[str, Any], llm_params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the completion() parameters of a backup or fallback model for a call
+        made with llm_params. The messages of a call with other messages than
+        the generator's prompt, e.g. a fan-out job, are sent as they are; the
+        generator's prompt was already rendered for the model.
+        """
+        if llm_params["messages"] is self.prompt_messages.get():
+            return params
+        return {**params, "messages": llm_params["messages"]}
+    
+    def _build_llm_params(self, llm=None) -> Dict[str, Any]:
+        """
+        Build the litellm.completion() parameters for a model.
+        
+        Args:
+            llm: LLM to call, defaults to the user's selected model
+        
+        Returns:
+            Dict of completion parameters
+        """
+        llm = llm or self.llm_model
+        user_api_key = get_user_api_key(user=self.user, provider=llm.provider)
+        
+        # Set Ollama base URL if needed
+        if llm.provider.internal_name == "ollama" and "OLLAMA_API_BASE" not in os.environ:
+            os.environ["OLLAMA_API_BASE"] = "http://localhost:11434"
+        
+        llm_params = self._get_model_params(llm)
+        llm_params["stream"] = True
+        
+        # ask for usage data in the final chunk to record prompt cache hits
+        if get_prompt_cache_stats().requests_stream_usage(llm.provider.internal_name):
+            llm_params["stream_options"] = {"include_usage": True}
+
+        if user_api_key and len(user_api_key) > 0:
+            llm_params["api_key"] = user_api_key
+
+        # Reuse the worker's persistent connection to the provider, native engines use the pool themselves
+        engine = get_engine(llm.provider.engine)
+        if engine.uses_client_kwargs:
+            llm_params.update(get_client_pool().completion_kwargs(llm.provider.internal_name, user_api_key))
+        
+        # Remember the model's engine and stream deadlines, they are used around the completion() call
+        self.llm_engines[llm_params["model"]] = engine
+        self.llm_deadlines[llm_params["model"]] = (llm.first_token_timeout, llm.stall_timeout)
+        
+        return llm_params
+    
+    def _build_backup_llm_params(self) -> Optional[Dict[str, Any]]:
+        """
+        Build the completion() parameters of the backup model used to hedge
+        slow streams, or None when hedging is not configured for the user's model.
+        """
+        backup_name = get_hedging_policy().get_backup_llm_name(self.llm_model.internal_name)
+        if not backup_name:
+            return None
+        
+        backup_llm = LLM.objects.filter(internal_name=backup_name).select_related('provider').first()
+        if not backup_llm:
+            logger.warning(f"LLM_HEDGING: Backup LLM '{backup_name}' not found, hedging disabled for this request")
+            return None
+        
+        return self._build_llm_params(backup_llm)
+    
+    def _build_fallback_llm_params(self) -> List[Dict[str, Any]]:
+        """
+        Build the completion() parameters of the fallback models, in order: the
+        user's selected LLM when the prompt was routed to another model, then the
+        user's fallback LLMs, then those configured for the prompt name.
+        """
+        registry = get_breaker_registry()
+        if not registry.enabled:
+            return []
+        
+        fallback_names = []
+        user_names = [self.user.llm_model.internal_name] + self.user.llm_fallback_model_names
+        for name in user_names + registry.get_fallback_llm_names(self.get_prompt_name()):
+            if name != self.llm_model.internal_name and name not in fallback_names:
+                fallback_names.append(name)
+        if not fallback_names:
+            return []
+        
+        fallback_llms = {llm.internal_name: llm for llm in LLM.objects.filter(internal_name__in=fallback_names).select_related('provider')}
+        return [self._build_llm_params(fallback_llms[name]) for name in fallback_names if name in fallback_llms]
+    
+    def _iter_provider_content(self, llm_params: Dict[str, Any]):
+        """
+        Call the LLM and yield the normalized text chunks of the streamed response.
+        """
+        provider_name = llm_params["model"].split('/', 1)[0]
+        
+        prompt_cache = get_prompt_cache_stats()
+        if prompt_cache.uses_cache_control(provider_name):
+            llm_params = {**llm_params, "messages": add_cache_control(llm_params["messages"])}
+        
+        # the admission slot is held until the stream has been consumed
+        with get_admission_controller().admit(self.user.id, provider_name, self.get_priority()):
+            engine = self.llm_engines.get(llm_params["model"]) or get_engine()
+            response_stream = engine.completion(**llm_params)
+            
+            # a stream read on a background thread can be aborted from the thread that started it,
+            # and every stream of the generation is aborted when it is cancelled
+            abort_scopes = [scope for scope in (current_abort_scope(), self.generation and self.generation.abort_scope) if scope]
+            abort_closer = lambda: abort_response_stream(response_stream)
+            for abort_scope in abort_scopes:
+                abort_scope.add(abort_closer)
+            
+            try:
+                if llm_params.get("n", 1) > 1:
+                    yield from self._iter_candidate_lines(response_stream, llm_params["model"])
+                    return
+                
+                for chunk in response_stream:
+                    if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                        yield normalize_chunk(chunk.choices[0].delta.content)
+                    
+                    # the final chunk carries the usage data when stream_options.include_usage is set
+                    usage = getattr(chunk, 'usage', None)
+                    if usage and prompt_cache.enabled:
+                        prompt_cache.record_usage(llm_params["model"], usage)
+            finally:
+                for abort_scope in abort_scopes:
+                    abort_scope.remove(abort_closer)
+                # release the upstream connection promptly when the stream is cancelled or abandoned
+                close = getattr(getattr(response_stream, 'completion_stream', response_stream), 'close', None)
+                if close:
+                    try:
+                        close()
+                    except Exception:
+                        pass
+    
+    def _iter_candidate_lines(self, response_stream, model_name: str):
+        """
+        Interleave the streams of parallel candidates, yielding each complete
+        line as soon as any candidate finishes it. Lines already produced by
+        another candidate are skipped.
+        """
+        prompt_cache = get_prompt_cache_stats()
+        framers: Dict[int, NDJSONFramer] = {}
+        seen_lines = set()
+        
+        def unique_lines(lines):
+            for line in lines:
+                stripped_line = line.strip()
+                if stripped_line and stripped_line not in seen_lines:
+                    seen_lines.add(stripped_line)
+                    yield line + '\n'
+        
+        for chunk in response_stream:
+            for choice in chunk.choices or []:
+                if choice.delta and choice.delta.content:
+                    framer = framers.setdefault(getattr(choice, 'index', 0) or 0, NDJSONFramer())
+                    yield from unique_lines(framer.feed(normalize_chunk(choice.delta.content)))
+            
+            usage = getattr(chunk, 'usage', None)
+            if usage and prompt_cache.enabled:
+                prompt_cache.record_usage(model_name, usage)
+        
+        for framer in framers.values():
+            yield from unique_lines([framer.flush()])
+    
+    def _iter_hedged_content(self, llm_params: Dict[str, Any], on_winner: Callable[[Dict[str, Any]], None]):
+        """
+        Yield the normalized text chunks of the LLM response, hedging with the
+        backup model when the first token is slow to arrive. on_winner is called
+        with the parameters of the call whose stream is used.
+        """
+        if not self.backup_llm_params:
+            yield from self._iter_provider_content(llm_params)
+            return
+        
+        backup_params = self._get_call_params(self.backup_llm_params, llm_params)
+        yield from get_hedging_policy().stream(
+            llm_params["model"], lambda: self._iter_provider_content(llm_params),
+            backup_params["model"], lambda: self._iter_provider_content(backup_params),
+            on_winner=lambda model_name: on_winner(backup_params if model_name == backup_params["model"] else llm_params),
+        )
+    
+    def _iter_llm_content(self, llm_params: Dict[str, Any]):
+        """
+        Yield the normalized text chunks of the LLM response, failing over to the
+        next fallback model when a model's circuit breaker is open or the call
+        fails before any content was produced, and continuing the response with
+        the same model when it fails mid-stream.
+        """
+        registry = get_breaker_registry()
+        stats = get_llm_stats()
+        prompt_name = self.get_prompt_name()
+        candidates = [llm_params] + [self._get_call_params(params, llm_params) for params in self.fallback_llm_params]
+        last_error = None
+        
+        stall_retries = getattr(settings, 'LLM_STREAM_DEADLINES', {}).get('STALL_RETRIES', 1)
+        
+        # a model that misses its first token deadline is retried before falling back
+        attempts = []
+        for index, params in enumerate(candidates):
+            attempts.extend((index, params, retry) for retry in range(1 + stall_retries))
+        
+        stalled_model = None
+        for index, params, retry in attempts:
+            model_name = params["model"]
+            if retry > 0 and stalled_model != model_name:
+                continue
+            if not registry.allow_request(model_name):
+                logger.warning(f"LLM_FAILOVER: Circuit open for {model_name}, skipping")
+                continue
+            if retry > 0:
+                logger.warning(f"LLM_STREAM_DEADLINE: Retrying {model_name} (retry {retry})")
+            elif index > 0:
+                logger.warning(f"LLM_FAILOVER: Falling back to {model_name}")
+            
+            started_at = time.monotonic()
+            first_token_latency = None
+            stalled_model = None
+            chars = lines = 0
+            emitted = []
+            # the call whose stream is used, the backup model's when it wins the hedge race
+            winner = {"params": params}
+            try:
+                stream_factory = (lambda params=params, winner=winner: self._iter_hedged_content(params, lambda winner_params: winner.update(params=winner_params))) if index == 0 else \
+                    (lambda params=params: self._iter_provider_content(params))
+                first_token_timeout, stall_timeout = self.llm_deadlines.get(model_name, (None, None))
+                for content in iter_with_deadlines(model_name, stream_factory, first_token_timeout, stall_timeout):
+                    if first_token_latency is None:
+                        first_token_latency = time.monotonic() - started_at
+                    chars += len(content)
+                    lines += content.count('\n')
+                    emitted.append(content)
+                    yield content
+            except GeneratorExit:
+                # the generation stopped reading (cancelled, disconnected or all items received)
+                if first_token_latency is not None:
+                    # the model was responding, its breaker must see the call as a success
+                    registry.record_success(winner["params"]["model"], first_token_latency)
+                stats.record(winner["params"]["model"], prompt_name, first_token_latency, time.monotonic() - started_at, chars, lines, OUTCOME_CLOSED)
+                raise
+            except AdmissionTimeout:
+                # the worker is overloaded, not the model
+                raise
+            except Exception as e:
+                if self._is_cancelled():
+                    # the stream was closed by the cancellation, not by the model
+                    stats.record(winner["params"]["model"], prompt_name, first_token_latency, time.monotonic() - started_at, chars, lines, OUTCOME_CLOSED)
+                    raise
+                registry.record_failure(winner["params"]["model"], e)
+                stats.record(winner["params"]["model"], prompt_name, first_token_latency, time.monotonic() - started_at, chars, lines, OUTCOME_ERROR)
+                # content already reached the client, the stream cannot be switched to another model
+                if first_token_latency is not None:
+                    if not get_continuation_policy().is_retryable(e):
+                        raise
+                    yield from self._iter_continued_content(winner["params"], ''.join(emitted), e)
+                    return
+                logger.warning(f"LLM_FAILOVER: {model_name} failed before producing content: {e}")
+                if isinstance(e, StreamStallError):
+                    stalled_model = model_name
+                last_error = e
+                continue
+            
+            registry.record_success(winner["params"]["model"], first_token_latency if first_token_latency is not None else time.monotonic() - started_at)
+            stats.record(winner["params"]["model"], prompt_name, first_token_latency, time.monotonic() - started_at, chars, lines, OUTCOME_SUCCESS)
+            return
+        
+        if isinstance(last_error, StreamStallError):
+            raise last_error
+        if last_error is not None:
+            raise CircuitOpenError(f"All configured LLMs failed, please try again later ({last_error})") from last_error
+        raise CircuitOpenError("All configured LLMs are currently unavailable, please try again later")
+    
+    def _iter_continued_content(self, params: Dict[str, Any], emitted_text: str, error: Exception):
+        """
+        Continue a response that failed mid-stream with a retryable error, asking
+        the same model to carry on from the text already emitted and yielding
+        only the text that follows on from it.
+        """
+        policy = get_continuation_policy()
+        registry = get_breaker_registry()
+        stats = get_llm_stats()
+        prompt_name = self.get_prompt_name()
+        model_name = params["model"]
+        first_token_timeout, stall_timeout = self.llm_deadlines.get(model_name, (None, None))
+        emitted = [emitted_text]
+        
+        for attempt in range(policy.config['MAX_RETRIES']):
+            delay = policy.get_backoff(attempt)
+            logger.warning(f"LLM_CONTINUATION: {model_name} failed mid-stream after {len(''.join(emitted))} chars ({error}), continuing in {delay:.1f}s (retry {attempt + 1})")
+            time.sleep(delay)
+            
+            emitted_text = ''.join(emitted)
+            messages = params["messages"]
+            if "n" in params:
+                # parallel candidates were already merged into one response, which is continued for every item
+                messages = self._get_single_candidate_messages(messages)
+            continuation_params = {**params, "messages": policy.build_messages(messages, emitted_text, model_name.split('/', 1)[0])}
+            continuation_params.pop("n", None)
+            framer = ContinuationFramer(emitted_text)
+            
+            started_at = time.monotonic()
+            first_token_latency = None
+            chars = lines = 0
+            try:
+                stream_factory = lambda: self._iter_provider_content(continuation_params)
+                for content in iter_with_deadlines(model_name, stream_factory, first_token_timeout, stall_timeout):
+                    if first_token_latency is None:
+                        first_token_latency = time.monotonic() - started_at
+                    chars += len(content)
+                    lines += content.count('\n')
+                    for text in framer.feed(content):
+                        emitted.append(text)
+                        yield text
+                for text in framer.flush():
+                    emitted.append(text)
+                    yield text
+            except GeneratorExit:
+                if first_token_latency is not None:
+                    registry.record_success(model_name, first_token_latency)
+                stats.record(model_name, prompt_name, first_token_latency, time.monotonic() - started_at, chars, lines, OUTCOME_CLOSED)
+                raise
+            except AdmissionTimeout:
+                raise
+            except Exception as e:
+                if self._is_cancelled():
+                    stats.record(model_name, prompt_name, first_token_latency, time.monotonic() - started_at, chars, lines, OUTCOME_CLOSED)
+                    raise
+                registry.record_failure(model_name, e)
+                stats.record(model_name, prompt_name, first_token_latency, time.monotonic() - started_at, chars, lines, OUTCOME_ERROR)
+                if not policy.is_retryable(e):
+                    raise
+                error = e
+                continue
+            
+            logger.info(f"LLM_CONTINUATION: {model_name} continued the response (retry {attempt + 1})")
+            registry.record_success(model_name, first_token_latency if first_token_latency is not None else time.monotonic() - started_at)
+            stats.record(model_name, prompt_name, first_token_latency, time.monotonic() - started_at, chars, lines, OUTCOME_SUCCESS)
+            return
+        
+        raise error
+    
+    def _iter_response_content(self, llm_params: Dict[str, Any]):
+        """
+        Yield the response text chunks, replaying from the response cache when
+        caching is enabled for this prompt and an identical request was seen.
+        """
+        fan_out_phases = self.get_fan_out_jobs()
+        if fan_out_phases:
+            yield from self._iter_fan_out_content(llm_params, fan_out_phases)
+            return
+        
+        cache = get_response_cache()
+        if not cache.is_enabled_for(self.get_prompt_name()):
+            yield from self._iter_llm_content(llm_params)
+            return
+        
+        cache_key = make_cache_key(llm_params)
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            logger.info(f"LLM_SERVICE: Replaying cached response for prompt '{self.get_prompt_name()}' ({len(cached_response)} chars)")
+            yield cached_response
+            return
+        
+        # Only complete responses are cached, an abandoned stream never reaches the end
+        chunks = []
+        try:
+            for content in self._iter_llm_content(llm_params):
+                chunks.append(content)
+                yield content
+        except GeneratorExit:
+            # a stream closed after all the expected items were received is complete
+            if self.expected_items_reached:
+                cache.set(cache_key, ''.join(chunks))
+            raise
+        cache.set(cache_key, ''.join(chunks))
+    
+    def _iter_fan_out_content(self, llm_params: Dict[str, Any], phases: List[List[Dict[str, Any]]]):
+        """
+        Run the fan-out jobs concurrently, phase by phase, and yield each job's
+        complete response as soon as it finishes.
+        """
+        max_concurrency = getattr(settings, 'LLM_FAN_OUT', {}).get('MAX_CONCURRENCY', 4)
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm-fan-out')
+        stopped = threading.Event()
+        results = {}
+        
+        try:
+            for phase in phases:
+                futures = {
+                    executor.submit(self._run_fan_out_job, llm_params, job, dict(results), stopped): job['name']
+                    for job in phase
+                }
+                logger.info(f"LLM_SERVICE: Fan-out running {len(futures)} jobs with concurrency {max_concurrency}")
+                
+                for future in as_completed(futures):
+                    job_name = futures[future]
+                    response_text = future.result()
+                    results[job_name] = response_text
+                    logger.debug(f"LLM_SERVICE: Fan-out job '{job_name}' completed with {len(response_text)} chars")
+                    yield response_text if response_text.endswith('\n') else response_text + '\n'
+        finally:
+            # stop running and queued jobs if the stream fails or the client goes away
+            stopped.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _run_fan_out_job(self, llm_params: Dict[str, Any], job: Dict[str, Any], results: Dict[str, str],
+                         stopped: threading.Event) -> str:
+        """
+        Run a single fan-out job and return its response text, which is
+        incomplete if the fan-out was stopped or the generation cancelled.
+        """
+        messages = job['build_messages'](results) if 'build_messages' in job else job['messages']
+        content_iter = self._iter_llm_content({**llm_params, "messages": messages})
+        chunks = []
+        try:
+            for content in content_iter:
+                # closing the content iterator releases the upstream connection of a stopped job
+                if stopped.is_set() or self._is_cancelled():
+                    break
+                chunks.append(content)
+        finally:
+            content_iter.close()
+            # the thread's database connection is not managed by a request
+            connection.close()
+        return ''.join(chunks)
+    
+    def _stream_coalesced_response(self):
+        """
+        Stream the response, attaching to an identical in-flight request of the
+        same user instead of calling the LLM again when coalescing is enabled.
+        """
+        single_flight = get_single_flight()
+        if not single_flight.is_enabled_for(self.get_prompt_name()):
+            yield from self._stream_tracked_response()
+            return
+        
+        request_key = f"{self.__class__.__name__}:{self.user.id}:{make_cache_key(self._get_model_params())}"
+        
+        # the upstream stream is shared by the identical requests, so it does not belong to this
+        # request's generation: cancelling or disconnecting only detaches this request from it
+        registry = get_generation_registry()
+        generation = registry.register(
+            self.user, self.get_song_id(), self.get_prompt_name(),
+            f"{self.llm_model.provider.internal_name}/{self.llm_model.internal_name}"
+        )
+        outcome = 'disconnected'
+        
+        try:
+            for line in single_flight.run(request_key, self._stream_llm_response, lambda: generation.cancelled):
+                generation.chars_streamed += len(line)
+                yield line
+            if generation.cancelled:
+                yield jsoncodec.dumps({"error": "Generation cancelled", "status": "cancelled"}) + '\n'
+            outcome = 'cancelled' if generation.cancelled else 'completed'
+        finally:
+            registry.unregister(generation, outcome)
+    
+    def _stream_tracked_response(self):
+        """
+        Stream the response as a registered generation that can be listed and
+        cancelled; a client disconnect closes this generator and the upstream stream.
+        """
+        registry = get_generation_registry()
+        self.generation = registry.register(
+            self.user, self.get_song_id(), self.get_prompt_name(),
+            f"{self.llm_model.provider.internal_name}/{self.llm_model.internal_name}"
+        )
+        outcome = 'disconnected'
+        
+        try:
+            yield from self._stream_llm_response()
+            outcome = 'cancelled' if self.generation.cancelled else 'completed'
+        finally:
+            registry.unregister(self.generation, outcome)
+    
+    def _is_cancelled(self) -> bool:
+        """
+        Check if the generation was cancelled.
+        """
+        return self.generation is not None and self.generation.cancelled
+    
+    def _save_assistant_response(self, response_text: str, song_id: int, message_type: str) -> None:
+        """
+        Save the assistant response to the conversation history, if it is enabled for this generator.
+        """
+        if not self.uses_conversation_history() or not response_text.strip():
+            return
+        
+        # Clean excessive backticks before saving to database
+        cleaned_response = self._clean_assistant_response(response_text)
+        saved_assistant_msg = self.prompt_messages.save_assistant_message(
+            cleaned_response, song_id, message_type, self.user
+        )
+        if saved_assistant_msg:
+            logger.debug(f"Saved assistant message {saved_assistant_msg.id} after LLM completion")
+        else:
+            logger.warning(f"Failed to save assistant message after LLM completion for song {song_id}")
     
     def _stream_llm_response(self):
         """
         Call LLM and stream the response, processing each line for JSON validation.
         Also handles conversation history persistence.
         """
-        model_name = f"{self.llm_model.provider.internal_name}/{self.llm_model.internal_name}"
-        temperature = self.user.llm_temperature if self.llm_model.use_temperature else None
-        max_tokens = self.user.max_tokens_for_selected_llm * 1000
-        user_api_key = get_user_api_key(user=self.user, provider=self.llm_model.provider)
-        
         # Get parameters for message persistence
         song_id = self.get_song_id()
         message_type = self.get_message_type()
         
-        # Set Ollama base URL if needed
-        if self.llm_model.provider.internal_name == "ollama" and "OLLAMA_API_BASE" not in os.environ:
-            os.environ["OLLAMA_API_BASE"] = "http://localhost:11434"
-        
         # Save user message before LLM call (if conversation history is enabled)
         if self.uses_conversation_history():
             user_message_content = self.prompt_messages.get_last_user_message()
@@ -517,22 +1291,16 @@ class LLMGenerator(ABC):
                 else:
                     logger.warning(f"Failed to save user message before LLM call for song {song_id}")
         
+        # Valid lines emitted to the client, kept as the response if the stream fails
+        valid_lines = []
+        
         try:
             # Prepare LLM call parameters
-            llm_params = {
-                "model": model_name,
-                "messages": self.prompt_messages.get(),
-                "max_tokens": max_tokens,
-                "stream": True
-            }
-            
-            if temperature is not None:
-                llm_params["temperature"] = temperature
-
-            if user_api_key and len(user_api_key) > 0:
-                llm_params["api_key"] = user_api_key
+            llm_params = self._build_llm_params()
+            self.backup_llm_params = self._build_backup_llm_params()
+            self.fallback_llm_params = self._build_fallback_llm_params()
             
-            logger.info(f"LLM_SERVICE: Calling model {model_name} with temperature {temperature} and max_tokens {max_tokens}")
+            logger.info(f"LLM_SERVICE: Calling model {llm_params['model']} with temperature {llm_params.get('temperature')} and max_tokens {llm_params['max_tokens']}")
             logger.debug(f"LLM_SERVICE: Messages: {self.prompt_messages.get()}")
 
             # Log the full conversation to LLM conversation log file before calling completion()
@@ -541,49 +1309,71 @@ class LLMGenerator(ABC):
             except Exception as e:
                 logger.warning(f"Failed to log conversation to file: {e}")
             
-            response_stream = litellm.completion(**llm_params)
-            
             # Accumulate assistant response for database persistence
             accumulated_response = []
             
             # Process streaming chunks
-            current_line = ""
-            chunk_count = 0
-            for chunk in response_stream:
-                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
-                    content = self._normalize_text(chunk.choices[0].delta.content)
-                    chunk_count += 1
-                    
-                    # Log suspicious content containing many backticks
-                    if '`' in content and len([c for c in content if c == '`']) > 10:
-                        logger.warning(f"LLM_STREAM_CHUNK_{chunk_count}: Detected chunk with many backticks: {repr(content)}")
-                    
-                    current_line += content
-                    accumulated_response.append(content)
-                    
-                    # Process complete lines
-                    while '\n' in current_line:
-                        line, current_line = current_line.split('\n', 1)
-                        yield from self._process_response_line(line)
+            framer = NDJSONFramer()
+            runaway_detector = get_runaway_detector()
+            expected_items = self.get_expected_item_count()
+            item_count = 0
+            content_iter = self._iter_response_content(llm_params)
+            for content in content_iter:
+                # Stop reading the upstream stream as soon as the generation is cancelled
+                if self.generation is not None:
+                    if self.generation.cancelled:
+                        content_iter.close()
+                        break
+                    self.generation.chars_streamed += len(content)
+                
+                # Log suspicious content containing many backticks
+                if content.count('`') > 10:
+                    logger.warning(f"LLM_STREAM_CHUNK_{framer.chunk_count + 1}: Detected chunk with many backticks: {repr(content)}")
+                
+                accumulated_response.append(content)
+                
+                # Process complete lines
+                for line in framer.feed(content):
+                    valid = yield from self._process_response_line(line)
+                    if valid:
+                        valid_lines.append(line)
+                        item_count += 1
+                        if expected_items and item_count >= expected_items:
+                            self.expected_items_reached = True
+                            break
+                    if runaway_detector.feed_line(line, valid):
+                        break
+                
+                # Stop reading once every expected item has been emitted
+                if self.expected_items_reached:
+                    logger.info(f"LLM_SERVICE: Received all {expected_items} expected items, closing the stream")
+                    content_iter.close()
+                    break
+                
+                # Stop paying for a response that has degenerated
+                if runaway_detector.feed_chunk(content):
+                    content_iter.close()
+                    break
             
-            # Process any remaining content
-            if current_line.strip():
-                accumulated_response.append(current_line)
-                yield from self._process_response_line(current_line)
+            if self._is_cancelled():
+                yield jsoncodec.dumps({"error": "Generation cancelled", "status": "cancelled"}) + '\n'
+                return
+            
+            if self.expected_items_reached:
+                # the rest of the response was never read
+                accumulated_response = ['\n'.join(valid_lines) + '\n']
+            elif runaway_detector.reason:
+                # only the valid lines before the runaway output are kept
+                accumulated_response = ['\n'.join(valid_lines) + '\n'] if valid_lines else []
+                yield jsoncodec.dumps({"error": f"Response stopped early: {runaway_detector.reason}", "status": "truncated"}) + '\n'
+            else:
+                # Process any remaining content
+                remaining = framer.flush()
+                if remaining.strip():
+                    yield from self._process_response_line(remaining)
             
             # Save complete assistant response to database (if conversation history is enabled)
-            if self.uses_conversation_history():
-                complete_response = ''.join(accumulated_response)
-                if complete_response.strip():
-                    # Clean excessive backticks before saving to database
-                    cleaned_response = self._clean_assistant_response(complete_response)
-                    saved_assistant_msg = self.prompt_messages.save_assistant_message(
-                        cleaned_response, song_id, message_type, self.user
-                    )
-                    if saved_assistant_msg:
-                        logger.debug(f"Saved assistant message {saved_assistant_msg.id} after LLM completion")
-                    else:
-                        logger.warning(f"Failed to save assistant message after LLM completion for song {song_id}")
+            self._save_assistant_response(''.join(accumulated_response), song_id, message_type)
             
             # Call on_response_complete after successful generation
             try:
@@ -591,7 +1381,60 @@ class LLMGenerator(ABC):
             except Exception as e:
                 logger.error(f"Error in on_response_complete: {str(e)}")
                 
+        except AdmissionTimeout as e:
+            error_response = {
+                "error": str(e),
+                "status": "error",
+                "status_code": e.status_code,
+                "retry_after": e.retry_after
+            }
+            yield jsoncodec.dumps(error_response) + '\n'
+            
+        except CircuitOpenError as e:
+            logger.error(f"LLM_FAILOVER: {e}")
+            error_response = {
+                "error": str(e),
+                "status": "error",
+                "status_code": e.status_code
+            }
+            yield jsoncodec.dumps(error_response) + '\n'
+            
+        except StreamStallError as e:
+            error_response = {
+                "error": str(e),
+                "status": "error",
+                "status_code": e.status_code
+            }
+            yield jsoncodec.dumps(error_response) + '\n'
+            
+            # the lines emitted before the stream stalled are kept
+            if valid_lines:
+                self._save_assistant_response('\n'.join(valid_lines) + '\n', song_id, message_type)
+            
         except Exception as e:
+            if self._is_cancelled():
+                # cancelling closed the upstream stream while it was being read
+                yield jsoncodec.dumps({"error": "Generation cancelled", "status": "cancelled"}) + '\n'
+                return
+            
+            if valid_lines:
+                # the stream failed mid-response and could not be continued, the lines emitted so far are kept
+                logger.error(f"LLM_SERVICE: The LLM stream failed after {len(valid_lines)} lines: {e}")
+                error_response = {
+                    "error": f"Response stopped early: {e}",
+                    "status": "truncated"
+                }
+                if getattr(e, 'status_code', None):
+                    error_response["status_code"] = e.status_code
+                yield jsoncodec.dumps(error_response) + '\n'
+                
+                self._save_assistant_response('\n'.join(valid_lines) + '\n', song_id, message_type)
+                try:
+                    self.on_response_complete()
+                except Exception as complete_error:
+                    logger.error(f"Error in on_response_complete during error handling: {str(complete_error)}")
+                return
+            
             logger.error(f"LLM_SERVICE_EXCEPTION: An error occurred during the LLM stream: {e}")
             import traceback
             error_response = {
@@ -599,7 +1442,7 @@ class LLMGenerator(ABC):
                 "traceback": traceback.format_exc(),
                 "status": "error"
             }
-            yield json.dumps(error_response)
+            yield jsoncodec.dumps(error_response)
             
             # Call on_response_complete even on error in case we saved some messages
             try:
@@ -0,0 +1,283 @@
+"""
+LLM Hedging Service
+
+This service cuts the tail latency of LLM streams: when the primary model has
+not produced its first token within a delay derived from its recent
+time-to-first-token p95, a backup request is started against a second
+configured LLM, or right away when the primary fails before producing a
+token. Whichever stream produces a token first is used and the other one is
+cancelled, closing its upstream response right away.
+
+A primary that loses the race still counts towards its time-to-first-token
+samples: the time it had waited when it was cancelled is recorded as a lower
+bound, so slow primaries keep the hedge delay up instead of dropping out.
+
+Configuration is read from settings.LLM_HEDGING (see root/settings.py).
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Iterator, Optional
+from django.conf import settings
+from .llm_stream_abort import StreamAbortScope, abort_scope, current_abort_scope
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default hedging configuration, overridden by settings.LLM_HEDGING
+DEFAULT_HEDGING_CONFIG = {
+    'ENABLED': False,
+    'BACKUP_LLMS': {},
+    'PERCENTILE': 95,
+    'MIN_SAMPLES': 10,
+    'SAMPLE_WINDOW': 200,
+    'DEFAULT_DELAY_SECONDS': 3.0,
+    'MIN_DELAY_SECONDS': 0.5,
+}
+
+# Markers put on the race queue by the stream threads
+_STREAM_END = object()
+
+
+class _RacingStream:
+    """
+    Reads an LLM content iterator on a background thread into a shared queue.
+    """
+
+    def __init__(self, name: str, model_name: str, factory: Callable[[], Iterator[str]], results: queue.Queue):
+        self.name = name
+        self.model_name = model_name
+        self.started_at = time.monotonic()
+        self._factory = factory
+        self._results = results
+        self._cancelled = threading.Event()
+        self._abort_scope = StreamAbortScope(current_abort_scope())
+        self._thread = threading.Thread(target=self._run, name=f"llm-hedge-{name}", daemon=True)
+        self._thread.start()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        # a stream still waiting for its first token is blocked on its socket
+        self._abort_scope.abort()
+
+    def _run(self) -> None:
+        iterator = None
+        with abort_scope(self._abort_scope):
+            try:
+                iterator = self._factory()
+                for content in iterator:
+                    if self._cancelled.is_set():
+                        break
+                    self._results.put((self, content))
+                self._results.put((self, _STREAM_END))
+            except Exception as e:
+                self._results.put((self, e))
+            finally:
+                # closing the generator releases the upstream connection of a cancelled stream
+                close = getattr(iterator, 'close', None)
+                if close:
+                    try:
+                        close()
+                    except Exception:
+                        pass
+
+
+class HedgingPolicy:
+    """
+    Hedged request policy for LLM streams.
+
+    Features:
+    - Per model rolling window of time-to-first-token samples
+    - Hedge delay derived from the configured percentile (p95 by default)
+    - Backup request to a second configured LLM, first stream to produce a token wins
+    - Counters for how often hedging fires and which stream wins
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            config: Hedging configuration, merged over DEFAULT_HEDGING_CONFIG
+        """
+        self.config = {**DEFAULT_HEDGING_CONFIG, **(config or {})}
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'hedges_fired': 0,
+            'primary_wins': 0,
+            'backup_wins': 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def get_backup_llm_name(self, llm_name: str) -> Optional[str]:
+        """
+        Get the internal name of the backup LLM configured for a model.
+        """
+        if not self.enabled:
+            return None
+        backup_llms = self.config.get('BACKUP_LLMS') or {}
+        backup_name = backup_llms.get(llm_name) or backup_llms.get('*')
+        return backup_name if backup_name and backup_name != llm_name else None
+
+    def record_first_token(self, llm_name: str, seconds: float) -> None:
+        """
+        Record a time-to-first-token sample for a model.
+        """
+        with self._lock:
+            samples = self._samples.get(llm_name)
+            if samples is None:
+                samples = deque(maxlen=self.config['SAMPLE_WINDOW'])
+                self._samples[llm_name] = samples
+            samples.append(seconds)
+
+    def get_hedge_delay(self, llm_name: str) -> float:
+        """
+        Get the delay before a backup request is started for a model.
+
+        Returns:
+            The configured percentile of recent time-to-first-token samples, or
+            DEFAULT_DELAY_SECONDS until MIN_SAMPLES samples have been recorded
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(llm_name) or [])
+
+        if len(samples) < self.config['MIN_SAMPLES']:
+            return self.config['DEFAULT_DELAY_SECONDS']
+
+        index = min(int(len(samples) * self.config['PERCENTILE'] / 100), len(samples) - 1)
+        return max(samples[index], self.config['MIN_DELAY_SECONDS'])
+
+    def stream(self, primary_name: str, primary_factory: Callable[[], Iterator[str]],
+               backup_name: str, backup_factory: Callable[[], Iterator[str]],
+               on_winner: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+        """
+        Stream content from the primary model, hedging with the backup model if
+        the primary has not produced a token within the hedge delay or fails
+        before producing one.
+
+        Args:
+            primary_name: Model name of the primary LLM (provider/model)
+            primary_factory: Callable returning the primary content iterator
+            backup_name: Model name of the backup LLM (provider/model)
+            backup_factory: Callable returning the backup content iterator
+            on_winner: Called with the model name of the winning stream before its first chunk is yielded
+
+        Yields:
+            Content chunks of the winning stream
+        """
+        self._increment('requests')
+        results = queue.Queue()
+        delay = self.get_hedge_delay(primary_name)
+
+        racers = [_RacingStream('primary', primary_name, primary_factory, results)]
+        deadline = time.monotonic() + delay
+        winner = None
+        first_content = None
+        last_error = None
+
+        hedged = False
+
+        try:
+            while winner is None:
+                timeout = None if hedged else max(deadline - time.monotonic(), 0)
+
+                try:
+                    racer, item = results.get(timeout=timeout)
+                except queue.Empty:
+                    # the primary is slower than the hedge delay, start the backup
+                    hedged = True
+                    self._increment('hedges_fired')
+                    logger.info(f"LLM_HEDGING: No token from '{primary_name}' after {delay:.2f}s, starting backup '{backup_name}'")
+                    racers.append(_RacingStream('backup', backup_name, backup_factory, results))
+                    continue
+
+                if item is _STREAM_END or isinstance(item, Exception):
+                    # a racer finished without producing any content, wait for the other one
+                    if isinstance(item, Exception):
+                        last_error = item
+                    racers.remove(racer)
+                    if isinstance(item, Exception) and not hedged:
+                        # the primary failed before the hedge delay, the backup takes over right away
+                        hedged = True
+                        self._increment('hedges_fired')
+                        logger.info(f"LLM_HEDGING: '{primary_name}' failed before producing a token ({item}), starting backup '{backup_name}'")
+                        racers.append(_RacingStream('backup', backup_name, backup_factory, results))
+                    if racers:
+                        continue
+                    if last_error is not None:
+                        raise last_error
+                    return
+
+                winner = racer
+                first_content = item
+
+            # cancel the loser
+            for racer in racers:
+                if racer is not winner:
+                    racer.cancel()
+                    if racer.name == 'primary':
+                        # the primary's first token would have taken at least this long
+                        self.record_first_token(racer.model_name, time.monotonic() - racer.started_at)
+
+            self._increment(f"{winner.name}_wins")
+            self.record_first_token(winner.model_name, time.monotonic() - winner.started_at)
+            if winner.name == 'backup':
+                logger.info(f"LLM_HEDGING: Backup '{backup_name}' won the race against '{primary_name}'")
+            if on_winner is not None:
+                on_winner(winner.model_name)
+
+            yield first_content
+            while True:
+                racer, item = results.get()
+                if racer is not winner:
+                    continue
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+        finally:
+            for racer in racers:
+                racer.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the hedging counters and current hedge delays per model.
+        """
+        with self._lock:
+            model_names = list(self._samples.keys())
+        return {
+            **self.counters,
+            'hedge_delays': {name: round(self.get_hedge_delay(name), 3) for name in model_names},
+        }
+
+    def _increment(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+
+# Module-level policy shared by all generators in this worker
+_hedging_policy = None
+_hedging_policy_lock = threading.Lock()
+
+
+def get_hedging_policy() -> HedgingPolicy:
+    """
+    Get the worker-wide hedging policy, creating it from settings on first use.
+    """
+    global _hedging_policy
+    if _hedging_policy is None:
+        with _hedging_policy_lock:
+            if _hedging_policy is None:
+                _hedging_policy = HedgingPolicy(getattr(settings, 'LLM_HEDGING', None))
+    return _hedging_policy
@@ -0,0 +1,137 @@
+"""
+LLM Prompt Cache Service
+
+Providers such as Anthropic and OpenAI cache the prompt prefix of repeated
+requests, which makes follow-ups that resend the same system prompt and
+conversation history cheaper and faster. OpenAI caches long prefixes
+automatically; Anthropic only caches prefixes marked with cache-control
+breakpoints (see utils.messages.add_cache_control).
+
+This service decides which providers receive cache-control markers and which
+are asked for usage data in streamed responses, and keeps
+per model totals of prompt tokens and cache-hit tokens reported in the usage
+data of each response.
+
+Configuration is read from settings.LLM_PROMPT_CACHE (see root/settings.py).
+"""
+
+import threading
+from typing import Dict, Any, Optional
+from django.conf import settings
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default prompt cache configuration, overridden by settings.LLM_PROMPT_CACHE
+DEFAULT_PROMPT_CACHE_CONFIG = {
+    'ENABLED': True,
+    'CACHE_CONTROL_PROVIDERS': ['anthropic'],
+    'STREAM_USAGE_PROVIDERS': ['openai', 'anthropic', 'xai'],
+}
+
+
+def _get_usage_value(usage: Any, name: str) -> int:
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return value if isinstance(value, int) else 0
+
+
+class PromptCacheStats:
+    """
+    Provider prompt cache policy and cache-hit statistics.
+
+    Features:
+    - Per provider opt-in for cache-control markers
+    - Per provider opt-in for usage data in streamed responses
+    - Per model totals of prompt, cache-read and cache-write tokens from usage data
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the statistics.
+
+        Args:
+            config: Prompt cache configuration, merged over DEFAULT_PROMPT_CACHE_CONFIG
+        """
+        self.config = {**DEFAULT_PROMPT_CACHE_CONFIG, **(config or {})}
+        self._models: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def uses_cache_control(self, provider_name: str) -> bool:
+        """
+        Check if requests to a provider should carry cache-control markers.
+        """
+        return self.enabled and provider_name in (self.config.get('CACHE_CONTROL_PROVIDERS') or [])
+
+    def requests_stream_usage(self, provider_name: str) -> bool:
+        """
+        Check if streamed requests to a provider should ask for usage data,
+        only providers that accept stream_options are asked.
+        """
+        return self.enabled and provider_name in (self.config.get('STREAM_USAGE_PROVIDERS') or [])
+
+    def record_usage(self, model_name: str, usage: Any) -> None:
+        """
+        Record the prompt and cache token counts of a response.
+
+        Args:
+            model_name: Model name of the LLM (provider/model)
+            usage: Usage data of the response as returned by litellm
+        """
+        prompt_tokens = _get_usage_value(usage, 'prompt_tokens')
+        cache_write_tokens = _get_usage_value(usage, 'cache_creation_input_tokens')
+
+        # OpenAI reports cache hits in prompt_tokens_details, litellm maps Anthropic cache reads there too
+        prompt_tokens_details = usage.get('prompt_tokens_details') if isinstance(usage, dict) else getattr(usage, 'prompt_tokens_details', None)
+        cache_read_tokens = _get_usage_value(prompt_tokens_details, 'cached_tokens') if prompt_tokens_details else 0
+        if not cache_read_tokens:
+            cache_read_tokens = _get_usage_value(usage, 'cache_read_input_tokens')
+
+        with self._lock:
+            totals = self._models.setdefault(model_name, {
+                'responses': 0,
+                'prompt_tokens': 0,
+                'cache_read_tokens': 0,
+                'cache_write_tokens': 0,
+            })
+            totals['responses'] += 1
+            totals['prompt_tokens'] += prompt_tokens
+            totals['cache_read_tokens'] += cache_read_tokens
+            totals['cache_write_tokens'] += cache_write_tokens
+
+        logger.info(f"LLM_PROMPT_CACHE: {model_name} read {cache_read_tokens} of {prompt_tokens} prompt tokens from cache, wrote {cache_write_tokens}")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the token totals and cache hit ratio per model.
+        """
+        with self._lock:
+            return {
+                model_name: {
+                    **totals,
+                    'hit_ratio': round(totals['cache_read_tokens'] / totals['prompt_tokens'], 3) if totals['prompt_tokens'] else 0.0,
+                }
+                for model_name, totals in self._models.items()
+            }
+
+
+# Module-level statistics shared by all generators in this worker
+_prompt_cache_stats = None
+_prompt_cache_stats_lock = threading.Lock()
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    """
+    Get the worker-wide prompt cache statistics, creating them from settings on first use.
+    """
+    global _prompt_cache_stats
+    if _prompt_cache_stats is None:
+        with _prompt_cache_stats_lock:
+            if _prompt_cache_stats is None:
+                _prompt_cache_stats = PromptCacheStats(getattr(settings, 'LLM_PROMPT_CACHE', None))
+    return _prompt_cache_stats
@@ -0,0 +1,155 @@
+"""
+LLM Response Cache Service
+
+This service keeps an in-memory, per-worker cache of complete LLM responses
+keyed by an exact hash of the rendered messages and model parameters, so that
+identical generation requests can be replayed without calling the provider.
+
+The cache is opt-in and only applies to the prompt names listed in
+settings.LLM_RESPONSE_CACHE['PROMPT_NAMES'] (see root/settings.py).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from django.conf import settings
+from .utils import jsoncodec
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default cache configuration, overridden by settings.LLM_RESPONSE_CACHE
+DEFAULT_CACHE_CONFIG = {
+    'ENABLED': False,
+    'MAX_ENTRIES': 256,
+    'TTL_SECONDS': 600,
+    'PROMPT_NAMES': [],
+}
+
+# Parameters of a completion() call that do not determine the response: the
+# credentials and the pooled client objects, every other parameter is part of the key
+CACHE_KEY_IGNORED_PARAMS = ('api_key', 'client')
+
+
+def make_cache_key(llm_params: Dict[str, Any]) -> str:
+    """
+    Build an exact-match cache key for a completion() call.
+
+    Args:
+        llm_params: Parameters passed to litellm.completion()
+
+    Returns:
+        Hex digest of the rendered messages and every other sent parameter
+    """
+    key_data = sorted([name, value] for name, value in llm_params.items() if name not in CACHE_KEY_IGNORED_PARAMS)
+    return hashlib.sha256(jsoncodec.dumps(key_data).encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Size and TTL bounded LRU cache of complete LLM responses.
+
+    Features:
+    - Exact-match lookup by hash of the messages and the sent model parameters
+    - Least recently used eviction when MAX_ENTRIES is exceeded
+    - Expiry of entries older than TTL_SECONDS
+    - Per prompt name allowlist
+    - Thread-safe access
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            config: Cache configuration, merged over DEFAULT_CACHE_CONFIG
+        """
+        self.config = {**DEFAULT_CACHE_CONFIG, **(config or {})}
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_enabled_for(self, prompt_name: str) -> bool:
+        """
+        Check if responses for a prompt name may be cached.
+        """
+        return bool(self.config.get('ENABLED')) and prompt_name in (self.config.get('PROMPT_NAMES') or [])
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached response.
+
+        Args:
+            key: Cache key from make_cache_key()
+
+        Returns:
+            Cached response text, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            created_at, response_text = entry
+            if time.monotonic() - created_at > self.config['TTL_SECONDS']:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response_text
+
+    def set(self, key: str, response_text: str) -> None:
+        """
+        Store a complete response, evicting the least recently used entries if full.
+
+        Args:
+            key: Cache key from make_cache_key()
+            response_text: Complete (normalized) response text from the provider
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response_text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config['MAX_ENTRIES']:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove all cached responses.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get cache statistics.
+        """
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# Module-level cache shared by all generators in this worker
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    """
+    Get the worker-wide LLM response cache, creating it from settings on first use.
+    """
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = LLMResponseCache(getattr(settings, 'LLM_RESPONSE_CACHE', None))
+    return _response_cache
@@ -0,0 +1,163 @@
+"""
+LLM Routing Service
+
+This service routes each generation to a model of the tier configured for its
+prompt name, so that small jobs such as word suggestions run on a fast, cheap
+model while full-song lyrics keep the user's selected model.
+
+Every LLM has a tier ('fast', 'standard' or 'large'). When a prompt name maps
+to a tier and the user's selected model is not of that tier, the candidate
+LLMs of the tier that the user has an API key for and whose circuit breaker is
+not open are scored by their recent median time to first token, multiplied by
+a penalty for their recent error rate; the lowest score wins and the cheapest
+model breaks ties. The user's selected model becomes the first fallback.
+
+Routing is opt-in: it must be enabled in the settings, and each user turns it
+on for themselves (User.llm_auto_routing); otherwise the user's selected model
+is always used.
+
+Configuration is read from settings.LLM_ROUTING (see root/settings.py).
+"""
+
+import threading
+from typing import Dict, Any, Optional
+from django.conf import settings
+from .llm_circuit_breaker import get_breaker_registry
+from .llm_stats import get_llm_stats
+from .utils.apikey import get_user_api_key
+from ..models import LLM
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default routing configuration, overridden by settings.LLM_ROUTING
+DEFAULT_ROUTING_CONFIG = {
+    'ENABLED': False,
+    'PROMPT_TIERS': {},
+    'MIN_SAMPLES': 5,
+    'DEFAULT_LATENCY_SECONDS': 2.0,
+    'ERROR_PENALTY': 4.0,
+}
+
+
+class RoutingPolicy:
+    """
+    Latency-aware choice of the LLM for a prompt name.
+
+    Features:
+    - Prompt name to model tier mapping
+    - Models scored by their median time to first token from the LLM stats store
+    - Error rate penalty from the model's circuit breaker, open breakers are skipped
+    - Only models of providers the user has an API key for are candidates
+    - Counters for how often each model was routed to
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            config: Routing configuration, merged over DEFAULT_ROUTING_CONFIG
+        """
+        self.config = {**DEFAULT_ROUTING_CONFIG, **(config or {})}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def get_tier(self, prompt_name: str) -> Optional[str]:
+        """
+        Get the model tier configured for a prompt name, None to use the user's model.
+        """
+        prompt_tiers = self.config.get('PROMPT_TIERS') or {}
+        return prompt_tiers.get(prompt_name, prompt_tiers.get('*'))
+
+    def get_latency(self, model_name: str) -> float:
+        """
+        Get the median time to first token of a model's recent calls, or
+        DEFAULT_LATENCY_SECONDS until MIN_SAMPLES calls have been recorded.
+        """
+        live_stats = get_llm_stats().get_live_stats(model_name)
+        if live_stats['count'] < self.config['MIN_SAMPLES'] or live_stats['ttft_p50'] is None:
+            return self.config['DEFAULT_LATENCY_SECONDS']
+        return live_stats['ttft_p50']
+
+    def get_score(self, model_name: str) -> Optional[float]:
+        """
+        Get the routing score of a model (lower is better), None while its circuit is open.
+        """
+        registry = get_breaker_registry()
+        if registry.is_open(model_name):
+            return None
+        error_rate = registry.get_breaker(f"llm:{model_name}").get_stats()['error_rate']
+        return self.get_latency(model_name) * (1 + self.config['ERROR_PENALTY'] * error_rate)
+
+    def choose_llm(self, user, prompt_name: str) -> Optional[LLM]:
+        """
+        Choose the LLM for a generation.
+
+        Args:
+            user: The user making the request
+            prompt_name: Name of the prompt being generated
+
+        Returns:
+            The LLM to route to, or None to use the user's selected model
+        """
+        if not self.enabled or not user.llm_auto_routing:
+            return None
+
+        tier = self.get_tier(prompt_name)
+        if not tier or user.llm_model.tier == tier:
+            return None
+
+        best_llm, best_key = None, None
+        has_api_key = {}
+        for llm in LLM.objects.filter(tier=tier).select_related('provider'):
+            if llm.provider_id not in has_api_key:
+                has_api_key[llm.provider_id] = bool(get_user_api_key(user=user, provider=llm.provider))
+            if not has_api_key[llm.provider_id]:
+                continue
+
+            score = self.get_score(f"{llm.provider.internal_name}/{llm.internal_name}")
+            if score is None:
+                continue
+            key = (score, llm.cost_per_1m_tokens)
+            if best_key is None or key < best_key:
+                best_llm, best_key = llm, key
+
+        if best_llm is None:
+            logger.debug(f"LLM_ROUTING: No available '{tier}' model for '{prompt_name}', using the user's model")
+            return None
+
+        with self._lock:
+            self.counters[best_llm.internal_name] = self.counters.get(best_llm.internal_name, 0) + 1
+        logger.info(f"LLM_ROUTING: Routing '{prompt_name}' for user '{user.username}' to {best_llm.internal_name} ({tier}, score {best_key[0]:.2f})")
+        return best_llm
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the number of generations routed to each model.
+        """
+        with self._lock:
+            return {'routed': dict(self.counters)}
+
+
+# Module-level policy shared by all generators in this worker
+_routing_policy = None
+_routing_policy_lock = threading.Lock()
+
+
+def get_routing_policy() -> RoutingPolicy:
+    """
+    Get the worker-wide routing policy, creating it from settings on first use.
+    """
+    global _routing_policy
+    if _routing_policy is None:
+        with _routing_policy_lock:
+            if _routing_policy is None:
+                _routing_policy = RoutingPolicy(getattr(settings, 'LLM_ROUTING', None))
+    return _routing_policy
@@ -0,0 +1,144 @@
+"""
+LLM Runaway Output Detector
+
+This service watches a generation stream for degenerate output so it can be
+stopped as soon as the model starts looping, instead of consuming tokens up
+to max_tokens. A stream is considered runaway when:
+
+- a run of backticks and whitespace is longer than MAX_FLOOD_CHARS
+- a single line grows longer than MAX_LINE_CHARS without a newline
+- more than MAX_INVALID_LINES consecutive lines are not valid JSON
+- the same line is repeated more than MAX_REPEATED_LINES times
+- a word n-gram appears in more than MAX_NGRAM_LINES of the last
+  NGRAM_WINDOW_LINES lines (choruses repeat, but not on every line)
+
+A detector is created per generation; the generator closes the upstream
+stream and persists only the valid lines received before the detection.
+
+Configuration is read from settings.LLM_RUNAWAY_DETECTION (see root/settings.py).
+"""
+
+from collections import Counter, deque
+from typing import Dict, Any, Optional
+from django.conf import settings
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default detection configuration, overridden by settings.LLM_RUNAWAY_DETECTION
+DEFAULT_RUNAWAY_CONFIG = {
+    'ENABLED': True,
+    'MAX_FLOOD_CHARS': 200,
+    'MAX_LINE_CHARS': 8000,
+    'MAX_INVALID_LINES': 5,
+    'MAX_REPEATED_LINES': 5,
+    'NGRAM_SIZE': 6,
+    'NGRAM_WINDOW_LINES': 20,
+    'MAX_NGRAM_LINES': 8,
+}
+
+# Characters a model floods the stream with when it degenerates
+_FLOOD_CHARS = '` \t\r\n'
+
+
+class RunawayOutputDetector:
+    """
+    Online degeneracy detector for a single generation stream.
+
+    Chunks are checked with feed_chunk() as they arrive and complete lines with
+    feed_line(); both return the reason once the stream is runaway, None otherwise.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the detector.
+
+        Args:
+            config: Detection configuration, merged over DEFAULT_RUNAWAY_CONFIG
+        """
+        self.config = {**DEFAULT_RUNAWAY_CONFIG, **(config or {})}
+        self.reason = None
+        self._flood_run = 0
+        self._line_length = 0
+        self._invalid_run = 0
+        self._line_counts = Counter()
+        self._ngram_window = deque()
+        self._ngram_counts = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def feed_chunk(self, content: str) -> Optional[str]:
+        """
+        Check a chunk of streamed text for backtick/whitespace floods and unterminated lines.
+        """
+        if not self.enabled or self.reason:
+            return self.reason
+
+        # only the run at the end of the chunk matters, it carries over into the next chunk
+        trailing = len(content) - len(content.rstrip(_FLOOD_CHARS))
+        self._flood_run = self._flood_run + trailing if trailing == len(content) else trailing
+        if self._flood_run > self.config['MAX_FLOOD_CHARS']:
+            return self._detect(f"{self._flood_run} consecutive backtick or whitespace characters")
+
+        newline_pos = content.rfind('\n')
+        self._line_length = len(content) - newline_pos - 1 if newline_pos != -1 else self._line_length + len(content)
+        if self._line_length > self.config['MAX_LINE_CHARS']:
+            return self._detect(f"line longer than {self.config['MAX_LINE_CHARS']} characters")
+
+        return None
+
+    def feed_line(self, line: str, valid: bool) -> Optional[str]:
+        """
+        Check a complete line for runs of invalid lines and repetition.
+
+        Args:
+            line: The line without its newline
+            valid: True if the line is valid JSON
+        """
+        if not self.enabled or self.reason:
+            return self.reason
+
+        stripped_line = line.strip()
+        if not stripped_line:
+            return None
+
+        if not valid:
+            self._invalid_run += 1
+            if self._invalid_run > self.config['MAX_INVALID_LINES']:
+                return self._detect(f"{self._invalid_run} consecutive lines that are not JSON")
+            return None
+        self._invalid_run = 0
+
+        self._line_counts[stripped_line] += 1
+        if self._line_counts[stripped_line] > self.config['MAX_REPEATED_LINES']:
+            return self._detect(f"line repeated {self._line_counts[stripped_line]} times: {stripped_line[:50]}")
+
+        # count each n-gram once per line, so a line that repeats a word is not looping by itself
+        words = stripped_line.lower().split()
+        size = self.config['NGRAM_SIZE']
+        ngrams = {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+        self._ngram_window.append(ngrams)
+        self._ngram_counts.update(ngrams)
+        if len(self._ngram_window) > self.config['NGRAM_WINDOW_LINES']:
+            self._ngram_counts.subtract(self._ngram_window.popleft())
+        for ngram in ngrams:
+            if self._ngram_counts[ngram] > self.config['MAX_NGRAM_LINES']:
+                return self._detect(f"phrase repeated on {self._ngram_counts[ngram]} lines: {' '.join(ngram)[:50]}")
+
+        return None
+
+    def _detect(self, reason: str) -> str:
+        self.reason = reason
+        logger.warning(f"LLM_RUNAWAY: Stopping runaway output, {reason}")
+        return reason
+
+
+def get_runaway_detector() -> RunawayOutputDetector:
+    """
+    Create a detector for a new generation stream, configured from settings.
+    """
+    return RunawayOutputDetector(getattr(settings, 'LLM_RUNAWAY_DETECTION', None))
@@ -0,0 +1,242 @@
+"""
+LLM Single-Flight Service
+
+This service coalesces concurrent, identical generation requests in a worker:
+the first request (the leader) starts the upstream LLM stream on a background
+thread and every request with the same key, the leader included, subscribes to
+it and receives the same NDJSON lines, so the provider is only called once and
+the persistence side effects are only executed once.
+
+The upstream stream keeps running while any request is subscribed: a request
+whose client disconnects or that is cancelled only detaches from it, and the
+stream is closed when the last subscriber detaches. If the stream stops before
+it completes anyway, the subscribers receive an error line instead of a
+response that looks complete.
+
+Configuration is read from settings.LLM_REQUEST_COALESCING (see root/settings.py).
+"""
+
+import threading
+from typing import Dict, Any, Callable, Iterator, List, Optional
+from django.conf import settings
+from django.db import connection
+from .utils import jsoncodec
+from .llm_stream_abort import StreamAbortScope, abort_scope
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default coalescing configuration, overridden by settings.LLM_REQUEST_COALESCING
+DEFAULT_COALESCING_CONFIG = {
+    'ENABLED': True,
+    'PROMPT_NAMES': ['song_words', 'song_styles', 'song_names'],
+}
+
+# Seconds a subscriber waits for new lines before re-checking the stream state
+SUBSCRIBER_POLL_SECONDS = 1.0
+
+
+class InFlightStream:
+    """
+    Lines produced so far by a leader's stream, readable by any number of subscribers.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.lines: List[str] = []
+        self.done = False
+        self.subscriber_count = 0
+        self._condition = threading.Condition()
+
+    def publish(self, line: str) -> None:
+        """
+        Append a line produced by the leader and wake up the subscribers.
+        """
+        with self._condition:
+            self.lines.append(line)
+            self._condition.notify_all()
+
+    def finish(self) -> None:
+        """
+        Mark the stream as finished and wake up the subscribers.
+        """
+        with self._condition:
+            self.done = True
+            self._condition.notify_all()
+
+    def subscribe(self, offset: int = 0, is_cancelled: Optional[Callable[[], bool]] = None) -> Iterator[str]:
+        """
+        Yield every line of the stream from an offset, waiting for new lines until
+        it finishes or, checked at least every SUBSCRIBER_POLL_SECONDS, is_cancelled() is true.
+        """
+        while True:
+            with self._condition:
+                while offset >= len(self.lines) and not self.done:
+                    if is_cancelled is not None and is_cancelled():
+                        return
+                    self._condition.wait(SUBSCRIBER_POLL_SECONDS)
+                new_lines = self.lines[offset:]
+                offset = len(self.lines)
+                finished = self.done
+
+            yield from new_lines
+
+            if finished and offset >= len(self.lines):
+                return
+
+
+class CoalescedStream(InFlightStream):
+    """
+    An in-flight stream shared by identical requests, stopped when its last subscriber detaches.
+    """
+
+    def __init__(self, key: str):
+        super().__init__(key)
+        self.stopped = threading.Event()
+        # the provider streams opened by the background thread running the stream
+        self.abort_scope = StreamAbortScope()
+
+    def stop(self) -> None:
+        """
+        Stop the upstream stream, closing a provider stream that is being read.
+        """
+        self.stopped.set()
+        self.abort_scope.abort()
+
+
+class SingleFlight:
+    """
+    Registry of in-flight streams keyed by request, used to coalesce identical requests.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            config: Coalescing configuration, merged over DEFAULT_COALESCING_CONFIG
+        """
+        self.config = {**DEFAULT_COALESCING_CONFIG, **(config or {})}
+        self._streams: Dict[str, InFlightStream] = {}
+        self._lock = threading.Lock()
+        self.coalesced_count = 0
+
+    def is_enabled_for(self, prompt_name: str) -> bool:
+        """
+        Check if requests for a prompt name may be coalesced.
+        """
+        return bool(self.config.get('ENABLED')) and prompt_name in (self.config.get('PROMPT_NAMES') or [])
+
+    def run(self, key: str, stream_factory: Callable[[], Iterator[str]],
+            is_cancelled: Optional[Callable[[], bool]] = None) -> Iterator[str]:
+        """
+        Run a stream once per key, attaching concurrent callers with the same key as subscribers.
+
+        Args:
+            key: Request key identifying identical requests
+            stream_factory: Callable returning the upstream line iterator (only called for the leader)
+            is_cancelled: Callable checked while waiting for lines, this caller detaches once it returns True
+
+        Yields:
+            The lines of the (shared) stream
+        """
+        with self._lock:
+            flight = self._streams.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = CoalescedStream(key)
+                self._streams[key] = flight
+            else:
+                self.coalesced_count += 1
+            flight.subscriber_count += 1
+
+        if is_leader:
+            threading.Thread(target=self._run_stream, args=(flight, stream_factory), name='llm-single-flight', daemon=True).start()
+        else:
+            logger.info(f"LLM_SERVICE: Coalesced identical request into in-flight stream ({flight.subscriber_count} subscribers)")
+
+        try:
+            for line in flight.subscribe(is_cancelled=is_cancelled):
+                yield line
+                if is_cancelled is not None and is_cancelled():
+                    return
+        finally:
+            self._detach(flight)
+
+    def _detach(self, flight: CoalescedStream) -> None:
+        """
+        Detach a subscriber, stopping the stream when it was the last one.
+        """
+        with self._lock:
+            flight.subscriber_count -= 1
+            abandoned = flight.subscriber_count == 0 and not flight.done
+            # a stopping stream must not pick up new subscribers
+            if abandoned and self._streams.get(flight.key) is flight:
+                self._streams.pop(flight.key)
+
+        if abandoned:
+            logger.info("LLM_SERVICE: Every subscriber detached from the coalesced stream, stopping it")
+            flight.stop()
+
+    def _run_stream(self, flight: CoalescedStream, stream_factory: Callable[[], Iterator[str]]) -> None:
+        """
+        Run the upstream stream on a background thread, publishing its lines until it ends or is stopped.
+        """
+        completed = False
+        iterator = None
+        with abort_scope(flight.abort_scope):
+            try:
+                iterator = stream_factory()
+                for line in iterator:
+                    flight.publish(line)
+                    if flight.stopped.is_set():
+                        break
+                else:
+                    completed = True
+            except Exception as e:
+                logger.error(f"LLM_SERVICE: Coalesced stream failed: {e}")
+            finally:
+                close = getattr(iterator, 'close', None)
+                if close:
+                    try:
+                        close()
+                    except Exception:
+                        pass
+                with self._lock:
+                    if self._streams.get(flight.key) is flight:
+                        self._streams.pop(flight.key)
+                # the subscribers must not mistake a truncated stream for a complete one
+                if not completed and not flight.stopped.is_set():
+                    logger.warning(f"LLM_SERVICE: Coalesced stream stopped early, notifying {flight.subscriber_count} subscribers")
+                    flight.publish(jsoncodec.dumps({"error": "The generation stopped before it completed, please try again", "status": "error"}) + '\n')
+                flight.finish()
+                # the thread's database connection is not managed by a request
+                connection.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing statistics.
+        """
+        return {
+            'in_flight': len(self._streams),
+            'coalesced': self.coalesced_count,
+        }
+
+
+# Module-level registry shared by all generators in this worker
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Get the worker-wide single-flight registry, creating it from settings on first use.
+    """
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(getattr(settings, 'LLM_REQUEST_COALESCING', None))
+    return _single_flight
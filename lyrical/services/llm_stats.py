@@ -0,0 +1,293 @@
+"""
+LLM Stats Service
+
+This service records how every LLM performs in practice. Each LLM call of a
+generation adds a sample of its time to first token, characters per second,
+total duration, line count and outcome, keyed by model and prompt name.
+
+Recent samples are kept in memory in a ring buffer per model and prompt name,
+which the routing policy reads for live latencies. Every ROLLUP_SECONDS the
+samples recorded since the last rollup are summarised into an LLMStatsRollup
+row per model and prompt name (count, errors, p50/p95 of each measure), so
+stats survive restarts and are shared between workers. Summaries over many
+rollups weight each rollup's percentiles by its sample count, which is an
+approximation of the true percentiles, and are aggregated in the database.
+Rollups older than RETENTION_DAYS are deleted when new ones are saved.
+
+Configuration is read from settings.LLM_STATS (see root/settings.py).
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Sum
+from django.utils import timezone
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default stats configuration, overridden by settings.LLM_STATS
+DEFAULT_STATS_CONFIG = {
+    'ENABLED': True,
+    'RING_SIZE': 200,
+    'ROLLUP_SECONDS': 300,
+    'SUMMARY_DAYS': 7,
+    'RETENTION_DAYS': 30,
+}
+
+# Outcomes of an LLM call
+OUTCOME_SUCCESS = 'success'
+OUTCOME_ERROR = 'error'
+OUTCOME_CLOSED = 'closed'   # the generation stopped reading before the response ended
+
+# Measures summarised as p50/p95
+MEASURES = ('ttft', 'chars_per_second', 'duration')
+
+
+class GenerationSample:
+    """
+    Performance of a single LLM call.
+    """
+
+    __slots__ = ('ttft', 'chars_per_second', 'duration', 'lines', 'outcome')
+
+    def __init__(self, ttft: Optional[float], duration: float, chars: int, lines: int, outcome: str):
+        self.ttft = ttft
+        self.duration = duration
+        # throughput is measured from the first token, the wait before it is in ttft
+        streaming_seconds = duration - (ttft or 0.0)
+        self.chars_per_second = chars / streaming_seconds if chars and streaming_seconds > 0 else None
+        self.lines = lines
+        self.outcome = outcome
+
+
+def _percentile(values: List[float], percentile: int) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * percentile / 100), len(values) - 1)]
+
+
+def summarise_samples(samples: List[GenerationSample]) -> Dict[str, Any]:
+    """
+    Summarise samples into counts and the p50/p95 of each measure.
+
+    Durations are only taken from calls that ran to the end of the response.
+    """
+    values = {
+        'ttft': [sample.ttft for sample in samples if sample.ttft is not None],
+        'chars_per_second': [sample.chars_per_second for sample in samples if sample.chars_per_second is not None],
+        'duration': [sample.duration for sample in samples if sample.outcome == OUTCOME_SUCCESS],
+    }
+    summary = {
+        'count': len(samples),
+        'error_count': sum(1 for sample in samples if sample.outcome == OUTCOME_ERROR),
+        'lines_mean': sum(sample.lines for sample in samples) / len(samples) if samples else 0.0,
+    }
+    for measure in MEASURES:
+        summary[f'{measure}_p50'] = _percentile(values[measure], 50)
+        summary[f'{measure}_p95'] = _percentile(values[measure], 95)
+    return summary
+
+
+class LLMStatsStore:
+    """
+    Rolling per-model, per-prompt performance stats.
+
+    Features:
+    - In-memory ring buffer of recent samples per model and prompt name
+    - Periodic rollups of new samples to the LLMStatsRollup table
+    - Live p50/p95 per model from the ring buffers
+    - Summaries per model over the rollups of the last SUMMARY_DAYS
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the store.
+
+        Args:
+            config: Stats configuration, merged over DEFAULT_STATS_CONFIG
+        """
+        self.config = {**DEFAULT_STATS_CONFIG, **(config or {})}
+        self._samples: Dict[Tuple[str, str], deque] = {}
+        self._pending: Dict[Tuple[str, str], List[GenerationSample]] = {}
+        self._lock = threading.Lock()
+        self._last_rollup = time.monotonic()
+        self._rollup_running = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def record(self, model_name: str, prompt_name: str, ttft: Optional[float], duration: float,
+               chars: int, lines: int, outcome: str) -> None:
+        """
+        Record the performance of an LLM call.
+
+        Args:
+            model_name: Model name of the LLM (provider/model)
+            prompt_name: Name of the prompt the call generated
+            ttft: Seconds to the first chunk, None if no content was received
+            duration: Seconds from the call to the end of the stream
+            chars: Characters received
+            lines: Lines received
+            outcome: OUTCOME_SUCCESS, OUTCOME_ERROR or OUTCOME_CLOSED
+        """
+        if not self.enabled:
+            return
+
+        sample = GenerationSample(ttft, duration, chars, lines, outcome)
+        key = (model_name, prompt_name)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = deque(maxlen=self.config['RING_SIZE'])
+                self._samples[key] = samples
+            samples.append(sample)
+            self._pending.setdefault(key, []).append(sample)
+
+            rollup_due = not self._rollup_running and time.monotonic() - self._last_rollup >= self.config['ROLLUP_SECONDS']
+            if rollup_due:
+                self._rollup_running = True
+
+        # rollups write to the database, keep them off the streaming thread
+        if rollup_due:
+            threading.Thread(target=self.rollup, name='llm-stats-rollup', daemon=True).start()
+
+    def get_live_stats(self, model_name: str, prompt_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the summary of the recent samples of a model, of a single prompt name if given.
+        """
+        with self._lock:
+            samples = [
+                sample
+                for (sample_model, sample_prompt), ring in self._samples.items()
+                if sample_model == model_name and (prompt_name is None or sample_prompt == prompt_name)
+                for sample in ring
+            ]
+        return summarise_samples(samples)
+
+    def rollup(self) -> int:
+        """
+        Save the samples recorded since the last rollup as LLMStatsRollup rows.
+
+        Returns:
+            Number of rows created
+        """
+        from ..models import LLM, LLMStatsRollup
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_rollup = time.monotonic()
+
+        try:
+            if not pending:
+                return 0
+
+            llms = {
+                f"{llm.provider.internal_name}/{llm.internal_name}": llm
+                for llm in LLM.objects.select_related('provider')
+            }
+            rollups = []
+            for (model_name, prompt_name), samples in pending.items():
+                llm = llms.get(model_name)
+                if llm is None:
+                    continue
+                rollups.append(LLMStatsRollup(llm=llm, prompt_name=prompt_name, **summarise_samples(samples)))
+            LLMStatsRollup.objects.bulk_create(rollups)
+            logger.debug(f"LLM_STATS: Rolled up {sum(len(samples) for samples in pending.values())} samples into {len(rollups)} rows")
+            self.prune()
+            return len(rollups)
+
+        except Exception as e:
+            logger.error(f"LLM_STATS: Failed to roll up stats: {e}")
+            return 0
+
+        finally:
+            with self._lock:
+                self._rollup_running = False
+
+    def prune(self) -> int:
+        """
+        Delete the rollups older than RETENTION_DAYS (0 keeps every rollup).
+
+        Returns:
+            Number of rows deleted
+        """
+        from ..models import LLMStatsRollup
+
+        if not self.config['RETENTION_DAYS']:
+            return 0
+        before = timezone.now() - timedelta(days=self.config['RETENTION_DAYS'])
+        deleted, _ = LLMStatsRollup.objects.filter(created_at__lt=before).delete()
+        if deleted:
+            logger.debug(f"LLM_STATS: Deleted {deleted} rollups older than {self.config['RETENTION_DAYS']} days")
+        return deleted
+
+    def get_summary(self, days: Optional[int] = None, prompt_name: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Summarise the rollups of recent days per LLM.
+
+        Args:
+            days: Number of days to summarise (default: SUMMARY_DAYS)
+            prompt_name: Only summarise this prompt name (None for all prompts)
+
+        Returns:
+            Dict of LLM ID to count, error_count, error_rate, lines_mean and the p50/p95 of each measure
+        """
+        from ..models import LLMStatsRollup
+
+        since = timezone.now() - timedelta(days=days or self.config['SUMMARY_DAYS'])
+        rollups = LLMStatsRollup.objects.filter(created_at__gte=since)
+        if prompt_name:
+            rollups = rollups.filter(prompt_name=prompt_name)
+
+        # sums weighted by each rollup's sample count, a measure only weighs the rollups that have it
+        fields = [f'{measure}_{percentile}' for measure in MEASURES for percentile in ('p50', 'p95')]
+        aggregates = {
+            'total_count': Sum('count'),
+            'total_error_count': Sum('error_count'),
+            'lines_weighted': Sum(ExpressionWrapper(F('lines_mean') * F('count'), output_field=FloatField())),
+        }
+        for field in fields:
+            has_value = Q(**{f'{field}__isnull': False})
+            aggregates[f'{field}_weighted'] = Sum(ExpressionWrapper(F(field) * F('count'), output_field=FloatField()), filter=has_value)
+            aggregates[f'{field}_weight'] = Sum('count', filter=has_value)
+
+        summaries = {}
+        for row in rollups.values('llm_id').annotate(**aggregates).order_by():
+            count = row['total_count'] or 0
+            error_count = row['total_error_count'] or 0
+            summary = {
+                'count': count,
+                'error_count': error_count,
+                'error_rate': error_count / count if count else 0.0,
+                'lines_mean': (row['lines_weighted'] or 0.0) / count if count else 0.0,
+            }
+            for field in fields:
+                weight = row[f'{field}_weight']
+                summary[field] = row[f'{field}_weighted'] / weight if weight else None
+            summaries[row['llm_id']] = summary
+        return summaries
+
+
+# Module-level store shared by all generators in this worker
+_stats_store = None
+_stats_store_lock = threading.Lock()
+
+
+def get_llm_stats() -> LLMStatsStore:
+    """
+    Get the worker-wide LLM stats store, creating it from settings on first use.
+    """
+    global _stats_store
+    if _stats_store is None:
+        with _stats_store_lock:
+            if _stats_store is None:
+                _stats_store = LLMStatsStore(getattr(settings, 'LLM_STATS', None))
+    return _stats_store
@@ -0,0 +1,128 @@
+"""
+LLM Stream Abort Service
+
+This service closes provider streams that are read on a background thread,
+e.g. the losing stream of a hedged race. Closing an HTTP response from another
+thread does not interrupt a read that is blocked on the socket, so the stream
+would hold its connection and admission slot until the next chunk arrives;
+aborting a stream also shuts down its socket, which makes the blocked read fail
+immediately.
+
+The thread reading a stream runs it inside an abort scope (abort_scope), and
+every provider response opened by that thread registers itself with the scope
+while it is being read. Scopes created on a thread that is itself inside a
+scope are nested, so aborting the outer scope aborts them too.
+"""
+
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+import httpx
+
+
+# The abort scope of the current thread
+_local = threading.local()
+
+
+def abort_response_stream(response_stream) -> None:
+    """
+    Close a provider response stream from any thread, shutting down its socket
+    so that a read blocked on it fails immediately.
+    """
+    # litellm wraps the provider stream, the native engines return it directly
+    stream = getattr(response_stream, 'completion_stream', response_stream)
+    response = getattr(stream, 'response', None) or getattr(stream, '_response', None)
+    if isinstance(response, httpx.Response):
+        network_stream = response.extensions.get('network_stream')
+        sock = network_stream.get_extra_info('socket') if network_stream is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    close = getattr(stream, 'close', None)
+    if close:
+        try:
+            close()
+        except Exception:
+            # e.g. a generator that is being read by the other thread
+            pass
+
+
+class StreamAbortScope:
+    """
+    The provider streams being read on behalf of a background stream reader.
+    """
+
+    def __init__(self, parent: Optional['StreamAbortScope'] = None):
+        """
+        Initialize the scope.
+
+        Args:
+            parent: Enclosing scope, aborting it aborts this scope
+        """
+        self._closers: List[Callable[[], None]] = []
+        self._aborted = False
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent.add(self.abort)
+
+    @property
+    def aborted(self) -> bool:
+        return self._aborted
+
+    def add(self, closer: Callable[[], None]) -> None:
+        """
+        Register a closer, called right away if the scope was already aborted.
+        """
+        with self._lock:
+            if not self._aborted:
+                self._closers.append(closer)
+                return
+        closer()
+
+    def remove(self, closer: Callable[[], None]) -> None:
+        """
+        Unregister a closer once its stream has been read or closed.
+        """
+        with self._lock:
+            if closer in self._closers:
+                self._closers.remove(closer)
+
+    def abort(self) -> None:
+        """
+        Close every registered stream.
+        """
+        with self._lock:
+            if self._aborted:
+                return
+            self._aborted = True
+            closers, self._closers = self._closers, []
+
+        for closer in closers:
+            try:
+                closer()
+            except Exception:
+                pass
+
+
+def current_abort_scope() -> Optional[StreamAbortScope]:
+    """
+    Get the abort scope of the current thread, None outside a scope.
+    """
+    return getattr(_local, 'scope', None)
+
+
+@contextmanager
+def abort_scope(scope: StreamAbortScope):
+    """
+    Run the enclosed code, on the current thread, inside an abort scope.
+    """
+    previous = current_abort_scope()
+    _local.scope = scope
+    try:
+        yield scope
+    finally:
+        _local.scope = previous
@@ -0,0 +1,123 @@
+"""
+LLM Stream Deadlines Service
+
+This service bounds how long a generation waits on a provider stream. The
+provider iterator is read on a background thread and the generation gives up
+with StreamStallError when the first token does not arrive within the first
+token deadline, or when no new chunk arrives within the stall deadline once
+the stream has started. When a deadline expires the upstream response is
+closed (see llm_stream_abort), so the reader thread releases its connection
+and admission slot before the generation retries or falls back.
+
+Deadlines are configured per LLM (LLM.first_token_timeout and
+LLM.stall_timeout, 0 disables a deadline); retries are configured in
+settings.LLM_STREAM_DEADLINES (see root/settings.py).
+"""
+
+import queue
+import threading
+from typing import Callable, Iterator, Optional
+from .llm_stream_abort import StreamAbortScope, abort_scope, current_abort_scope
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Markers put on the queue by the reader thread
+_STREAM_END = object()
+
+# Seconds to wait for the reader thread to release the stream after a deadline
+READER_RELEASE_SECONDS = 1.0
+
+
+class StreamStallError(TimeoutError):
+    """
+    Raised when a provider stream misses its first token or stall deadline.
+    """
+
+    status_code = 504
+
+    def __init__(self, message: str, first_token: bool):
+        super().__init__(message)
+        self.first_token = first_token
+
+
+def iter_with_deadlines(model_name: str, stream_factory: Callable[[], Iterator[str]],
+                        first_token_timeout: Optional[float], stall_timeout: Optional[float]) -> Iterator[str]:
+    """
+    Yield the chunks of a stream, enforcing the first token and stall deadlines.
+
+    Args:
+        model_name: Model name of the LLM (provider/model), for logging
+        stream_factory: Callable returning the content iterator
+        first_token_timeout: Seconds to wait for the first chunk (None or 0 to wait indefinitely)
+        stall_timeout: Seconds to wait between chunks (None or 0 to wait indefinitely)
+
+    Yields:
+        The chunks of the stream
+
+    Raises:
+        StreamStallError: If a deadline is missed
+    """
+    if not first_token_timeout and not stall_timeout:
+        yield from stream_factory()
+        return
+
+    chunks = queue.Queue()
+    stopped = threading.Event()
+    reader_scope = StreamAbortScope(current_abort_scope())
+
+    def read():
+        iterator = None
+        with abort_scope(reader_scope):
+            try:
+                iterator = stream_factory()
+                for content in iterator:
+                    if stopped.is_set():
+                        break
+                    chunks.put(content)
+                chunks.put(_STREAM_END)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                # closing the generator releases the upstream connection of an abandoned stream
+                close = getattr(iterator, 'close', None)
+                if close:
+                    try:
+                        close()
+                    except Exception:
+                        pass
+
+    reader = threading.Thread(target=read, name='llm-stream-reader', daemon=True)
+    reader.start()
+
+    first_token = True
+    try:
+        while True:
+            timeout = (first_token_timeout if first_token else stall_timeout) or None
+            try:
+                item = chunks.get(timeout=timeout)
+            except queue.Empty:
+                if first_token:
+                    message = f"No response from {model_name} within {timeout:g}s"
+                else:
+                    message = f"Response from {model_name} stalled for {timeout:g}s"
+                logger.warning(f"LLM_STREAM_DEADLINE: {message}")
+                # close the upstream stream so a retry or fallback does not wait for its slot
+                stopped.set()
+                reader_scope.abort()
+                reader.join(READER_RELEASE_SECONDS)
+                raise StreamStallError(message, first_token)
+
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+
+            first_token = False
+            yield item
+    finally:
+        # a stream abandoned by the caller is closed without waiting for its next chunk
+        stopped.set()
+        reader_scope.abort()
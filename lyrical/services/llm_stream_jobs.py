@@ -0,0 +1,198 @@
+"""
+LLM Stream Jobs Service
+
+This service makes generation streams resumable. The upstream LLM stream of a
+resumable generation runs to completion in a background thread, whatever
+happens to the client connection, so the assistant message is always saved.
+Every emitted NDJSON line is buffered in memory and flushed periodically to a
+GenerationJob record identified by a stream ID, which is returned to the
+client in the X-Stream-ID response header. A client that lost its connection
+reconnects to api_gen_resume with the stream ID and the number of lines it
+already received to replay the lines it missed and follow the rest.
+
+Configuration is read from settings.LLM_RESUMABLE_STREAMS (see root/settings.py).
+"""
+
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Any, Callable, Iterator, Optional, Tuple
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .llm_singleflight import InFlightStream
+from ..models import GenerationJob, Song, User
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default resumable stream configuration, overridden by settings.LLM_RESUMABLE_STREAMS
+DEFAULT_RESUMABLE_CONFIG = {
+    'ENABLED': True,
+    'PROMPT_NAMES': ['song_lyrics', 'song_lyrics_section', 'song_styles', 'song_styles_batch'],
+    'FLUSH_SECONDS': 2.0,
+    'STALE_SECONDS': 120,
+    'RETENTION_SECONDS': 3600,
+}
+
+
+class StreamJobRunner:
+    """
+    Runs resumable generation streams in background threads.
+
+    Features:
+    - Upstream streams continue to completion after a client disconnect
+    - In-memory line buffer for clients attached to this worker
+    - Periodic flush of the emitted lines to the GenerationJob record
+    - Replay from any line offset, from memory or from the database
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the runner.
+
+        Args:
+            config: Resumable stream configuration, merged over DEFAULT_RESUMABLE_CONFIG
+        """
+        self.config = {**DEFAULT_RESUMABLE_CONFIG, **(config or {})}
+        # the jobs running in this worker and their streams, by stream ID
+        self._streams: Dict[str, Tuple[GenerationJob, InFlightStream]] = {}
+        self._lock = threading.Lock()
+
+    def is_enabled_for(self, prompt_name: str) -> bool:
+        """
+        Check if generations for a prompt name are resumable.
+        """
+        return bool(self.config.get('ENABLED')) and prompt_name in (self.config.get('PROMPT_NAMES') or [])
+
+    def start(self, user: User, song_id: Optional[int], prompt_name: str,
+              stream_factory: Callable[[], Iterator[str]]) -> str:
+        """
+        Create a generation job and start running its stream in the background.
+
+        Args:
+            user: User running the generation
+            song_id: ID of the song being generated for, if any
+            prompt_name: Prompt name of the generation
+            stream_factory: Callable returning the NDJSON line iterator of the generation
+
+        Returns:
+            The stream ID of the job
+        """
+        self._delete_expired_jobs()
+
+        song = Song.objects.filter(id=song_id, user=user).first() if song_id else None
+        job = GenerationJob.objects.create(user=user, song=song, prompt_name=prompt_name)
+        stream_id = str(job.stream_id)
+
+        flight = InFlightStream(stream_id)
+        with self._lock:
+            self._streams[stream_id] = (job, flight)
+
+        thread = threading.Thread(
+            target=self._run,
+            args=(job, flight, stream_factory),
+            name=f"llm-stream-{stream_id[:8]}",
+            daemon=True,
+        )
+        thread.start()
+
+        logger.info(f"LLM_STREAM_JOBS: Started resumable stream {stream_id} for '{prompt_name}'")
+        return stream_id
+
+    def _run(self, job: GenerationJob, flight: InFlightStream, stream_factory: Callable[[], Iterator[str]]) -> None:
+        """
+        Run the stream to completion, publishing and periodically flushing every line.
+        """
+        status = 'completed'
+        flushed_at = time.monotonic()
+        try:
+            for line in stream_factory():
+                flight.publish(line)
+                if time.monotonic() - flushed_at >= self.config['FLUSH_SECONDS']:
+                    self._flush(job, flight, 'running')
+                    flushed_at = time.monotonic()
+        except Exception as e:
+            status = 'failed'
+            logger.error(f"LLM_STREAM_JOBS: Stream {job.stream_id} failed: {e}")
+        finally:
+            try:
+                self._flush(job, flight, status)
+            except Exception as e:
+                logger.error(f"LLM_STREAM_JOBS: Failed to save stream {job.stream_id}: {e}")
+            with self._lock:
+                self._streams.pop(flight.key, None)
+            flight.finish()
+            # the thread's database connection is not managed by a request
+            connection.close()
+
+    def _flush(self, job: GenerationJob, flight: InFlightStream, status: str) -> None:
+        lines = list(flight.lines)
+        job.output = ''.join(lines)
+        job.line_count = len(lines)
+        job.status = status
+        job.save(update_fields=['output', 'line_count', 'status', 'updated_at'])
+
+    def replay(self, stream_id: str, user: User, offset: int = 0) -> Optional[Iterator[str]]:
+        """
+        Get the lines of a stream from an offset, following the stream until it finishes.
+
+        Args:
+            stream_id: Stream ID of the job
+            user: User requesting the replay, must own the job
+            offset: Number of lines the client already received
+
+        Returns:
+            Line iterator, or None if the job does not exist
+        """
+        # a job running in this worker is followed from memory, its record lags behind by up to FLUSH_SECONDS
+        with self._lock:
+            job, flight = self._streams.get(str(stream_id), (None, None))
+        if flight is not None and job.user_id == user.id:
+            return flight.subscribe(offset)
+
+        job = GenerationJob.objects.filter(stream_id=stream_id, user=user).first()
+        if job is None:
+            return None
+        return self._replay_from_database(job, offset)
+
+    def _replay_from_database(self, job: GenerationJob, offset: int) -> Iterator[str]:
+        """
+        Replay a job from its record, polling while another worker is still running it.
+        """
+        while True:
+            lines = job.output.splitlines(keepends=True)
+            yield from lines[offset:]
+            offset = max(offset, len(lines))
+
+            if job.status != 'running':
+                return
+            # a job that stopped updating was abandoned by a worker that went away
+            if timezone.now() - job.updated_at > timedelta(seconds=self.config['STALE_SECONDS']):
+                logger.warning(f"LLM_STREAM_JOBS: Stream {job.stream_id} is stale, ending replay")
+                return
+            time.sleep(self.config['FLUSH_SECONDS'])
+            job.refresh_from_db()
+
+    def _delete_expired_jobs(self) -> None:
+        expired_before = timezone.now() - timedelta(seconds=self.config['RETENTION_SECONDS'])
+        GenerationJob.objects.filter(updated_at__lt=expired_before).delete()
+
+
+# Module-level runner shared by all generators in this worker
+_stream_job_runner = None
+_stream_job_runner_lock = threading.Lock()
+
+
+def get_stream_job_runner() -> StreamJobRunner:
+    """
+    Get the worker-wide stream job runner, creating it from settings on first use.
+    """
+    global _stream_job_runner
+    if _stream_job_runner is None:
+        with _stream_job_runner_lock:
+            if _stream_job_runner is None:
+                _stream_job_runner = StreamJobRunner(getattr(settings, 'LLM_RESUMABLE_STREAMS', None))
+    return _stream_job_runner
@@ -0,0 +1,243 @@
+"""
+Song Name Pool Service
+
+This service keeps a per-user pool of pre-generated song names, so that the
+names page can show new names without waiting for the LLM. Names in the pool
+were generated with the user's default name filters (the song_name_* fields
+on User); a request with exactly those filters and no custom request takes its
+names from the pool, any other request is generated as usual.
+
+After names were served from the pool it is refilled in a background thread
+when it holds fewer than LOW_WATERMARK names, with REFILL_COUNT names per LLM
+call until it holds POOL_SIZE names. Names are deduplicated (case-insensitively)
+against the pool and the user's songs. When the user changes their default
+filters the pool is discarded. Pools are held in memory by each worker process
+and are lost when it restarts.
+
+Configuration is read from settings.SONG_NAME_POOL (see root/settings.py).
+"""
+
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection
+from ..models import Song, User
+from ..logging_config import get_logger
+
+
+logger = get_logger('services')
+
+
+# Default pool configuration, overridden by settings.SONG_NAME_POOL
+DEFAULT_NAME_POOL_CONFIG = {
+    'ENABLED': False,
+    'POOL_SIZE': 60,
+    'LOW_WATERMARK': 40,
+    'REFILL_COUNT': 20,
+    'MAX_REFILL_CALLS': 5,
+}
+
+# Request parameters of api_gen_song_names and the User fields holding their defaults
+DEFAULT_FILTER_FIELDS = {
+    'include_themes': 'song_name_theme_inc',
+    'exclude_themes': 'song_name_theme_exc',
+    'include_words': 'song_name_words_inc',
+    'exclude_words': 'song_name_words_exc',
+    'starts_with': 'song_name_starts_with',
+    'ends_with': 'song_name_ends_with',
+    'min_words': 'song_name_length_min',
+    'max_words': 'song_name_length_max',
+}
+
+
+def get_default_filters(user: User) -> Dict[str, Any]:
+    """
+    Get the user's default name filters as api_gen_song_names parameters.
+    """
+    filters = {}
+    for param, field in DEFAULT_FILTER_FIELDS.items():
+        value = getattr(user, field)
+        filters[param] = value.strip() if isinstance(value, str) else value
+    return filters
+
+
+class SongNamePool:
+    """
+    Per-user pools of pre-generated song names.
+
+    Features:
+    - Names generated with the user's default filters, discarded when they change
+    - Case-insensitive deduplication against the pool and the user's songs
+    - Background refill below the low watermark, one refill per user at a time
+    - Counters for names served from the pool and refill calls
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            config: Pool configuration, merged over DEFAULT_NAME_POOL_CONFIG
+        """
+        self.config = {**DEFAULT_NAME_POOL_CONFIG, **(config or {})}
+        self._pools: Dict[int, Tuple[tuple, List[str]]] = {}
+        self._refilling = set()
+        self._lock = threading.Lock()
+        self.counters = {'served': 0, 'missed': 0, 'refill_calls': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('ENABLED'))
+
+    def matches_defaults(self, user: User, params: Dict[str, Any]) -> bool:
+        """
+        Check whether api_gen_song_names parameters are the user's default filters.
+        """
+        if params.get('prompt_name') != 'song_names' or params.get('custom_request'):
+            return False
+        return all(params.get(param) == value for param, value in get_default_filters(user).items())
+
+    def _get_names(self, user: User, filters: Dict[str, Any]) -> List[str]:
+        """
+        Get the user's pooled names for the filters, resetting the pool if the filters changed.
+        Must be called with the lock held.
+        """
+        signature = tuple(sorted(filters.items()))
+        pool = self._pools.get(user.id)
+        if pool is None or pool[0] != signature:
+            pool = (signature, [])
+            self._pools[user.id] = pool
+        return pool[1]
+
+    def size(self, user: User) -> int:
+        """
+        Get the number of names pooled for the user's current default filters.
+        """
+        with self._lock:
+            return len(self._get_names(user, get_default_filters(user)))
+
+    def get_pooled_names(self, user: User) -> List[str]:
+        """
+        Get a copy of the names pooled for the user's current default filters.
+        """
+        with self._lock:
+            return list(self._get_names(user, get_default_filters(user)))
+
+    def take(self, user: User, count: int) -> Optional[List[str]]:
+        """
+        Take names from the user's pool.
+
+        Args:
+            user: User requesting names with their default filters
+            count: Number of names requested
+
+        Returns:
+            The names, or None if the pool holds fewer than count names
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            names = self._get_names(user, get_default_filters(user))
+            if len(names) < count:
+                self.counters['missed'] += 1
+                return None
+            taken = names[:count]
+            del names[:count]
+            self.counters['served'] += count
+
+        logger.info(f"SONG_NAME_POOL: Served {count} names to user '{user.username}' from the pool ({len(names)} left)")
+        return taken
+
+    def add(self, user: User, filters: Dict[str, Any], new_names: List[str]) -> int:
+        """
+        Add generated names to the user's pool, skipping duplicates and existing songs.
+
+        Returns:
+            Number of names added
+        """
+        existing = {name.lower() for name in Song.objects.filter(user=user).values_list('name', flat=True)}
+        added = 0
+        with self._lock:
+            pool = self._pools.get(user.id)
+            if pool is not None and pool[0] != tuple(sorted(filters.items())):
+                # the user changed their default filters while the names were generated
+                return 0
+            names = self._get_names(user, filters)
+            existing.update(name.lower() for name in names)
+            for name in new_names:
+                if name and name.lower() not in existing and len(names) < self.config['POOL_SIZE']:
+                    existing.add(name.lower())
+                    names.append(name)
+                    added += 1
+        return added
+
+    def refill_async(self, user: User, generate_names: Callable[[User, int], List[str]]) -> bool:
+        """
+        Start refilling the user's pool in the background if it is below the low watermark.
+
+        Args:
+            user: User whose pool to refill
+            generate_names: Callable generating names with the user's default filters
+
+        Returns:
+            True if a refill was started
+        """
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            if user.id in self._refilling:
+                return False
+            if len(self._get_names(user, get_default_filters(user))) >= self.config['LOW_WATERMARK']:
+                return False
+            self._refilling.add(user.id)
+
+        threading.Thread(target=self._refill, args=(user, generate_names), name='song-name-pool', daemon=True).start()
+        return True
+
+    def _refill(self, user: User, generate_names: Callable[[User, int], List[str]]) -> None:
+        """
+        Generate names until the pool is full, or a call adds no new names.
+        """
+        filters = get_default_filters(user)
+        try:
+            for _ in range(self.config['MAX_REFILL_CALLS']):
+                with self._lock:
+                    self.counters['refill_calls'] += 1
+                added = self.add(user, filters, generate_names(user, self.config['REFILL_COUNT']))
+                size = self.size(user)
+                logger.debug(f"SONG_NAME_POOL: Added {added} names to the pool of user '{user.username}' ({size} pooled)")
+                if not added or size >= self.config['POOL_SIZE']:
+                    break
+        except Exception as e:
+            logger.error(f"SONG_NAME_POOL: Failed to refill the pool of user '{user.username}': {e}")
+        finally:
+            with self._lock:
+                self._refilling.discard(user.id)
+            # the thread's database connection is not managed by a request
+            connection.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the pool counters and the number of names pooled per user.
+        """
+        with self._lock:
+            return {**self.counters, 'pooled': {user_id: len(pool[1]) for user_id, pool in self._pools.items()}}
+
+
+# Module-level pool shared by all requests in this worker
+_name_pool = None
+_name_pool_lock = threading.Lock()
+
+
+def get_song_name_pool() -> SongNamePool:
+    """
+    Get the worker-wide song name pool, creating it from settings on first use.
+    """
+    global _name_pool
+    if _name_pool is None:
+        with _name_pool_lock:
+            if _name_pool is None:
+                _name_pool = SongNamePool(getattr(settings, 'SONG_NAME_POOL', None))
+    return _name_pool
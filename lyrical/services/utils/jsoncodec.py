@@ -0,0 +1,75 @@
+import json
+from typing import Any, Union
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Name of the JSON backend in use, 'orjson' when it is installed, else 'json'
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+# orjson.JSONDecodeError is a subclass of json.JSONDecodeError, so this catches both
+JSONDecodeError = json.JSONDecodeError
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+# stdlib encoder arguments producing the same compact UTF-8 output as orjson
+_JSON_OPTIONS = {'cls': DjangoJSONEncoder, 'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def dumps(obj: Any) -> str:
+    """
+    Encode an object as a compact JSON string using the fastest available backend.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode('utf-8')
+        except TypeError:
+            # fall back to the stdlib for types orjson does not support
+            pass
+    return json.dumps(obj, **_JSON_OPTIONS)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """
+    Encode an object as UTF-8 JSON bytes using the fastest available backend.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return json.dumps(obj, **_JSON_OPTIONS).encode('utf-8')
+
+
+def loads(text: Union[str, bytes]) -> Any:
+    """
+    Decode a JSON string or bytes using the fastest available backend.
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class JsonResponse(HttpResponse):
+    """
+    Drop-in replacement for django.http.JsonResponse that encodes with the
+    fast JSON backend when available.
+
+    Args:
+        data: Data to be serialized, must be a dict unless safe is False
+        safe: Only allow dict objects to be serialized (default True)
+    """
+
+    def __init__(self, data: Any, safe: bool = True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the safe parameter to False."
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps_bytes(data), **kwargs)
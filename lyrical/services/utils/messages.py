@@ -9,6 +9,43 @@ from ...models import Message, User
 logger = logging.getLogger('services')
 
 
+# Marker telling the provider to cache the prompt prefix up to and including the marked block
+CACHE_CONTROL_MARKER = {"type": "ephemeral"}
+
+
+def add_cache_control(messages: List[dict]) -> List[dict]:
+    """
+    Mark the stable prefix of a conversation for provider prompt caching.
+    
+    The system prompt and the conversation history come before the new user
+    message, so they form a prefix that is identical between follow-ups. Cache
+    breakpoints are placed on the last system message and on the last message
+    before the final user message.
+    
+    Args:
+        messages: Messages as returned by MessageBuilder.get()
+        
+    Returns:
+        New list of messages with cache-control content blocks at the breakpoints
+    """
+    breakpoints = set()
+    for index, message in enumerate(messages):
+        if message["role"] == "system":
+            breakpoints = {index}
+    if len(messages) > 2 and messages[-1]["role"] == "user":
+        breakpoints.add(len(messages) - 2)
+    
+    marked_messages = []
+    for index, message in enumerate(messages):
+        if index in breakpoints and isinstance(message["content"], str):
+            message = {
+                **message,
+                "content": [{"type": "text", "text": message["content"], "cache_control": CACHE_CONTROL_MARKER}]
+            }
+        marked_messages.append(message)
+    return marked_messages
+
+
 class MessageBuilder:
     def __init__(self, system_prompt=None):
         self.messages = []
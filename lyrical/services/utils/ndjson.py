@@ -0,0 +1,70 @@
+import unicodedata
+from typing import List
+
+
+def normalize_chunk(text: str) -> str:
+    """
+    Convert a streamed text chunk to its closest ASCII equivalent.
+    Chunks that are already ASCII are returned unchanged without NFKD normalization.
+    """
+    if text.isascii():
+        return text
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+class NDJSONFramer:
+    """
+    Incremental line framer for streamed NDJSON text.
+
+    Partial lines are buffered in a list and only the newly received chunk is
+    scanned for newlines, so the cost of framing is linear in the size of the
+    response regardless of how the provider splits it into chunks.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self.chunk_count = 0
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Add a chunk of streamed text.
+
+        Args:
+            chunk: Text chunk from the provider
+
+        Returns:
+            List of complete lines (without the newline) finished by this chunk
+        """
+        self.chunk_count += 1
+
+        # most small chunks only extend the buffered line
+        if '\n' not in chunk:
+            self._parts.append(chunk)
+            return []
+
+        # the first line completes whatever has been buffered so far
+        newline_pos = chunk.find('\n')
+        self._parts.append(chunk[:newline_pos])
+        lines = [''.join(self._parts)]
+        self._parts.clear()
+
+        # any further complete lines are wholly inside this chunk
+        start = newline_pos + 1
+        newline_pos = chunk.find('\n', start)
+        while newline_pos != -1:
+            lines.append(chunk[start:newline_pos])
+            start = newline_pos + 1
+            newline_pos = chunk.find('\n', start)
+
+        if start < len(chunk):
+            self._parts.append(chunk[start:])
+
+        return lines
+
+    def flush(self) -> str:
+        """
+        Return and clear any buffered text that was not terminated by a newline.
+        """
+        remaining = ''.join(self._parts)
+        self._parts.clear()
+        return remaining
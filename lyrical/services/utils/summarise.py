@@ -3,9 +3,11 @@ import os
 from typing import List, Optional, Tuple
 from django.db import transaction
 import tiktoken
-from litellm import completion
 from ...models import Message, Song, User
 from .apikey import get_user_api_key
+from ..llm_client_pool import get_client_pool
+from ..llm_engines import get_engine
+from ..llm_admission import get_admission_controller, PRIORITY_SUMMARISE
 
 
 logger = logging.getLogger('services')
@@ -212,10 +214,16 @@ class ChatSummarisationService:
             
             if user_api_key and len(user_api_key) > 0:
                 llm_params["api_key"] = user_api_key
+
+            # Reuse the worker's persistent connection to the provider, native engines use the pool themselves
+            engine = get_engine(user.llm_model_summarise.provider.engine)
+            if engine.uses_client_kwargs:
+                llm_params.update(get_client_pool().completion_kwargs(user.llm_model_summarise.provider.internal_name, user_api_key))
             
             logger.info(f"Calling summarisation model {model_name} for {message_type} conversation")
             
-            response = completion(**llm_params)
+            with get_admission_controller().admit(user.id, user.llm_model_summarise.provider.internal_name, PRIORITY_SUMMARISE):
+                response = engine.completion(**llm_params)
             
             if response.choices and response.choices[0].message:
                 summary = response.choices[0].message.content.strip()
@@ -9,11 +9,12 @@
  * @param {number} [updates.llm_model_id] - The LLM model ID to set
  * @param {number} [updates.llm_temperature] - The temperature setting (0.0 to 1.0)
  * @param {number} [updates.llm_max_tokens] - The max tokens setting
+ * @param {boolean} [updates.llm_auto_routing] - Whether small tasks are routed to a fast model
  * @returns {Promise<string>} Promise that resolves to the user's selected LLM ID
  */
 export function apiUserLLM(updates = {}) {
     // Accept updates object with optional parameters
-    const { llm_model_id: llmModelId, llm_temperature: llmTemperature, llm_max_tokens: llmMaxTokens } = updates;
+    const { llm_model_id: llmModelId, llm_temperature: llmTemperature, llm_max_tokens: llmMaxTokens, llm_auto_routing: llmAutoRouting } = updates;
     
     // Get CSRF token
     const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
@@ -23,6 +24,7 @@ export function apiUserLLM(updates = {}) {
     if (llmModelId) requestBody.llm_model_id = llmModelId;
     if (llmTemperature !== undefined) requestBody.llm_temperature = llmTemperature;
     if (llmMaxTokens) requestBody.llm_max_tokens = llmMaxTokens;
+    if (llmAutoRouting !== undefined) requestBody.llm_auto_routing = llmAutoRouting;
 
     // Send the request to the server
     return fetch('/api_user_llm', {
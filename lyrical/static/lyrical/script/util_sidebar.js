@@ -23,6 +23,7 @@ document.addEventListener('DOMContentLoaded', initSidebar);
 export function initSidebar() {
     // Initialize all LLM parameter controls
     initModelSelector();
+    initAutoRoutingToggle();
     initTemperatureSlider();
     initMaxTokensSlider();
 }
@@ -41,6 +42,17 @@ function initModelSelector() {
     modelSelect.dataset.previousValue = modelSelect.value;
 }
 
+/**
+ * Initialize the automatic model routing toggle
+ */
+function initAutoRoutingToggle() {
+    const autoRoutingToggle = document.querySelector('#sidebar-auto-routing-toggle');
+    if (!autoRoutingToggle) return;
+
+    // Bind change event to auto routing toggle
+    autoRoutingToggle.addEventListener('change', handleAutoRoutingChange);
+}
+
 /**
  * Initialize the temperature range slider
  */
@@ -101,6 +113,27 @@ async function handleModelChange(event) {
     }
 }
 
+/**
+ * Handle automatic model routing toggle change
+ * @param {Event} event - The change event from the auto routing toggle
+ */
+async function handleAutoRoutingChange(event) {
+    const element = event.target;
+    
+    try {
+        // Call API to update whether small tasks are routed to a fast model
+        await apiUserLLM({ llm_auto_routing: element.checked });
+    } catch (error) {
+        console.error('Error updating LLM auto routing:', error);
+        
+        // Revert the toggle on error
+        element.checked = !element.checked;
+        
+        // Show error toast to user
+        toastSystem.showError('Failed to update model routing. Please try again.');
+    }
+}
+
 /**
  * Handle temperature slider change
  * @param {Event} event - The input event from the temperature slider
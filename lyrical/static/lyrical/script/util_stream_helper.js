@@ -23,6 +23,10 @@ export class StreamHelper {
         };
         this.csrfTokenSelector = options.csrfTokenSelector || '[name=csrfmiddlewaretoken]';
         this.abortController = null;
+        this.maxResumeAttempts = options.maxResumeAttempts ?? 3;
+        this.streamId = null;
+        this.linesReceived = 0;
+        this.resumeAttempts = 0;
     }
 
     /**
@@ -64,6 +68,11 @@ export class StreamHelper {
         // Store request params for later use (e.g., in completion handler)
         this.lastRequestParams = requestSpecificParams;
 
+        // Reset the resumable stream state
+        this.streamId = null;
+        this.linesReceived = 0;
+        this.resumeAttempts = 0;
+
         this.callbacks.onPreRequest();
 
         const finalParams = this._buildFinalParams(requestSpecificParams);
@@ -140,9 +149,41 @@ export class StreamHelper {
         if (!response.body) {
             throw { type: 'network', message: 'Response body is missing.', response: response };
         }
+        // Resumable generations identify their stream so a dropped connection can be resumed
+        this.streamId = response.headers.get('X-Stream-ID') || this.streamId;
         return this._processStream(response.body);
     }
 
+    /**
+     * Checks if a stream that failed while reading can be resumed
+     * @param {Error} error - Error object
+     * @returns {boolean} True if the stream should be resumed
+     * @private
+     */
+    _canResume(error) {
+        return error.name !== 'AbortError' && this.streamId !== null && this.resumeAttempts < this.maxResumeAttempts;
+    }
+
+    /**
+     * Reconnects to a resumable stream, replaying the lines that were missed
+     * @returns {Promise} Promise that resolves after processing the resumed stream
+     * @private
+     */
+    async _resumeStream() {
+        this.resumeAttempts++;
+        console.warn(`Stream connection lost, resuming stream ${this.streamId} from line ${this.linesReceived} (attempt ${this.resumeAttempts})`);
+
+        // Back off a little before reconnecting
+        await new Promise(resolve => setTimeout(resolve, 1000 * this.resumeAttempts));
+
+        const params = new URLSearchParams({ stream_id: this.streamId, offset: this.linesReceived });
+        const fetchOptions = this._buildFetchOptions(this._getCsrfToken(), this.abortController.signal);
+
+        return fetch(`/api_gen_resume?${params.toString()}`, fetchOptions)
+            .then(response => this._handleResponse(response))
+            .catch(error => this._handleError(error));
+    }
+
     /**
      * Handles server error responses
      * @param {Response} response - Fetch response with error
@@ -210,6 +251,7 @@ export class StreamHelper {
         const reader = readableStream.getReader();
         const decoder = new TextDecoder();
         let accumulatedData = '';
+        let resuming = false;
 
         try {
             while (true) {
@@ -224,13 +266,23 @@ export class StreamHelper {
                 accumulatedData = this._processLines(accumulatedData);
             }
         } catch (error) {
-            this._handleStreamError(error);
+            if (this._canResume(error)) {
+                resuming = true;
+            } else {
+                this._handleStreamError(error);
+            }
         } finally {
             reader.releaseLock();
-            if (!this.abortController || !this.abortController.signal.aborted) {
-                this._handleCompletion();
+            if (!resuming) {
+                if (!this.abortController || !this.abortController.signal.aborted) {
+                    this._handleCompletion();
+                }
+                this.abortController = null;
             }
-            this.abortController = null;
+        }
+
+        if (resuming) {
+            return this._resumeStream();
         }
     }
 
@@ -269,6 +321,7 @@ export class StreamHelper {
             accumulatedData = accumulatedData.substring(newlineIndex + 1);
 
             if (line.trim() !== '') {
+                this.linesReceived++;
                 this._parseLine(line);
             }
         }
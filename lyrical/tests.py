@@ -1,3 +1,425 @@
-from django.test import TestCase
+import socket
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+import httpx
+from django.test import SimpleTestCase
+from .services.llm_admission import AdmissionController, AdmissionTimeout, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from .services.llm_engines import (
+    iter_sse_events, LLMEngine, HTTPEngine, OpenAIEngine, AnthropicEngine, OllamaEngine, LLMEngineError,
+)
+from .services.llm_generation_registry import GenerationRegistry
+from .services.llm_generator import LLMGenerator
+from .services.llm_continuation import ContinuationFramer
+from .services.llm_hedging import HedgingPolicy
+from .services.llm_response_cache import make_cache_key
+from .services.utils import jsoncodec
+from .services.utils.ndjson import NDJSONFramer
 
-# Create your tests here.
+
+# Streamed responses of each provider, as the lines of the response body
+OPENAI_STREAM = """\
+: keep-alive
+
+data: {"choices": [{"index": 0, "delta": {"role": "assistant"}}]}
+
+data: {"choices": [{"index": 0, "delta": {"content": "{\\"word\\": "}}, {"index": 1, "delta": {"content": "{\\"word\\": \\"b\\"}"}}]}
+
+data: {"choices": [{"index": 0, "delta": {"content": "\\"a\\"}"}}]}
+
+data: {"choices": [], "usage": {"prompt_tokens": 12, "completion_tokens": 8}}
+
+data: [DONE]
+
+""".splitlines()
+
+ANTHROPIC_STREAM = """\
+event: message_start
+data: {"type": "message_start", "message": {"usage": {"input_tokens": 10, "cache_read_input_tokens": 100, "output_tokens": 1}}}
+
+event: content_block_start
+data: {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+
+event: ping
+data: {"type": "ping"}
+
+event: content_block_delta
+data: {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "{\\"word\\": "}}
+
+event: content_block_delta
+data: {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "\\"a\\"}"}}
+
+event: message_delta
+data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 7}}
+
+event: message_stop
+data: {"type": "message_stop"}
+
+""".splitlines()
+
+OLLAMA_STREAM = """\
+{"message": {"role": "assistant", "content": "{\\"word\\": "}, "done": false}
+{"message": {"role": "assistant", "content": "\\"a\\"}"}, "done": false}
+
+{"message": {"role": "assistant", "content": ""}, "done": true, "prompt_eval_count": 9, "eval_count": 4}
+""".splitlines()
+
+
+def get_contents(chunks, index=0):
+    return ''.join(
+        choice.delta.content for chunk in chunks for choice in chunk.choices
+        if choice.index == index and choice.delta.content
+    )
+
+
+class SSEEventsTest(SimpleTestCase):
+
+    def test_events(self):
+        lines = ['event: first', 'data: one', '', ': comment', 'data:two', 'data: three', '', 'id: 1', '']
+        self.assertEqual(list(iter_sse_events(lines)), [('first', 'one'), (None, 'two\nthree')])
+
+    def test_event_without_trailing_blank_line(self):
+        self.assertEqual(list(iter_sse_events(['data: last'])), [(None, 'last')])
+
+    def test_value_keeps_colons(self):
+        self.assertEqual(list(iter_sse_events(['data: {"a": "b:c"}', ''])), [(None, '{"a": "b:c"}')])
+
+
+class JSONCodecTest(SimpleTestCase):
+
+    data = {"word": "café", "lines": [1, 2.5, None, True]}
+
+    def test_stdlib_fallback_matches_orjson(self):
+        expected = '{"word":"café","lines":[1,2.5,null,true]}'
+        self.assertEqual(jsoncodec.dumps(self.data), expected)
+        with mock.patch.object(jsoncodec, 'orjson', None):
+            self.assertEqual(jsoncodec.dumps(self.data), expected)
+            self.assertEqual(jsoncodec.dumps_bytes(self.data), expected.encode('utf-8'))
+
+
+class NDJSONFramerTest(SimpleTestCase):
+
+    text = '{"a": 1}\n{"b": 2}\n\n{"c": 3}'
+
+    def frame(self, chunk_size):
+        framer = NDJSONFramer()
+        lines = []
+        for i in range(0, len(self.text), chunk_size):
+            lines.extend(framer.feed(self.text[i:i + chunk_size]))
+        return lines, framer.flush()
+
+    def test_chunk_sizes(self):
+        for chunk_size in (1, 3, 16, len(self.text)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.frame(chunk_size), (['{"a": 1}', '{"b": 2}', ''], '{"c": 3}'))
+
+
+class CacheKeyTest(SimpleTestCase):
+
+    params = {"model": "openai/gpt-4o", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 100}
+
+    def test_sent_params_are_keyed(self):
+        key = make_cache_key(self.params)
+        for name, value in (("n", 2), ("top_p", 0.5), ("stream_options", {"include_usage": True})):
+            with self.subTest(name=name):
+                self.assertNotEqual(make_cache_key({**self.params, name: value}), key)
+
+    def test_credentials_and_clients_are_ignored(self):
+        self.assertEqual(make_cache_key({**self.params, "api_key": "secret", "client": object()}), make_cache_key(self.params))
+
+
+class ContinuationFramerTest(SimpleTestCase):
+
+    emitted = '{"1": "apple"}\n{"2": "ban'
+
+    def frame(self, emitted, continuation, chunk_size=5):
+        framer = ContinuationFramer(emitted)
+        texts = []
+        for i in range(0, len(continuation), chunk_size):
+            texts.extend(framer.feed(continuation[i:i + chunk_size]))
+        return texts + framer.flush()
+
+    def test_regenerated_prefix(self):
+        texts = self.frame(self.emitted, '{"1": "apple"}\n{"2": "banana"}\n{"3": "cherry"}\n')
+        self.assertEqual(texts, ['ana"}\n', '{"3": "cherry"}\n'])
+
+    def test_continued_tail(self):
+        texts = self.frame(self.emitted, 'ana"}\n{"3": "cherry"}')
+        self.assertEqual(self.emitted + ''.join(texts), '{"1": "apple"}\n{"2": "banana"}\n{"3": "cherry"}\n')
+
+    def test_repeated_lines(self):
+        texts = self.frame('{"1": "a"}\n{"2": "b"}\n', '{"1": "a"}\n{"2": "b"}\n{"3": "c"}\n{"3": "c"}\n')
+        self.assertEqual(texts, ['{"3": "c"}\n'])
+
+    def test_abandoned_tail(self):
+        texts = self.frame(self.emitted, '{"3": "cherry"}\n')
+        self.assertEqual(texts, ['\n', '{"3": "cherry"}\n'])
+
+
+class HedgingTest(SimpleTestCase):
+
+    def test_backup_starts_when_primary_fails(self):
+        def failing():
+            raise ConnectionError('primary down')
+            yield
+
+        winners = []
+        policy = HedgingPolicy({'ENABLED': True, 'DEFAULT_DELAY_SECONDS': 5})
+        started_at = time.monotonic()
+        contents = list(policy.stream('openai/a', failing, 'gemini/b', lambda: iter(['x', 'y']), on_winner=winners.append))
+        self.assertEqual(contents, ['x', 'y'])
+        self.assertEqual(winners, ['gemini/b'])
+        self.assertLess(time.monotonic() - started_at, 2.0)
+        self.assertEqual(policy.counters['backup_wins'], 1)
+
+
+class AdmissionTest(SimpleTestCase):
+
+    def make_controller(self, **config):
+        return AdmissionController({
+            'MAX_WAIT_SECONDS': 0.1,
+            'PRIORITY_MAX_WAIT_SECONDS': {},
+            'GLOBAL_CONCURRENCY': None,
+            'PROVIDER_CONCURRENCY': {},
+            'USER_CONCURRENCY': None,
+            'PRIORITY_CONCURRENCY': {},
+            **config,
+        })
+
+    def assertRejected(self, controller, user_id, provider_name):
+        with self.assertRaises(AdmissionTimeout) as context:
+            with controller.admit(user_id, provider_name):
+                pass
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(context.exception.retry_after, 0.1)
+
+    def test_user_limit(self):
+        controller = self.make_controller(USER_CONCURRENCY=1)
+        with controller.admit(1, 'openai'):
+            self.assertRejected(controller, 1, 'openai')
+            with controller.admit(2, 'openai'):
+                pass
+        self.assertEqual(controller.counters[PRIORITY_INTERACTIVE]['rejected'], 1)
+
+    def test_provider_limit(self):
+        controller = self.make_controller(PROVIDER_CONCURRENCY={'openai': 1})
+        with controller.admit(1, 'openai'):
+            self.assertRejected(controller, 2, 'openai')
+            with controller.admit(2, 'anthropic'):
+                pass
+
+    def test_global_limit(self):
+        controller = self.make_controller(GLOBAL_CONCURRENCY=1)
+        with controller.admit(1, 'openai'):
+            self.assertRejected(controller, 2, 'anthropic')
+
+    def test_waiter_admitted_when_slot_released(self):
+        controller = self.make_controller(GLOBAL_CONCURRENCY=1, MAX_WAIT_SECONDS=5)
+        admitted = threading.Event()
+
+        def wait():
+            with controller.admit(2, 'openai'):
+                admitted.set()
+
+        with controller.admit(1, 'openai'):
+            thread = threading.Thread(target=wait)
+            thread.start()
+            self.assertFalse(admitted.wait(0.1))
+        thread.join(5)
+        self.assertTrue(admitted.is_set())
+
+    def test_lower_priority_waiter_passed_over(self):
+        controller = self.make_controller(GLOBAL_CONCURRENCY=1, MAX_WAIT_SECONDS=5)
+        order = []
+
+        def wait(user_id, priority):
+            with controller.admit(user_id, 'openai', priority):
+                order.append(priority)
+
+        with controller.admit(1, 'openai'):
+            threads = []
+            for user_id, priority in ((2, PRIORITY_BATCH), (3, PRIORITY_INTERACTIVE)):
+                threads.append(threading.Thread(target=wait, args=(user_id, priority)))
+                threads[-1].start()
+                time.sleep(0.1)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, [PRIORITY_INTERACTIVE, PRIORITY_BATCH])
+
+    def test_slot_released_on_error(self):
+        controller = self.make_controller(GLOBAL_CONCURRENCY=1, USER_CONCURRENCY=1)
+        with self.assertRaises(ValueError):
+            with controller.admit(1, 'openai'):
+                raise ValueError('provider error')
+        self.assertEqual(controller.get_stats()['active'], 0)
+        with controller.admit(1, 'openai'):
+            pass
+
+
+class EngineStreamTest(SimpleTestCase):
+
+    def test_engines_are_abstract(self):
+        with self.assertRaises(TypeError):
+            LLMEngine()
+        with self.assertRaises(TypeError):
+            HTTPEngine()
+
+    def test_openai_stream(self):
+        chunks = list(OpenAIEngine().parse_stream(iter(OPENAI_STREAM)))
+        self.assertEqual(get_contents(chunks, 0), '{"word": "a"}')
+        self.assertEqual(get_contents(chunks, 1), '{"word": "b"}')
+        self.assertEqual(chunks[-1].usage, {"prompt_tokens": 12, "completion_tokens": 8})
+
+    def test_openai_stream_error(self):
+        with self.assertRaises(LLMEngineError):
+            list(OpenAIEngine().parse_stream(iter(['data: {"error": {"message": "overloaded"}}', ''])))
+
+    def test_anthropic_stream(self):
+        chunks = list(AnthropicEngine().parse_stream(iter(ANTHROPIC_STREAM)))
+        self.assertEqual(get_contents(chunks), '{"word": "a"}')
+        self.assertEqual(chunks[-1].usage, {
+            "prompt_tokens": 110,
+            "completion_tokens": 7,
+            "cache_read_input_tokens": 100,
+            "cache_creation_input_tokens": 0,
+        })
+
+    def test_anthropic_overloaded(self):
+        lines = ['event: error', 'data: {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}', '']
+        with self.assertRaises(LLMEngineError) as context:
+            list(AnthropicEngine().parse_stream(iter(lines)))
+        self.assertEqual(context.exception.status_code, 529)
+
+    def test_ollama_stream(self):
+        chunks = list(OllamaEngine().parse_stream(iter(OLLAMA_STREAM)))
+        self.assertEqual(get_contents(chunks), '{"word": "a"}')
+        self.assertEqual(chunks[-1].usage, {"prompt_tokens": 9, "completion_tokens": 4})
+
+
+class StubClientPool:
+    """
+    Client pool whose HTTP client answers every request with a fixed response.
+    """
+
+    def __init__(self, status_code, lines):
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(status_code, content='\n'.join(lines).encode())
+
+        self.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    def get_base_url(self, provider_name):
+        return 'http://stub'
+
+    def get_http_client(self, provider_name):
+        return self.client
+
+
+class EngineCompletionTest(SimpleTestCase):
+
+    params = {"model": "openai/gpt-4o", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 100, "n": 2}
+
+    def test_streamed_completion(self):
+        pool = StubClientPool(200, OPENAI_STREAM)
+        with mock.patch('lyrical.services.llm_engines.get_client_pool', return_value=pool):
+            chunks = list(OpenAIEngine().completion(**self.params, stream=True))
+        self.assertEqual(get_contents(chunks, 1), '{"word": "b"}')
+        self.assertEqual(str(pool.requests[0].url), 'http://stub/v1/chat/completions')
+        self.assertIn(b'"max_completion_tokens"', pool.requests[0].content)
+
+    def test_gemini_path(self):
+        pool = StubClientPool(200, OPENAI_STREAM)
+        with mock.patch('lyrical.services.llm_engines.get_client_pool', return_value=pool):
+            list(OpenAIEngine().completion(**{**self.params, "model": "gemini/gemini-2.0-flash"}, stream=True))
+        self.assertEqual(str(pool.requests[0].url), 'http://stub/v1beta/openai/chat/completions')
+
+    def test_complete_response(self):
+        pool = StubClientPool(200, ANTHROPIC_STREAM)
+        with mock.patch('lyrical.services.llm_engines.get_client_pool', return_value=pool):
+            response = AnthropicEngine().completion(**{**self.params, "model": "anthropic/claude"})
+        self.assertEqual(response.choices[0].message.content, '{"word": "a"}')
+
+    def test_http_error(self):
+        pool = StubClientPool(401, ['{"error": "invalid api key"}'])
+        with mock.patch('lyrical.services.llm_engines.get_client_pool', return_value=pool):
+            with self.assertRaises(LLMEngineError) as context:
+                OpenAIEngine().completion(**self.params, stream=True)
+        self.assertEqual(context.exception.status_code, 401)
+
+
+class BlockedStreamServer:
+    """
+    Local server that answers with the headers of a stream and then sends nothing.
+    """
+
+    def __init__(self):
+        self.socket = socket.create_server(('127.0.0.1', 0))
+        self.released = threading.Event()
+        self.connections = []
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.socket.getsockname()[1]}"
+
+    def serve(self):
+        connection, _ = self.socket.accept()
+        self.connections.append(connection)
+        connection.recv(65536)
+        connection.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        self.released.wait(30)
+
+    def close(self):
+        self.released.set()
+        for connection in self.connections:
+            connection.close()
+        self.socket.close()
+
+
+class StubGenerator(LLMGenerator):
+
+    def extract_parameters(self):
+        return {}
+
+    def get_prompt_name(self):
+        return 'song_words'
+
+    def get_message_type(self):
+        return 'word'
+
+    def get_song_id(self):
+        return None
+
+    def build_user_prompt_params(self):
+        return {}
+
+
+class GenerationCancelTest(SimpleTestCase):
+
+    def test_cancel_closes_blocked_stream(self):
+        server = BlockedStreamServer()
+        self.addCleanup(server.close)
+        client = httpx.Client()
+        self.addCleanup(client.close)
+        pool = mock.Mock(**{'get_base_url.return_value': server.base_url, 'get_http_client.return_value': client})
+
+        generator = StubGenerator(None)
+        generator.user = SimpleNamespace(id=0)
+        generator.generation = GenerationRegistry().register(SimpleNamespace(id=0, username='test'), None, 'song_words', 'openai/stub')
+        generator.llm_engines['openai/stub'] = OpenAIEngine()
+        params = {"model": "openai/stub", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+
+        # the stream never sends a chunk, only cancelling can end it
+        threading.Timer(0.2, generator.generation.cancel).start()
+        started_at = time.monotonic()
+        with mock.patch('lyrical.services.llm_engines.get_client_pool', return_value=pool):
+            try:
+                contents = list(generator._iter_provider_content(params))
+            except (httpx.HTTPError, LLMEngineError):
+                contents = []
+        self.assertEqual(contents, [])
+        self.assertLess(time.monotonic() - started_at, 2.0)
+        self.assertTrue(generator.generation.cancelled)
@@ -31,7 +31,10 @@ from .views.api_gen_song_lyrics import *
 from .views.api_gen_song_lyrics_section import *
 from .views.api_gen_song_names import *
 from .views.api_gen_song_styles import *
+from .views.api_gen_song_styles_batch import *
 from .views.api_gen_song_words import *
+from .views.api_gen_resume import *
+from .views.api_gen_cancel import *
 
 
 from .views.api_summarise_chat_history import *
@@ -83,7 +86,11 @@ urlpatterns = [
     path("api_gen_song_lyrics_section", api_gen_song_lyrics_section, name="api_gen_song_lyrics_section"),
     path("api_gen_song_names", api_gen_song_names, name="api_gen_song_names"),
     path("api_gen_song_styles", api_gen_song_styles, name="api_gen_song_styles"),
+    path("api_gen_song_styles_batch", api_gen_song_styles_batch, name="api_gen_song_styles_batch"),
     path("api_gen_song_words", api_gen_song_words, name="api_gen_song_words"),
+    path("api_gen_resume", api_gen_resume, name="api_gen_resume"),
+    path("api_gen_active", api_gen_active, name="api_gen_active"),
+    path("api_gen_cancel", api_gen_cancel, name="api_gen_cancel"),
 
     # chat history management
     path("api_summarise_chat_history", api_summarise_chat_history, name="api_summarise_chat_history"),
@@ -0,0 +1,77 @@
+from ..services.utils.jsoncodec import JsonResponse
+from django.contrib.auth.decorators import login_required
+from ..services.llm_generation_registry import get_generation_registry
+import json
+from ..logging_config import get_logger
+
+
+logger = get_logger('apis')
+
+
+@login_required
+def api_gen_active(request):
+    """
+    List the generations running in this worker.
+    
+    Staff users can list the generations of all users with all=1. Generations
+    running in other worker processes are not listed.
+    
+    Args:
+        request: The HTTP request object with an optional all parameter
+    
+    Returns:
+        JsonResponse: The active generations and the registry counters
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    registry = get_generation_registry()
+    all_users = request.GET.get("all") == "1"
+
+    if all_users and not request.user.is_staff:
+        return JsonResponse({"error": "Only staff users can list the generations of all users"}, status=403)
+
+    generations = registry.get_active(None if all_users else request.user)
+
+    return JsonResponse({
+        "status": "success",
+        "generations": [generation.to_dict() for generation in generations],
+        "stats": registry.get_stats(),
+    }, status=200)
+
+
+@login_required
+def api_gen_cancel(request):
+    """
+    Cancel a running generation.
+    
+    Users can cancel their own generations, staff users can cancel any generation.
+    Only generations running in this worker process can be cancelled, a
+    cancelled generation closes its upstream streams right away.
+    
+    Args:
+        request: The HTTP request object containing POST data with generation_id
+    
+    Returns:
+        JsonResponse: Success/error response
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        request_data = json.loads(request.body.decode('utf-8'))
+        generation_id = request_data.get("generation_id")
+
+        if not isinstance(generation_id, int):
+            return JsonResponse({"error": "Generation ID must be provided"}, status=400)
+
+        # staff users may cancel the generations of any user
+        owner = None if request.user.is_staff else request.user
+        if not get_generation_registry().cancel(generation_id, owner):
+            return JsonResponse({"error": f"Generation {generation_id} not found or you don't have permission to cancel it"}, status=404)
+
+        logger.info(f"User {request.user.username} cancelled generation {generation_id}")
+        return JsonResponse({"status": "success", "generation_id": generation_id}, status=200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON data provided"}, status=400)
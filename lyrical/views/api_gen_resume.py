@@ -0,0 +1,46 @@
+import uuid
+from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+from ..services.utils.jsoncodec import JsonResponse
+from ..services.llm_stream_jobs import get_stream_job_runner
+from ..logging_config import get_logger
+
+
+logger = get_logger('apis')
+
+
+@login_required
+@require_http_methods(["GET"])
+def api_gen_resume(request):
+    """
+    Reconnect to a resumable generation stream.
+    
+    Args:
+        request: The HTTP request object with stream_id and offset parameters,
+                 offset is the number of NDJSON lines the client already received
+    
+    Returns:
+        StreamingHttpResponse: The missed lines followed by the rest of the stream
+    """
+    stream_id = request.GET.get("stream_id")
+    offset = request.GET.get("offset", "0")
+
+    # validate the parameters
+    try:
+        stream_id = str(uuid.UUID(stream_id or ''))
+    except ValueError:
+        return JsonResponse({"error": "A valid stream_id must be provided"}, status=400)
+
+    if not offset.isdigit():
+        return JsonResponse({"error": "offset must be a non-negative integer"}, status=400)
+
+    # replay the stream from the offset
+    lines = get_stream_job_runner().replay(stream_id, request.user, int(offset))
+    if lines is None:
+        return JsonResponse({"error": f"Stream {stream_id} not found"}, status=404)
+
+    logger.info(f"User {request.user.username} resumed stream {stream_id} from line {offset}")
+    response = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+    response["X-Stream-ID"] = stream_id
+    return response
@@ -1,22 +1,31 @@
 import logging
-import json
 import random
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from ..services.llm_generator import LLMGenerator
+from ..services.utils.prompts import get_user_prompt
 from ..services.utils.text import normalize_to_ascii
+from ..services.utils import jsoncodec
 from .. import models
 
 
 logger = logging.getLogger('apis')
 
 
+# Song structure items that have lyrics (others like 'solo' or 'interlude' are instrumental)
+LYRICS_SECTION_TYPES = ['intro', 'verse', 'pre-chorus', 'chorus', 'bridge', 'outro', 'vocalisation']
+
+
 class SongLyricsGenerator(LLMGenerator):
     def extract_parameters(self) -> Dict[str, Any]:
+        fan_out_config = getattr(settings, 'LLM_FAN_OUT', {})
         return {
             'prompt_name': self.request.GET.get("prompt", "").strip(),
             'song_id': int(self.request.GET.get("song_id", "")),
+            'fan_out': self.request.GET.get("fan_out", "1" if fan_out_config.get('ENABLED') else "0") == "1",
+            'chorus_first': self.request.GET.get("chorus_first", "1" if fan_out_config.get('CHORUS_FIRST', True) else "0") == "1",
         }
     
     def query_database_data(self) -> Dict[str, Any]:
@@ -50,6 +59,7 @@ class SongLyricsGenerator(LLMGenerator):
 
         return {
             'song_name': song.name,
+            'structure': song.structure,
             'include_themes': include_themes,
             'exclude_themes': exclude_themes,
             'theme': song.theme,
@@ -105,13 +115,96 @@ class SongLyricsGenerator(LLMGenerator):
         }
 
 
+    def get_song_sections(self) -> List[str]:
+        """
+        Get the unique lyrics sections of the song structure in order, named
+        the same way as the generated NDJSON keys (verse1, verse2, chorus, ...).
+        """
+        sections = []
+        verse_count = 0
+        for item_name in self.extracted_params.get('structure', '').split(','):
+            item_name = item_name.strip().lower()
+            if item_name not in LYRICS_SECTION_TYPES:
+                continue
+            if item_name == 'verse':
+                verse_count += 1
+                item_name = f"verse{verse_count}"
+            if item_name not in sections:
+                sections.append(item_name)
+        return sections
+
+    def get_fan_out_jobs(self) -> Optional[List[List[Dict[str, Any]]]]:
+        """
+        Split the song into one job per section when fan-out is enabled, with
+        the chorus generated first (if requested) and fed to the other sections.
+        """
+        if not self.extracted_params.get('fan_out'):
+            return None
+
+        sections = self.get_song_sections()
+        if len(sections) < 2:
+            return None
+
+        if self.extracted_params.get('chorus_first') and 'chorus' in sections:
+            other_sections = [section for section in sections if section != 'chorus']
+            return [
+                [{'name': 'chorus', 'messages': self.build_section_messages('chorus', sections)}],
+                [
+                    {
+                        'name': section,
+                        'build_messages': lambda results, section=section: self.build_section_messages(
+                            section, sections, self.extract_section_lyrics(results.get('chorus', ''))
+                        ),
+                    }
+                    for section in other_sections
+                ],
+            ]
+
+        return [[{'name': section, 'messages': self.build_section_messages(section, sections)} for section in sections]]
+
+    def build_section_messages(self, section: str, sections: List[str], chorus_lyrics: str = '') -> List[Dict[str, str]]:
+        """
+        Build the messages for a single section job: the conversation so far
+        with the full song request replaced by a request for just this section.
+        """
+        section_type = section.rstrip('0123456789')
+
+        params = self.build_user_prompt_params()
+        params.update({
+            'section': section,
+            'section_lines': self.extracted_params.get(f"{section_type.replace('-', '_')}_lines") or 4,
+            'song_sections': ', '.join(sections),
+            'chorus_lyrics': chorus_lyrics,
+        })
+        user_message = get_user_prompt(f"{self.get_prompt_name()}.fan_out", self.llm_model, **params)
+        if user_message is None:
+            raise ValueError(f"prompt configuration '{self.get_prompt_name()}.fan_out' not found")
+
+        messages = list(self.prompt_messages.get()[:-1])
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def extract_section_lyrics(self, response_text: str) -> str:
+        """
+        Get the lyrics from a section job response as newline separated text.
+        """
+        for line in response_text.splitlines():
+            try:
+                data = jsoncodec.loads(line.strip())
+            except (jsoncodec.JSONDecodeError, ValueError):
+                continue
+            if isinstance(data, dict):
+                for words in data.values():
+                    if isinstance(words, list):
+                        return "\n".join(str(word) for word in words)
+        return ''
+
     def log_generation_params(self) -> None:
         params = self.extracted_params
         logger.debug(f"Generating song lyrics with parameters: {params}")
     
-    def preprocess_ndjson(self, ndjson_line: str) -> str:
-        data = json.loads(ndjson_line)
-        print(json.dumps(data, indent=2))
+    def preprocess_ndjson_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        logger.debug(f"Received lyrics NDJSON data: {data}")
 
         # get the song ID from the request parameters
         song_id = self.extracted_params.get('song_id')
@@ -119,17 +212,17 @@ class SongLyricsGenerator(LLMGenerator):
         # validate the song ID
         if not song_id:
             logger.error("Song ID is required for generating songs")
-            return {}
+            raise ValueError("song ID is required for generating songs")
         
         try:
             # fetch the song from the database
             song = models.Song.objects.get(id=song_id, user=self.request.user)
         except models.Song.DoesNotExist:
             logger.error(f"Song with ID {song_id} does not exist for user '{self.request.user.username}'")
-            return {}
+            raise
         except Exception as e:
             logger.error(f"Error fetching song with ID {song_id} for user '{self.request.user.username}': {str(e)}")
-            return {}
+            raise
 
         # loop over all keys in the data
         for section, words in data.items():
@@ -173,8 +266,8 @@ class SongLyricsGenerator(LLMGenerator):
                 logger.error(f"Error creating section '{section_type}' for song ID {song_id}: {str(e)}")
                 continue
 
-        # return the original data as a NDJSON string to process in javascript
-        return json.dumps(data)
+        # return the original data to be streamed to javascript
+        return data
     
     def on_response_complete(self) -> None:
         """
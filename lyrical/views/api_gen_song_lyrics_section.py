@@ -1,5 +1,4 @@
 import logging
-import json
 import random
 from typing import Dict, Any, Optional
 from django.views.decorators.http import require_http_methods
@@ -62,9 +61,8 @@ class SongLyricsSectionGenerator(LLMGenerator):
         logger.debug(f"Generating song lyrics sections with parameters: {params}")
     
 
-    def preprocess_ndjson(self, ndjson_line: str) -> str:
-        data = json.loads(ndjson_line)
-        print(f'in:\n{json.dumps(data, indent=2)}')
+    def preprocess_ndjson_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        logger.debug(f"Received lyrics section NDJSON data: {data}")
 
         # get the song ID from the request parameters
         song_id = self.extracted_params.get('song_id')
@@ -72,17 +70,17 @@ class SongLyricsSectionGenerator(LLMGenerator):
         # validate the song ID
         if not song_id:
             logger.error("Song ID is required for generating song sections")
-            return {}
+            raise ValueError("song ID is required for generating song sections")
         
         try:
             # fetch the song from the database
             song = models.Song.objects.get(id=song_id, user=self.request.user)
         except models.Song.DoesNotExist:
             logger.error(f"Song with ID {song_id} does not exist for user '{self.request.user.username}'")
-            return {}
+            raise
         except Exception as e:
             logger.error(f"Error fetching song with ID {song_id} for user '{self.request.user.username}': {str(e)}")
-            return {}
+            raise
 
         # create a new dictionary with cleaned section names
         cleaned_data = {}
@@ -108,9 +106,9 @@ class SongLyricsSectionGenerator(LLMGenerator):
         # add the song section ID to the data
         data['id'] = song_section.id
 
-        # return the updated data as a NDJSON string to process in javascript
-        print(f'out:\n{json.dumps(data, indent=2)}')
-        return json.dumps(data)
+        # return the updated data to be streamed to javascript
+        logger.debug(f"Preprocessed lyrics section NDJSON data: {data}")
+        return data
         
 
 @login_required
@@ -1,10 +1,13 @@
 import logging
-import json
 import random
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from django.http import HttpRequest, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from ..services.llm_generator import LLMGenerator
+from ..services.llm_admission import PRIORITY_BATCH
+from ..services.song_name_pool import get_song_name_pool, get_default_filters
+from ..services.utils import jsoncodec
 from ..services.utils.text import normalize_to_ascii
 from .. import models
 from ..logging_config import get_logger
@@ -14,6 +17,30 @@ logger = get_logger('apis')
 
 
 class SongNamesGenerator(LLMGenerator):
+    def generate(self) -> StreamingHttpResponse:
+        # requests with the user's default filters are served from the pre-generated name pool
+        pool = get_song_name_pool()
+        if pool.enabled and self.request.user.is_authenticated:
+            try:
+                self.extracted_params = self.extract_parameters()
+            except ValueError:
+                return super().generate()
+            
+            if pool.matches_defaults(self.request.user, self.extracted_params):
+                names = pool.take(self.request.user, self.extracted_params['count'])
+                if names:
+                    # top the pool up again for the next request, a miss generates as usual
+                    pool.refill_async(self.request.user, generate_pool_names)
+                    return StreamingHttpResponse(self.stream_pooled_names(names), content_type="application/x-ndjson")
+        
+        return super().generate()
+    
+
+    def stream_pooled_names(self, names: List[str]):
+        for name in names:
+            yield jsoncodec.dumps(self.preprocess_ndjson_data({"name": name})) + '\n'
+    
+
     def extract_parameters(self) -> Dict[str, Any]:
         return {
             'prompt_name': self.request.GET.get("prompt", "").strip(),
@@ -34,6 +61,14 @@ class SongNamesGenerator(LLMGenerator):
         return False
     
 
+    def get_expected_item_count(self) -> Optional[int]:
+        return self.extracted_params['count']
+    
+
+    def get_tokens_per_item(self) -> int:
+        return 40
+    
+
     def query_database_data(self) -> Dict[str, Any]:
         # get excluded song names from database
         all_songs = models.Song.objects.values('name')
@@ -94,7 +129,7 @@ class SongNamesGenerator(LLMGenerator):
             'exclude_words': self.extracted_params['exclude_words'],
             'starts_with': self.extracted_params['starts_with'],
             'ends_with': self.extracted_params['ends_with'],
-            'count': self.extracted_params['count'],
+            'count': self.get_items_per_candidate(self.extracted_params['count']),
             'min_words': self.extracted_params['min_words'],
             'max_words': self.extracted_params['max_words'],
             'exclude_song_names': self.get_excluded_song_names(),
@@ -107,8 +142,7 @@ class SongNamesGenerator(LLMGenerator):
         logger.debug(f"Generating song names with parameters: {params}")
             
     
-    def preprocess_ndjson(self, ndjson_line: str) -> str:
-        data = json.loads(ndjson_line)
+    def preprocess_ndjson_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         
         # get the song name from the data
         name = normalize_to_ascii(data["name"])
@@ -118,7 +152,7 @@ class SongNamesGenerator(LLMGenerator):
         if models.Song.objects.filter(name=name, user=self.request.user).exists():
             logger.warning(f"Song name '{name}' already exists for user {self.request.user.id}. Skipping creation.")
             data['id'] = -1
-            return json.dumps(data)        
+            return data        
 
         # create a new song object in the database
         song = models.Song.create_from_template(data["name"], self.request.user, None)
@@ -133,9 +167,61 @@ class SongNamesGenerator(LLMGenerator):
         # add the new song ID to the data
         data['id'] = song.id
         logger.debug(f"Preprocessed NDJSON line: {data}")
-        return json.dumps(data)
+        return data
         
 
+class PooledSongNamesGenerator(SongNamesGenerator):
+    """
+    Generates names for the name pool with the user's default filters,
+    without creating songs.
+    """
+
+    def __init__(self, request, count: int):
+        super().__init__(request)
+        self.count = count
+    
+
+    def extract_parameters(self) -> Dict[str, Any]:
+        return {
+            'prompt_name': 'song_names',
+            **get_default_filters(self.request.user),
+            'count': self.count,
+            'custom_request': '',
+        }
+    
+
+    def get_priority(self) -> str:
+        # the pool is refilled in the background, interactive generations go first
+        return PRIORITY_BATCH
+    
+
+    def query_database_data(self) -> Dict[str, Any]:
+        # names already in the pool are excluded too
+        data = super().query_database_data()
+        data['exclude_song_names'] += get_song_name_pool().get_pooled_names(self.request.user)
+        return data
+    
+
+    def preprocess_ndjson_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        data["name"] = normalize_to_ascii(data["name"])
+        return data
+
+
+def generate_pool_names(user, count: int) -> List[str]:
+    """
+    Generate names with the user's default filters for the name pool.
+    """
+    request = HttpRequest()
+    request.user = user
+    
+    names = []
+    for line in PooledSongNamesGenerator(request, count).generate_lines():
+        data = jsoncodec.loads(line)
+        if isinstance(data, dict) and data.get("name"):
+            names.append(data["name"])
+    return names
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_gen_song_names(request):
@@ -1,5 +1,4 @@
 import logging
-import json
 import random
 from typing import Dict, Any, Optional
 from django.views.decorators.http import require_http_methods
@@ -75,12 +74,18 @@ class SongStylesGenerator(LLMGenerator):
         return self.extracted_params['song_id']
 
 
+    def get_candidate_oversample(self) -> float:
+        # every style is shown, the response is not closed at an item count
+        return 1.0
+
+
     def build_user_prompt_params(self) -> Dict[str, Any]:
         params = {
             'song_name': self.extracted_params['song_name'],
             'custom_request': self.extracted_params['custom_request'],
             'include_themes': self.extracted_params['include_themes'],
             'exclude_themes': self.extracted_params['exclude_themes'],
+            'style_count': self.get_items_per_candidate(3),
         }
 
         theme = self.extracted_params['style_filter'] == '' or self.extracted_params['style_filter'] == 'THEME'
@@ -99,45 +104,50 @@ class SongStylesGenerator(LLMGenerator):
         logger.debug(f"Generating song styles with parameters: {params}")
             
     
-    def preprocess_ndjson(self, ndjson_line: str) -> str:
-        data = json.loads(ndjson_line)
-        
+    def preprocess_ndjson_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        data = self.save_styles(self.extracted_params.get("song_id"), data)
+        logger.debug(f"Preprocessed NDJSON line: {data}")
+        return data
+
+
+    def save_styles(self, song_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Save the theme, narrative or mood of a response line as a section of the song.
+        """
         if data.get("theme"):
             # normalize the theme text to ASCII
             data["theme"] = normalize_to_ascii(data["theme"])
             section = models.Section.objects.create(
-                song_id=self.extracted_params.get("song_id"),
+                song_id=song_id,
                 type='theme',
                 text=data["theme"]
             )
             data['id'] = section.id
-            logger.debug(f"Added theme: {data['theme']} to song ID {self.extracted_params.get('song_id')}")
+            logger.debug(f"Added theme: {data['theme']} to song ID {song_id}")
 
         if data.get("narrative"):
             # normalize the narrative text to ASCII
             data["narrative"] = normalize_to_ascii(data["narrative"])
             section = models.Section.objects.create(
-                song_id=self.extracted_params.get("song_id"),
+                song_id=song_id,
                 type='narrative',
                 text=data["narrative"]
             )
             data['id'] = section.id
-            logger.debug(f"Added narrative: {data['narrative']} to song ID {self.extracted_params.get('song_id')}")
+            logger.debug(f"Added narrative: {data['narrative']} to song ID {song_id}")
 
         if data.get("mood"):
             # normalize the mood text to ASCII
             data["mood"] = normalize_to_ascii(data["mood"])
             section = models.Section.objects.create(
-                song_id=self.extracted_params.get("song_id"),
+                song_id=song_id,
                 type='mood',
                 text=data["mood"]
             )
             data['id'] = section.id
-            logger.debug(f"Added mood: {data['mood']} to song ID {self.extracted_params.get('song_id')}")
+            logger.debug(f"Added mood: {data['mood']} to song ID {song_id}")
 
-        # add the new song ID to the data
-        logger.debug(f"Preprocessed NDJSON line: {data}")
-        return json.dumps(data)
+        return data
         
 
 @login_required
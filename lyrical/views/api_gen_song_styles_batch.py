@@ -0,0 +1,170 @@
+from typing import Dict, Any, List, Optional
+from django.conf import settings
+from django.views.decorators.http import require_http_methods
+from django.contrib.auth.decorators import login_required
+from .api_gen_song_styles import SongStylesGenerator
+from ..services.utils.prompts import get_user_prompt
+from ..services.utils.summarise import ChatSummarisationService
+from .. import models
+from ..logging_config import get_logger
+
+
+logger = get_logger('apis')
+
+
+class SongStylesBatchGenerator(SongStylesGenerator):
+    """
+    Generates the styles of several songs at once. Songs are packed into as few
+    prompts as the token budget allows (settings.LLM_STYLE_BATCH), each batch
+    is one LLM call, and every response line is tagged with the ID of its song.
+    """
+
+    def extract_parameters(self) -> Dict[str, Any]:
+        return {
+            'prompt_name': self.request.GET.get("prompt", "song_styles_batch").strip(),
+            'song_ids': [int(song_id) for song_id in self.request.GET.get("song_ids", "").split(',') if song_id.strip()],
+            'custom_request': self.request.GET.get("custom_request", "").strip(),
+            'style_filter': self.request.GET.get("style_filter", "").strip(),
+        }
+
+
+    def query_database_data(self) -> Dict[str, Any]:
+        song_ids = self.extracted_params.get('song_ids')
+        if not song_ids:
+            raise ValueError("song IDs are required for generating styles")
+
+        songs = models.Song.objects.in_bulk(song_ids)
+        metadata = {
+            (item.song_id, item.key): item.value
+            for item in models.SongMetadata.objects.filter(song_id__in=song_ids, key__in=['include_themes', 'exclude_themes'])
+        }
+
+        batch_songs = []
+        for song_id in dict.fromkeys(song_ids):
+            song = songs.get(song_id)
+            if song is None or song.user_id != self.request.user.id:
+                logger.error(f"Song with ID {song_id} does not exist for user '{self.request.user.username}'")
+                continue
+            batch_songs.append({
+                'id': song.id,
+                'name': song.name,
+                'include_themes': metadata.get((song.id, 'include_themes'), self.request.user.song_name_theme_inc),
+                'exclude_themes': metadata.get((song.id, 'exclude_themes'), self.request.user.song_name_theme_exc),
+            })
+
+        if not batch_songs:
+            raise ValueError(f"none of the songs {song_ids} exist for user '{self.request.user.username}'")
+
+        return {
+            'songs': batch_songs,
+        }
+
+
+    def get_song_id(self) -> int:
+        return None
+
+
+    def get_style_types(self) -> List[str]:
+        style_filter = self.extracted_params['style_filter']
+        return [style_type for style_type in ('theme', 'narrative', 'mood') if style_filter in ('', style_type.upper())]
+
+
+    def get_expected_item_count(self) -> Optional[int]:
+        return len(self.extracted_params['songs']) * len(self.get_style_types()) * self.get_items_per_candidate(3)
+
+
+    def get_tokens_per_item(self) -> int:
+        return getattr(settings, 'LLM_STYLE_BATCH', {}).get('TOKENS_PER_ITEM', 80)
+
+
+    def build_user_prompt_params(self, songs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        style_types = self.get_style_types()
+        return {
+            'songs': self.extracted_params['songs'] if songs is None else songs,
+            'custom_request': self.extracted_params['custom_request'],
+            'style_count': self.get_items_per_candidate(3),
+            'theme': 'theme' in style_types,
+            'narrative': 'narrative' in style_types,
+            'mood': 'mood' in style_types,
+        }
+
+
+    def get_song_batches(self) -> List[List[Dict[str, Any]]]:
+        """
+        Pack the songs into batches whose prompt and expected response stay
+        within TOKEN_BUDGET, with at most MAX_SONGS_PER_BATCH songs each.
+        """
+        config = getattr(settings, 'LLM_STYLE_BATCH', {})
+        token_budget = config.get('TOKEN_BUDGET', 6000)
+        max_songs = config.get('MAX_SONGS_PER_BATCH', 10)
+        response_tokens = len(self.get_style_types()) * self.get_items_per_candidate(3) * self.get_tokens_per_item()
+
+        # every batch repeats the system prompt and the instructions around the songs
+        prompt_text = '\n'.join(str(message['content']) for message in self.build_batch_messages([]))
+        prompt_tokens = ChatSummarisationService.estimate_tokens(prompt_text, self.llm_model.internal_name)
+
+        batches, batch, batch_tokens = [], [], prompt_tokens
+        for song in self.extracted_params['songs']:
+            song_text = f"{song['id']} {song['name']} {song['include_themes']} {song['exclude_themes']}"
+            song_tokens = ChatSummarisationService.estimate_tokens(song_text, self.llm_model.internal_name) + response_tokens
+            if batch and (batch_tokens + song_tokens > token_budget or len(batch) >= max_songs):
+                batches.append(batch)
+                batch, batch_tokens = [], prompt_tokens
+            batch.append(song)
+            batch_tokens += song_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+
+    def get_fan_out_jobs(self) -> Optional[List[List[Dict[str, Any]]]]:
+        # a single batch is streamed with the main prompt, several batches run concurrently
+        batches = self.get_song_batches()
+        if len(batches) < 2:
+            return None
+
+        logger.info(f"Generating styles for {len(self.extracted_params['songs'])} songs in {len(batches)} batches")
+        return [[
+            {'name': f"batch{index}", 'messages': self.build_batch_messages(batch)}
+            for index, batch in enumerate(batches)
+        ]]
+
+
+    def build_batch_messages(self, songs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Build the messages for a batch job: the system prompt and the request for the batch's songs.
+        """
+        user_message = get_user_prompt(self.get_prompt_name(), self.llm_model, **self.build_user_prompt_params(songs))
+        if user_message is None:
+            raise ValueError(f"prompt configuration '{self.get_prompt_name()}' not found")
+
+        messages = list(self.prompt_messages.get()[:-1])
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+
+    def log_generation_params(self) -> None:
+        params = self.extracted_params
+        logger.debug(f"Generating song styles for songs {params['song_ids']} with parameters: {params}")
+
+
+    def preprocess_ndjson_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        song_ids = {song['id'] for song in self.extracted_params['songs']}
+        try:
+            song_id = int(data.get("song_id"))
+        except (TypeError, ValueError):
+            song_id = None
+        if song_id not in song_ids:
+            raise ValueError(f"response line for unknown song ID {data.get('song_id')}")
+
+        data["song_id"] = song_id
+        data = self.save_styles(song_id, data)
+        logger.debug(f"Preprocessed NDJSON line: {data}")
+        return data
+
+
+@login_required
+@require_http_methods(["GET"])
+def api_gen_song_styles_batch(request):
+    generator = SongStylesBatchGenerator(request)
+    return generator.generate()
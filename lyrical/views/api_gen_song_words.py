@@ -1,5 +1,4 @@
 import logging
-import json
 import random
 from typing import Dict, Any, Optional
 from django.views.decorators.http import require_http_methods
@@ -33,6 +32,14 @@ class SongWordsGenerator(LLMGenerator):
         return False
     
 
+    def get_expected_item_count(self) -> Optional[int]:
+        return self.extracted_params['count']
+    
+
+    def get_tokens_per_item(self) -> int:
+        return 20
+    
+
     def query_database_data(self) -> Dict[str, Any]:
         # get the song ID from the request parameters
         song_id = self.extracted_params.get('song_id')
@@ -97,7 +104,7 @@ class SongWordsGenerator(LLMGenerator):
             'exclude_list': self.extracted_params['exclude_list'].replace(',', ', '),
             'song_section': self.extracted_params['song_section'],
             'section_type': self.extracted_params['section_type'],
-            'count': self.extracted_params['count'],
+            'count': self.get_items_per_candidate(self.extracted_params['count']),
             'custom_request': self.extracted_params['custom_request'],
         }
     
@@ -107,8 +114,7 @@ class SongWordsGenerator(LLMGenerator):
         logger.debug(f"Generating song words with parameters: {params}")
             
     
-    def preprocess_ndjson(self, ndjson_line: str) -> str:
-        data = json.loads(ndjson_line)
+    def preprocess_ndjson_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         
         new_data = {}
 
@@ -120,7 +126,7 @@ class SongWordsGenerator(LLMGenerator):
 
         # add the new song ID to the data
         logger.debug(f"Preprocessed NDJSON line: {new_data}")
-        return json.dumps(new_data)
+        return new_data
         
 
 @login_required
@@ -1,4 +1,4 @@
-from django.http import JsonResponse
+from ..services.utils.jsoncodec import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from .. import models
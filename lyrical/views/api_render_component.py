@@ -1,7 +1,7 @@
 import json
 import logging
 import os
-from django.http import JsonResponse
+from ..services.utils.jsoncodec import JsonResponse
 from django.template.loader import render_to_string, TemplateDoesNotExist
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -1,4 +1,4 @@
-from django.http import JsonResponse
+from ..services.utils.jsoncodec import JsonResponse
 from django.contrib.auth.decorators import login_required
 from .. import models
 import json
@@ -31,10 +31,12 @@ def api_user_llm(request):
         llm_model_id = edit_data.get("llm_model_id")
         llm_temperature = edit_data.get("llm_temperature")
         llm_max_tokens = edit_data.get("llm_max_tokens")
+        llm_fallback_model_ids = edit_data.get("llm_fallback_model_ids")
+        llm_auto_routing = edit_data.get("llm_auto_routing")
 
         # validate there is minimum 1 parameter to update
-        if not llm_model_id and llm_temperature is None and llm_max_tokens is None:
-            return JsonResponse({"error": "At least one parameter (llm_model_id, llm_temperature, llm_max_tokens) must be provided for update"}, status=400)
+        if not llm_model_id and llm_temperature is None and llm_max_tokens is None and llm_fallback_model_ids is None and llm_auto_routing is None:
+            return JsonResponse({"error": "At least one parameter (llm_model_id, llm_temperature, llm_max_tokens, llm_fallback_model_ids, llm_auto_routing) must be provided for update"}, status=400)
 
         # update the user's chosen LLM model
         if llm_model_id:
@@ -56,6 +58,22 @@ def api_user_llm(request):
                 return JsonResponse({"error": "llm_max_tokens must be a positive integer"}, status=400)
             request.user.llm_max_tokens = int(llm_max_tokens)
 
+        # update the user's ordered fallback LLM models
+        if llm_fallback_model_ids is not None:
+            if not isinstance(llm_fallback_model_ids, list):
+                return JsonResponse({"error": "llm_fallback_model_ids must be a list of LLM model IDs"}, status=400)
+            fallback_llms = models.LLM.objects.in_bulk(llm_fallback_model_ids)
+            missing_ids = [llm_id for llm_id in llm_fallback_model_ids if llm_id not in fallback_llms]
+            if missing_ids:
+                return JsonResponse({"error": f"LLM models with IDs {missing_ids} not found"}, status=404)
+            request.user.llm_fallback_models = ','.join(fallback_llms[llm_id].internal_name for llm_id in llm_fallback_model_ids)
+
+        # update whether the user's prompts are routed to a model of their tier
+        if llm_auto_routing is not None:
+            if not isinstance(llm_auto_routing, bool):
+                return JsonResponse({"error": "llm_auto_routing must be a boolean"}, status=400)
+            request.user.llm_auto_routing = llm_auto_routing
+
         # save the user with updated LLM settings
         request.user.save()
         logger.info(f"User {request.user.username} updated LLM settings: model={
@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseServerError
 from django.db.models.functions import Lower
 from .. import models
+from ..services.llm_stats import get_llm_stats
 
 
 logger = logging.getLogger('views')
@@ -17,8 +18,14 @@ def page_profile(request):
     }
 
     try:
+        # show each model's recent latency in the model picker
+        llm_models = list(models.LLM.objects.all())
+        llm_stats = get_llm_stats().get_summary()
+        for llm_model in llm_models:
+            llm_model.latency_stats = llm_stats.get(llm_model.id)
+
         context.update({
-            "llm_models": models.LLM.objects.all(),
+            "llm_models": llm_models,
         })
 
     except Exception as db_error:
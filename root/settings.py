@@ -128,3 +128,267 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 LOGIN_URL = '/login'
+
+
+# LLM provider HTTP client pool (see lyrical/services/llm_client_pool.py)
+# Each worker keeps one keep-alive client per provider that all LLM calls share.
+
+LLM_CLIENT_POOL = {
+    'ENABLED': True,
+    'MAX_CONNECTIONS': 10,              # default max connections per provider
+    'MAX_KEEPALIVE_CONNECTIONS': 5,     # idle connections kept open per provider
+    'KEEPALIVE_EXPIRY': 120.0,          # seconds an idle connection is kept
+    'TIMEOUT': 600.0,                   # request timeout in seconds
+    'PROVIDER_MAX_CONNECTIONS': {},     # per provider overrides, e.g. {'ollama': 2}
+    'BASE_URLS': {},                    # per provider base URL overrides used for warm-up and native engines
+    'WARM_UP': os.environ.get('LLM_CLIENT_POOL_WARM_UP', '') == '1',
+}
+
+
+# LLM response cache (see lyrical/services/llm_response_cache.py)
+# Identical requests for the listed prompt names are replayed from memory instead of calling the provider.
+
+LLM_RESPONSE_CACHE = {
+    'ENABLED': False,
+    'MAX_ENTRIES': 256,                 # least recently used responses are evicted beyond this
+    'TTL_SECONDS': 600,                 # cached responses expire after this many seconds
+    'PROMPT_NAMES': ['song_words', 'song_names', 'song_styles'],
+}
+
+
+# LLM request coalescing (see lyrical/services/llm_singleflight.py)
+# Concurrent identical requests from the same user for the listed prompt names share one upstream stream.
+
+LLM_REQUEST_COALESCING = {
+    'ENABLED': True,
+    'PROMPT_NAMES': ['song_words', 'song_styles', 'song_names'],
+}
+
+
+# Fan-out lyrics generation (see SongLyricsGenerator.get_fan_out_jobs)
+# Each song section is generated by its own concurrent LLM call; requests can override with ?fan_out=0|1&chorus_first=0|1.
+
+LLM_FAN_OUT = {
+    'ENABLED': False,
+    'CHORUS_FIRST': True,               # generate the chorus first and feed it to the other section jobs
+    'MAX_CONCURRENCY': 4,               # maximum concurrent section jobs per generation
+}
+
+
+# Hedged LLM requests (see lyrical/services/llm_hedging.py)
+# If the selected model has not produced a token within its recent time-to-first-token p95,
+# a backup request is started against a second LLM and the first stream to produce a token wins.
+
+LLM_HEDGING = {
+    'ENABLED': False,
+    'BACKUP_LLMS': {},                  # LLM internal_name -> backup LLM internal_name ('*' matches any model)
+    'PERCENTILE': 95,                   # hedge after this percentile of the recent time-to-first-token
+    'MIN_SAMPLES': 10,                  # samples needed before the percentile is used
+    'SAMPLE_WINDOW': 200,               # time-to-first-token samples kept per model
+    'DEFAULT_DELAY_SECONDS': 3.0,       # hedge delay until enough samples are recorded
+    'MIN_DELAY_SECONDS': 0.5,           # lower bound for the hedge delay
+}
+
+
+# LLM failover (see lyrical/services/llm_circuit_breaker.py)
+# Every LLM and provider has a circuit breaker; when it is open or the call fails before any content
+# is streamed, the generation moves on to the user's fallback LLMs and then those listed here.
+
+LLM_FAILOVER = {
+    'ENABLED': True,
+    'FALLBACK_LLMS': {},                # prompt name -> ordered LLM internal names ('*' matches any prompt)
+    'WINDOW_SIZE': 20,                  # recent calls used to compute the error rate
+    'MIN_CALLS': 5,                     # calls needed before a breaker can open
+    'ERROR_RATE_THRESHOLD': 0.5,        # open the breaker at this rate of failed or slow calls
+    'SLOW_CALL_SECONDS': 30.0,          # a call with a slower first token counts as an error
+    'OPEN_SECONDS': 60.0,               # time an open breaker rejects calls before probing
+    'HALF_OPEN_MAX_CALLS': 1,           # probe calls allowed while half-open
+    'IGNORED_STATUS_CODES': [400, 401, 403, 413, 422],  # request errors (e.g. a user's invalid API key) not counted as failures
+}
+
+
+# LLM admission control (see lyrical/services/llm_admission.py)
+# Every LLM call needs a free slot under the global, per-provider, per-user and per-priority limits; calls
+# wait for a slot up to their maximum wait, after which generations receive a 429 error line.
+# Interactive generations are admitted ahead of summarisation, which is admitted ahead of batch jobs.
+
+LLM_ADMISSION = {
+    'ENABLED': True,
+    'MAX_WAIT_SECONDS': 30.0,           # longest an interactive call waits for a slot
+    'PRIORITY_MAX_WAIT_SECONDS': {      # priority class -> longest wait for a slot
+        'summarise': 120.0,
+        'batch': 600.0,
+    },
+    'GLOBAL_CONCURRENCY': 32,           # concurrent LLM calls per worker
+    'PROVIDER_CONCURRENCY': {'*': 16},  # provider internal_name -> concurrent calls ('*' matches any provider)
+    'USER_CONCURRENCY': 4,              # concurrent LLM calls per user
+    'PRIORITY_CONCURRENCY': {           # priority class -> concurrent calls, leaves room for interactive calls
+        'summarise': 8,
+        'batch': 8,
+    },
+    'PROVIDER_REQUESTS_PER_MINUTE': {}, # provider internal_name -> request rate limit ('*' matches any provider)
+}
+
+
+# Provider prompt-prefix caching (see lyrical/services/llm_prompt_cache.py)
+# The system prompt and conversation history are sent before the new user message; providers listed in
+# CACHE_CONTROL_PROVIDERS get cache-control markers on that prefix, OpenAI caches long prefixes automatically.
+
+LLM_PROMPT_CACHE = {
+    'ENABLED': True,
+    'CACHE_CONTROL_PROVIDERS': ['anthropic'],   # provider internal_names that need explicit cache markers
+    'STREAM_USAGE_PROVIDERS': ['openai', 'anthropic', 'xai'],  # provider internal_names that accept stream_options
+}
+
+
+# Resumable generation streams (see lyrical/services/llm_stream_jobs.py)
+# Generations for the listed prompt names run to completion in the background and can be
+# resumed with api_gen_resume?stream_id=<X-Stream-ID header>&offset=<lines received>.
+
+LLM_RESUMABLE_STREAMS = {
+    'ENABLED': True,
+    'PROMPT_NAMES': ['song_lyrics', 'song_lyrics_section', 'song_styles', 'song_styles_batch'],
+    'FLUSH_SECONDS': 2.0,               # how often emitted lines are saved to the GenerationJob record
+    'STALE_SECONDS': 120,               # a running job not saved for this long is considered abandoned
+    'RETENTION_SECONDS': 3600,          # generation jobs are deleted after this long
+}
+
+
+# LLM stream deadlines (see lyrical/services/llm_stream_deadlines.py)
+# The first token and stall deadlines are set per LLM (LLM.first_token_timeout and LLM.stall_timeout).
+# A model that misses its first token deadline is retried, then the next fallback model is tried;
+# once content has been streamed a missed deadline ends the generation with a status_code 504 error line.
+
+LLM_STREAM_DEADLINES = {
+    'STALL_RETRIES': 1,                 # retries of the same model after a missed first token deadline
+}
+
+
+# Runaway output detection (see lyrical/services/llm_runaway_detector.py)
+# A generation that degenerates (backtick or whitespace floods, runs of non-JSON lines, repeated lines or
+# phrases) is stopped early: the upstream stream is closed and only the valid lines before it are saved.
+
+LLM_RUNAWAY_DETECTION = {
+    'ENABLED': True,
+    'MAX_FLOOD_CHARS': 200,             # consecutive backtick/whitespace characters
+    'MAX_LINE_CHARS': 8000,             # characters in a single unterminated line
+    'MAX_INVALID_LINES': 5,             # consecutive lines that are not JSON
+    'MAX_REPEATED_LINES': 5,            # occurrences of an identical line
+    'NGRAM_SIZE': 6,                    # words per phrase checked for repetition
+    'NGRAM_WINDOW_LINES': 20,           # recent lines a phrase is counted over
+    'MAX_NGRAM_LINES': 8,               # recent lines a phrase may appear on
+}
+
+
+# Expected item counts (see LLMGenerator.get_expected_item_count)
+# Generators that ask for a known number of NDJSON items close the stream once that many valid items
+# have been emitted, and limit max_tokens to OVERHEAD_TOKENS + count * tokens per item.
+
+LLM_ITEM_COUNT = {
+    'ENABLED': True,
+    'TOKENS_PER_ITEM': 100,             # default output tokens per item, generators can override
+    'OVERHEAD_TOKENS': 1024,            # room for fences, preambles and reasoning
+}
+
+
+# Model routing per prompt (see lyrical/services/llm_routing.py)
+# Prompts mapped to a tier run on the model of that tier with the lowest recent median time to first
+# token (penalised by its error rate) instead of the user's selected model, unless the user's model is
+# already of that tier or the user has not turned routing on. Unmapped prompts always use the user's model.
+# Routing is opt-in for operators (ENABLED) and for every user (User.llm_auto_routing, off by default).
+
+LLM_ROUTING = {
+    'ENABLED': False,
+    'PROMPT_TIERS': {                   # prompt name -> LLM tier ('fast', 'standard' or 'large')
+        'song_words': 'fast',
+        'song_names': 'fast',
+    },
+    'MIN_SAMPLES': 5,                   # recent calls needed before a model's own latency is used (see LLM_STATS)
+    'DEFAULT_LATENCY_SECONDS': 2.0,     # latency assumed for models without enough samples
+    'ERROR_PENALTY': 4.0,               # score multiplier per unit of recent error rate
+}
+
+
+# LLM performance stats (see lyrical/services/llm_stats.py)
+# Time to first token, throughput, duration, line count and outcome of every LLM call, per model and
+# prompt name. Recent calls are kept in memory and rolled up to LLMStatsRollup rows; p50/p95 are shown
+# in the profile page model picker and by `python manage.py llm_stats`.
+
+LLM_STATS = {
+    'ENABLED': True,
+    'RING_SIZE': 200,                   # recent calls kept in memory per model and prompt name
+    'ROLLUP_SECONDS': 300,              # how often new calls are rolled up to the database
+    'SUMMARY_DAYS': 7,                  # days of rollups summarised for the model picker
+    'RETENTION_DAYS': 30,               # rollups older than this are deleted (0 keeps them all)
+}
+
+
+# Parallel candidates (see LLMGenerator.get_candidate_count)
+# Prompts listed here ask providers that support the n parameter for several candidates in one request;
+# each candidate generates its share of the items and complete lines are interleaved as they arrive.
+
+LLM_CANDIDATES = {
+    'ENABLED': True,
+    'PROVIDERS': ['openai'],            # provider internal_names that stream n choices
+    'MAX_CANDIDATES': 4,
+    'OVERSAMPLE': 1.5,                  # items asked of all candidates per requested item, repeats are skipped
+    'PROMPT_CANDIDATES': {              # prompt name -> number of candidates
+        'song_names': 3,
+        'song_words': 3,
+        'song_styles': 3,
+    },
+}
+
+
+# LLM engines (see lyrical/services/llm_engines.py)
+# Each LLMProvider selects the client used for its calls: litellm (default) or a native streaming client
+# for OpenAI-compatible, Anthropic or Ollama APIs, which uses the pooled connection and parses the stream
+# incrementally. Point LLM_CLIENT_POOL['BASE_URLS'] at a local stub server to test a native engine.
+
+LLM_ENGINES = {
+    'ANTHROPIC_VERSION': '2023-06-01',  # anthropic-version header of the messages API
+    'ANTHROPIC_MAX_TOKENS': 8192,       # max_tokens cap, the messages API requires max_tokens
+}
+
+
+# Continuation after mid-stream failures (see lyrical/services/llm_continuation.py)
+# When a provider fails with a retryable error after content has been streamed, the same model is asked to
+# continue from the text already emitted (sent as an assistant prefix) after an exponential backoff; only
+# new lines are streamed, lines that were already emitted are skipped.
+
+LLM_CONTINUATION = {
+    'ENABLED': True,
+    'MAX_RETRIES': 2,                   # continuation attempts before the error is returned
+    'BACKOFF_SECONDS': 0.5,             # wait before the first attempt, doubled for each further attempt
+    'MAX_BACKOFF_SECONDS': 8.0,
+    'RETRYABLE_STATUS_CODES': [429, 500, 502, 503, 504, 529],   # connection errors are always retried
+    'PREFILL_PROVIDERS': ['anthropic'], # providers that continue an assistant prefix without a user prompt
+    'CONTINUE_PROMPT': 'Your previous response was cut off. Continue it exactly where it stopped, without repeating any lines already written.',
+}
+
+
+# Song name pool (see lyrical/services/song_name_pool.py)
+# Names are pre-generated in the background with each user's default name filters (the song_name_* fields
+# on User); requests to api_gen_song_names with those filters and no custom request are served from the pool.
+# The pool is per process: each worker keeps its own pools in memory, and they are lost when it restarts. Refills
+# are LLM calls made with the user's API key, so the pool is off by default.
+
+SONG_NAME_POOL = {
+    'ENABLED': False,
+    'POOL_SIZE': 60,                    # names kept per user
+    'LOW_WATERMARK': 40,                # the pool is refilled in the background below this many names
+    'REFILL_COUNT': 20,                 # names requested per LLM call
+    'MAX_REFILL_CALLS': 5,              # LLM calls per refill, a call that adds no new names ends it
+}
+
+
+# Batched style generation (see lyrical/views/api_gen_song_styles_batch.py)
+# api_gen_song_styles_batch?song_ids=1,2,3 generates the styles of several songs with one shared prompt. Songs
+# are packed into batches within the token budget, batches run concurrently, and each line is tagged with its
+# song_id. Batches run as resumable generation jobs (see LLM_RESUMABLE_STREAMS).
+
+LLM_STYLE_BATCH = {
+    'TOKEN_BUDGET': 6000,               # estimated prompt and response tokens of one batch
+    'MAX_SONGS_PER_BATCH': 10,
+    'TOKENS_PER_ITEM': 80,              # estimated response tokens of one theme, narrative or mood
+}